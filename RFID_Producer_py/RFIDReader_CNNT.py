@@ -14,21 +14,32 @@ from command import device_command  # 导入指令字典
 class RFIDReader_CNNT:
     """RFID读写器通信类"""
 
-    def __init__(self, host: str = '192.168.1.200', port: int = 2000):
+    def __init__(self, host: str = '192.168.1.200', port: int = 2000,
+                 timeout: float = 5.0, recv_size: int = 1024,
+                 send_queue_size: int = 256, send_timeout: float = 2.0):
         """
         初始化RFID读写器
 
         Args:
             host: 服务器地址
             port: 服务器端口
+            timeout: 连接和接收超时（秒）
+            recv_size: 单次接收的最大字节数
+            send_queue_size: 待发送指令队列上限
+            send_timeout: 发送队列满时的最长等待时间（秒）
         """
         self.host = host
         self.port = port
-        self.socket_client = SocketClient(host, port)
-        self.is_connected = False
+        self.socket_client = SocketClient(host, port, timeout, recv_size, send_queue_size, send_timeout)
         self.command_queue = []
+
+        # 状态标志（接收线程、循环发送线程、连接线程和界面线程都会访问）
+        self._connected = threading.Event()
+        self._loop_active = threading.Event()
+        self._loop_stop = threading.Event()  # 通知循环发送线程停止（唤醒等待）
+        self._loop_lock = threading.Lock()  # 串行化循环发送的启动和停止
         self.loop_thread = None
-        self.loop_running = False
+        self.write_pipeline = None  # 标签写入流水线（按需创建）
 
         # 回调函数
         self.receive_callback = None
@@ -44,6 +55,21 @@ class RFIDReader_CNNT:
 
         print(f"RFID读写器初始化完成 - 服务器: {host}:{port}")
 
+    @property
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    @is_connected.setter
+    def is_connected(self, value: bool):
+        if value:
+            self._connected.set()
+        else:
+            self._connected.clear()
+
+    @property
+    def loop_running(self) -> bool:
+        return self._loop_active.is_set()
+
     def set_callbacks(self,
                       receive_callback: Optional[Callable[[bytes], None]] = None,
                       connection_callback: Optional[Callable[[bool, str], None]] = None,
@@ -60,6 +86,19 @@ class RFIDReader_CNNT:
         self.connection_callback = connection_callback
         self.error_callback = error_callback
 
+    def set_address(self, host: str, port: int):
+        """
+        修改读写器地址（下次连接时生效）
+
+        Args:
+            host: 服务器地址
+            port: 服务器端口
+        """
+        self.host = host
+        self.port = port
+        self.socket_client.host = host
+        self.socket_client.port = port
+
     def connect(self) -> bool:
         """
         连接到RFID读写器
@@ -79,6 +118,10 @@ class RFIDReader_CNNT:
     def disconnect(self):
         """断开与RFID读写器的连接"""
         self.stop_loop_cmd()
+        if self.write_pipeline is not None:
+            self.write_pipeline.stop()
+            self.write_pipeline.fail_all("读写器已断开连接")
+            self.write_pipeline = None
         self.socket_client.disconnect()
         self.is_connected = False
         print("RFID读写器已断开连接")
@@ -112,6 +155,36 @@ class RFIDReader_CNNT:
 
         return success
 
+    def send_frame(self, frame: bytes) -> bool:
+        """
+        发送已构造好的指令帧（如 command.build_command 生成的写入指令）
+
+        Args:
+            frame: 完整指令帧
+
+        Returns:
+            发送是否成功
+        """
+        if not self.is_connected:
+            return False
+        return self.socket_client.send_data(frame)
+
+    def get_write_pipeline(self, **kwargs):
+        """
+        获取标签写入流水线（首次调用时创建并启动）
+
+        Args:
+            **kwargs: TagWritePipeline 的参数，如 window、ack_timeout、max_retries、verify
+
+        Returns:
+            TagWritePipeline
+        """
+        if self.write_pipeline is None:
+            from tag_writer import TagWritePipeline
+            self.write_pipeline = TagWritePipeline(self.send_frame, **kwargs)
+            self.write_pipeline.start()
+        return self.write_pipeline
+
     def send_loop_cmd(self, command_name: str, interval: float = 5.0):
         """
         开始循环发送指令
@@ -128,26 +201,35 @@ class RFIDReader_CNNT:
             self._call_error_callback(f"未知指令: {command_name}")
             return
 
-        # 停止之前的循环
-        self.stop_loop_cmd()
+        with self._loop_lock:
+            # 停止之前的循环
+            self._stop_loop_locked()
 
-        # 开始新的循环
-        self.loop_running = True
-        self.loop_thread = threading.Thread(
-            target=self._loop_send,
-            args=(command_name, interval),
-            daemon=True
-        )
-        self.loop_thread.start()
+            # 开始新的循环
+            self._loop_stop.clear()
+            self._loop_active.set()
+            self.loop_thread = threading.Thread(
+                target=self._loop_send,
+                args=(command_name, interval),
+                daemon=True
+            )
+            self.loop_thread.start()
 
         print(f"开始循环发送指令: {command_name}, 间隔: {interval}秒")
 
     def stop_loop_cmd(self):
         """停止循环发送指令"""
-        if self.loop_running:
-            self.loop_running = False
-            if self.loop_thread and self.loop_thread.is_alive():
-                self.loop_thread.join(timeout=2.0)
+        with self._loop_lock:
+            self._stop_loop_locked()
+
+    def _stop_loop_locked(self):
+        if self._loop_active.is_set():
+            self._loop_active.clear()
+            self._loop_stop.set()
+            thread = self.loop_thread
+            # 循环发送线程自身触发停止时（如发送出错导致断开）不等待自己
+            if thread and thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=2.0)
             print("停止循环发送指令")
 
     def _loop_send(self, command_name: str, interval: float):
@@ -155,16 +237,18 @@ class RFIDReader_CNNT:
         command_bytes = device_command[command_name]
         hex_str = ' '.join([f'{b:02X}' for b in command_bytes])
 
-        while self.loop_running and self.is_connected:
+        while self._loop_active.is_set() and self.is_connected:
             try:
                 self.socket_client.send_data(command_bytes)
                 print(f"循环发送: {command_name} -> {hex_str}")
-                time.sleep(interval)
             except Exception as e:
                 self._call_error_callback(f"循环发送错误: {e}")
                 break
+            # 等待下一次发送，停止时立即返回
+            if self._loop_stop.wait(interval):
+                break
 
-        self.loop_running = False
+        self._loop_active.clear()
 
 
 
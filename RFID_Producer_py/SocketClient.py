@@ -4,18 +4,28 @@ import threading
 import queue
 import json
 from typing import Callable, Any, Optional
+from flow_control import BoundedQueue, POLICY_BLOCK
+from watchdog import NULL_HEARTBEAT
 
 
 class SocketClient:
     """Socket通信客户端类"""
 
-    def __init__(self, host='192.168.1.200', port=2000):
+    def __init__(self, host='192.168.1.200', port=2000, timeout: float = 5.0, recv_size: int = 1024,
+                 send_queue_size: int = 256, send_timeout: float = 2.0):
         self.host = host
         self.port = port
+        self.timeout = timeout  # 连接和接收超时（秒）
+        self.recv_size = recv_size  # 单次接收的最大字节数
         self.socket = None
         self.is_connected = False
         self.receive_thread = None
-        self.send_queue = queue.Queue()
+        # 待发送数据（有上限，队列满时发送方最多等待 send_timeout 秒）
+        self.send_queue = BoundedQueue('send', send_queue_size, POLICY_BLOCK, block_timeout=send_timeout)
+
+        # 线程心跳（启用线程监视时由引擎设置）
+        self.recv_heartbeat = NULL_HEARTBEAT
+        self.send_heartbeat = NULL_HEARTBEAT
 
         # 回调函数
         self.receive_callback = None
@@ -35,7 +45,7 @@ class SocketClient:
         """连接服务器"""
         try:
             self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.socket.settimeout(5)
+            self.socket.settimeout(self.timeout)
             self.socket.connect((self.host, self.port))
             self.is_connected = True
 
@@ -72,16 +82,17 @@ class SocketClient:
             self.socket = None
 
     def send_data(self, data: dict or str or bytes) -> bool:
-        """发送数据到队列"""
+        """发送数据到队列（队列满且等待超时时返回False）"""
         if self.is_connected:
-            self.send_queue.put(data)
-            return True
+            return self.send_queue.put(data)
         return False
 
     def _send_loop(self):
         """发送循环 - 直接发送原始数据"""
         print('_send_loop start')
+        heartbeat = self.send_heartbeat
         while self.is_connected:
+            heartbeat.beat()
             try:
                 data = self.send_queue.get(timeout=1)
                 if data and self.socket:
@@ -106,16 +117,21 @@ class SocketClient:
                 if self.is_connected and self.error_callback:
                     self.error_callback(f"发送数据错误: {e}")
                 break
+        heartbeat.pause()
 
     def _receive_loop(self):
         """接收循环 - 直接接收原始数据"""
         print('_receive_loop start')
+        heartbeat = self.recv_heartbeat
+        heartbeat.progress()  # 连接建立时开始计算无数据时间
         while self.is_connected:
+            heartbeat.beat()
             try:
                 # 直接接收数据，不处理任何头部
-                received_data = self.socket.recv(1024)  # 接收最多1024字节
+                received_data = self.socket.recv(self.recv_size)
                 if not received_data:
                     break
+                heartbeat.progress()
 
                 # 处理接收到的数据
                 self._process_received_data(received_data)
@@ -127,6 +143,7 @@ class SocketClient:
                     self.error_callback(f"接收数据错误: {e}")
                 break
 
+        heartbeat.pause()
         self.is_connected = False
         if self.connection_callback:
             self.connection_callback(False, "与服务器连接断开")
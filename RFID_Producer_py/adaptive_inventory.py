@@ -0,0 +1,342 @@
+# adaptive_inventory.py
+"""
+自适应盘存控制模块
+根据读写器返回的标签流调整盘存方式，代替固定间隔循环发送:
+    空闲 idle:   场内无标签，按退避间隔短时探测（开始盘存 probe_seconds 秒后停止），
+                连续探测为空时间隔加倍，直到 max_interval
+    正常 active: 场内有标签，持续盘存
+    加速 burst:  托盘到达（任一天线新标签到达速率高）或每个标签只读到很少次数（碰撞多），
+                使用加速参数持续盘存
+
+判断依据（每个控制周期计算）:
+    新标签速率:   各天线在统计窗口内首次读到的EPC数（每秒），取最高的天线判断，
+                托盘只经过一根天线时不会被其他空闲天线拉低
+    重复读取比:   读取次数 / 新标签数，偏低说明标签来不及被重复读到（碰撞或读取时间不足）
+    空周期:       控制周期内没有任何读数
+
+盘存参数放在开始盘存指令（0x82）的数据中，不同模式使用配置中的不同数据，模式切换时重新发送开始盘存指令
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+from production_stats import RateRing
+from watchdog import NULL_HEARTBEAT
+
+MODE_STOPPED = 'stopped'
+MODE_IDLE = 'idle'
+MODE_ACTIVE = 'active'
+MODE_BURST = 'burst'
+
+MODE_NAMES = {
+    MODE_STOPPED: '停止',
+    MODE_IDLE: '空闲',
+    MODE_ACTIVE: '正常',
+    MODE_BURST: '加速',
+}
+
+
+class _ReaderState:
+    """单个读写器的控制状态"""
+
+    __slots__ = ('mode', 'running', 'interval', 'next_probe', 'probe_until', 'reads', 'new_tags',
+                 'empty_ticks', 'calm_since', 'seen', 'antenna_rates', 'new_rate', 'switches')
+
+    def __init__(self, min_interval: float, window: float):
+        self.mode = MODE_STOPPED
+        self.running = False  # 读写器当前是否在盘存
+        self.interval = min_interval  # 空闲探测间隔
+        self.next_probe = 0.0
+        self.probe_until = 0.0
+        self.reads = 0  # 本控制周期的读取次数
+        self.new_tags = 0  # 本控制周期的新标签数
+        self.empty_ticks = 0
+        self.calm_since = 0.0
+        self.seen: "OrderedDict[bytes, float]" = OrderedDict()  # EPC -> 最近读到时间
+        self.antenna_rates: Dict[int, RateRing] = {}
+        self.new_rate = RateRing(window / 4, 4)
+        self.switches = 0
+
+
+class AdaptiveInventory:
+    """自适应盘存控制类"""
+
+    def __init__(self, payloads: Dict[str, bytes], tick: float = 0.5, probe_seconds: float = 1.0,
+                 min_interval: float = 1.0, max_interval: float = 30.0, empty_ticks: int = 6,
+                 burst_rate: float = 20.0, min_repeat: float = 2.0, settle_seconds: float = 3.0,
+                 window: float = 2.0, forget_after: float = 30.0, max_tags: int = 50000):
+        """
+        初始化控制器
+
+        Args:
+            payloads: 各模式的开始盘存指令数据 {'idle': ..., 'active': ..., 'burst': ...}
+            tick: 控制周期（秒）
+            probe_seconds: 空闲时每次探测的盘存时长（秒）
+            min_interval: 空闲探测的最小间隔（秒）
+            max_interval: 空闲探测的最大间隔（秒）
+            empty_ticks: 连续多少个控制周期没有读数后进入空闲
+            burst_rate: 任一天线的新标签速率（个/秒）达到该值时进入加速模式
+            min_repeat: 重复读取比低于该值且有新标签时进入加速模式
+            settle_seconds: 所有天线的新标签速率低于 burst_rate 一半持续该时间后退出加速模式
+            window: 速率统计窗口（秒）
+            forget_after: EPC超过该时间未读到后，再次读到时视为新标签（秒）
+            max_tags: 每个读写器最多记录的EPC数量
+        """
+        self.payloads = payloads
+        self.tick = tick
+        self.probe_seconds = probe_seconds
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.empty_ticks = empty_ticks
+        self.burst_rate = burst_rate
+        self.min_repeat = min_repeat
+        self.settle_seconds = settle_seconds
+        self.window = window
+        self.forget_after = forget_after
+        self.max_tags = max_tags
+
+        self.lock = threading.Lock()
+        self.states: Dict[str, _ReaderState] = {}
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.heartbeat = NULL_HEARTBEAT  # 启用线程监视时由引擎设置
+
+        # 回调函数
+        self.start_callback = None
+        self.stop_callback = None
+        self.mode_callback = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'AdaptiveInventory':
+        """由配置中的 adaptive_inventory 部分创建"""
+        payloads = {mode: bytes.fromhex(text) for mode, text in config['payloads'].items()}
+        return cls(payloads, tick=config['tick'], probe_seconds=config['probe_seconds'],
+                   min_interval=config['min_interval'], max_interval=config['max_interval'],
+                   empty_ticks=config['empty_ticks'], burst_rate=config['burst_rate'],
+                   min_repeat=config['min_repeat'], settle_seconds=config['settle_seconds'],
+                   window=config['window'], forget_after=config['forget_after'])
+
+    def set_callbacks(self,
+                      start_callback: Optional[Callable[[str, bytes], bool]] = None,
+                      stop_callback: Optional[Callable[[str], bool]] = None,
+                      mode_callback: Optional[Callable[[str, str, str], None]] = None):
+        """
+        设置回调函数（在控制线程或调用线程中调用，不持有锁）
+
+        Args:
+            start_callback: 发送开始盘存指令(读写器名称, 指令数据)，返回是否发送成功
+            stop_callback: 发送停止盘存指令(读写器名称)，返回是否发送成功
+            mode_callback: 模式变化回调(读写器名称, 原模式, 新模式)
+        """
+        self.start_callback = start_callback
+        self.stop_callback = stop_callback
+        self.mode_callback = mode_callback
+
+    # 启动和停止
+    def start(self):
+        if self.thread is not None:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        self.thread = None
+
+    def enable(self, name: str) -> bool:
+        """开始控制读写器盘存（从正常模式开始）"""
+        with self.lock:
+            state = self.states.get(name)
+            if state is None:
+                state = self.states[name] = _ReaderState(self.min_interval, self.window)
+            state.interval = self.min_interval
+            state.empty_ticks = 0
+        return self._switch(name, MODE_ACTIVE)
+
+    def disable(self, name: str) -> bool:
+        """停止控制读写器盘存并发送停止指令"""
+        return self._switch(name, MODE_STOPPED)
+
+    def forget(self, name: str):
+        """移除读写器（断开或删除时调用，不发送指令）"""
+        with self.lock:
+            self.states.pop(name, None)
+
+    # 标签流
+    def record_tag(self, name: str, antenna: int, epc: bytes, now: Optional[float] = None):
+        """
+        记录一次标签读取（接收线程）
+
+        Args:
+            name: 读写器名称
+            antenna: 天线号
+            epc: 原始EPC字节
+            now: 读取时间（time.monotonic），为空时取当前时间
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            state = self.states.get(name)
+            if state is None or state.mode == MODE_STOPPED:
+                return
+            state.reads += 1
+            seen = state.seen
+            last = seen.get(epc)
+            seen[epc] = now
+            if last is not None and now - last < self.forget_after:
+                seen.move_to_end(epc)
+                return
+            if last is not None:
+                seen.move_to_end(epc)
+            elif len(seen) > self.max_tags:
+                seen.popitem(last=False)
+            state.new_tags += 1
+            state.new_rate.add(now)
+            ring = state.antenna_rates.get(antenna)
+            if ring is None:
+                ring = state.antenna_rates[antenna] = RateRing(self.window / 4, 4)
+            ring.add(now)
+
+    def on_inventory_stopped(self, name: str):
+        """读写器应答停止盘存（接收线程）"""
+        with self.lock:
+            state = self.states.get(name)
+            if state is not None:
+                state.running = False
+
+    # 控制
+    def _run(self):
+        while not self._stop_event.wait(self.tick):
+            self.heartbeat.beat()
+            for name in list(self.states):
+                try:
+                    self.update(name)
+                except Exception as e:
+                    print(f"自适应盘存控制错误 {name}: {e}")
+
+    def update(self, name: str, now: Optional[float] = None):
+        """执行一个控制周期（控制线程）"""
+        if now is None:
+            now = time.monotonic()
+        action = None
+        with self.lock:
+            state = self.states.get(name)
+            if state is None or state.mode == MODE_STOPPED:
+                return
+            reads, new_tags = state.reads, state.new_tags
+            state.reads = state.new_tags = 0
+            state.empty_ticks = 0 if reads else state.empty_ticks + 1
+            # 各天线中最高的新标签速率
+            rate = max((ring.count(now) for ring in state.antenna_rates.values()), default=0) / self.window
+            # 本周期内每个新标签的平均读取次数
+            repeat = reads / new_tags if new_tags else float('inf')
+
+            if state.mode == MODE_IDLE:
+                if reads:
+                    action = MODE_BURST if rate >= self.burst_rate else MODE_ACTIVE
+                elif state.running and now >= state.probe_until:
+                    # 探测为空，停止盘存并加大间隔
+                    state.running = False
+                    state.next_probe = now + state.interval
+                    state.interval = min(self.max_interval, state.interval * 2)
+                    action = 'probe_stop'
+                elif not state.running and now >= state.next_probe:
+                    state.running = True
+                    state.probe_until = now + self.probe_seconds
+                    action = 'probe_start'
+            elif state.empty_ticks >= self.empty_ticks:
+                action = MODE_IDLE
+            elif state.mode == MODE_ACTIVE:
+                if rate >= self.burst_rate or (new_tags >= 2 and repeat < self.min_repeat):
+                    action = MODE_BURST
+            elif state.mode == MODE_BURST:
+                if rate >= self.burst_rate / 2:
+                    state.calm_since = 0.0
+                elif not state.calm_since:
+                    state.calm_since = now
+                elif now - state.calm_since >= self.settle_seconds:
+                    action = MODE_ACTIVE
+
+        if action == 'probe_start':
+            self._send_start(name, MODE_IDLE)
+        elif action == 'probe_stop':
+            self._send_stop(name)
+        elif action is not None:
+            self._switch(name, action, now)
+
+    def _switch(self, name: str, mode: str, now: Optional[float] = None) -> bool:
+        """切换模式并发送对应指令"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            state = self.states.get(name)
+            if state is None:
+                return False
+            old = state.mode
+            state.mode = mode
+            state.calm_since = 0.0
+            if old != mode:
+                state.switches += 1
+            if mode == MODE_IDLE:
+                # 保持当前盘存到下一次探测结束，之后按退避间隔探测
+                state.running = True
+                state.interval = self.min_interval
+                state.probe_until = now
+            elif mode == MODE_ACTIVE and old == MODE_IDLE:
+                state.interval = self.min_interval
+
+        if mode == MODE_STOPPED:
+            success = self._send_stop(name)
+        elif mode == MODE_IDLE:
+            success = True
+        else:
+            success = self._send_start(name, mode)
+        if old != mode and self.mode_callback:
+            self.mode_callback(name, old, mode)
+        return success
+
+    def _send_start(self, name: str, mode: str) -> bool:
+        if not self.start_callback:
+            return False
+        success = self.start_callback(name, self.payloads[mode])
+        with self.lock:
+            state = self.states.get(name)
+            if state is not None and success:
+                state.running = True
+        return success
+
+    def _send_stop(self, name: str) -> bool:
+        if not self.stop_callback:
+            return False
+        success = self.stop_callback(name)
+        with self.lock:
+            state = self.states.get(name)
+            if state is not None and success:
+                state.running = False
+        return success
+
+    def get_mode(self, name: str) -> str:
+        with self.lock:
+            state = self.states.get(name)
+            return state.mode if state else MODE_STOPPED
+
+    def get_stats(self) -> Dict[str, dict]:
+        """获取各读写器的控制状态"""
+        now = time.monotonic()
+        with self.lock:
+            return {
+                name: {
+                    'mode': state.mode,
+                    'running': state.running,
+                    'probe_interval': state.interval,
+                    'new_per_sec': state.new_rate.count(now) / self.window,
+                    'antenna_new_per_sec': {ant: ring.count(now) / self.window
+                                            for ant, ring in sorted(state.antenna_rates.items())},
+                    'switches': state.switches,
+                }
+                for name, state in self.states.items()
+            }
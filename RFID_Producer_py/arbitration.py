@@ -0,0 +1,121 @@
+# arbitration.py
+"""
+天线仲裁模块
+按EPC维护每个天线的RSSI指数滑动平均值，把标签归属到信号最强的天线（区域），
+并使用滞回阈值避免标签在两个天线之间来回跳动（串读噪声）
+"""
+
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+NO_SIGNAL = -1000.0  # 未读到时的RSSI占位值（dBm）
+
+
+class _TagTrack:
+    """单个EPC的仲裁状态（定长数组，按天线号索引）"""
+
+    __slots__ = ('ema', 'last_seen', 'zone')
+
+    def __init__(self, max_antennas: int):
+        self.ema = array('d', [NO_SIGNAL]) * (max_antennas + 1)
+        self.last_seen = array('d', [0.0]) * (max_antennas + 1)
+        self.zone = 0
+
+
+class AntennaArbiter:
+    """天线仲裁类"""
+
+    def __init__(self, alpha: float = 0.3, hysteresis_db: float = 3.0,
+                 stale_after: float = 2.0, max_antennas: int = 8, max_tags: int = 50000):
+        """
+        初始化天线仲裁
+
+        Args:
+            alpha: 指数滑动平均系数（越大越跟随最新读数）
+            hysteresis_db: 切换归属天线所需的最小信号优势（dB）
+            stale_after: 天线超过该时间（秒）未读到标签则视为失去信号
+            max_antennas: 最大天线号
+            max_tags: 最多跟踪的EPC数量，超出后淘汰最久未读到的EPC
+        """
+        self.alpha = alpha
+        self.hysteresis_db = hysteresis_db
+        self.stale_after = stale_after
+        self.max_antennas = max_antennas
+        self.max_tags = max_tags
+        self.tracks: "OrderedDict[bytes, _TagTrack]" = OrderedDict()
+
+        # 统计信息
+        self.zone_changes = 0
+
+    def update(self, epc: bytes, antenna: int, rssi: float,
+               now: Optional[float] = None) -> Tuple[int, bool]:
+        """
+        加入一次读数并返回仲裁结果
+
+        Args:
+            epc: 原始EPC字节
+            antenna: 读到标签的天线号
+            rssi: 信号强度（dBm）
+            now: 读取时间（time.monotonic），为空时取当前时间
+
+        Returns:
+            (归属天线号, 归属是否发生变化)
+        """
+        if antenna <= 0 or antenna > self.max_antennas:
+            return antenna, False
+        if now is None:
+            now = time.monotonic()
+
+        track = self.tracks.get(epc)
+        if track is None:
+            track = _TagTrack(self.max_antennas)
+            self.tracks[epc] = track
+            if len(self.tracks) > self.max_tags:
+                self.tracks.popitem(last=False)
+        else:
+            self.tracks.move_to_end(epc)
+
+        # 更新该天线的滑动平均值（超时后重新开始）
+        ema = track.ema
+        last_seen = track.last_seen
+        if ema[antenna] == NO_SIGNAL or now - last_seen[antenna] > self.stale_after:
+            ema[antenna] = rssi
+        else:
+            ema[antenna] += self.alpha * (rssi - ema[antenna])
+        last_seen[antenna] = now
+
+        zone = track.zone
+        if zone == 0:
+            track.zone = antenna
+            return antenna, True
+        if zone == antenna:
+            return zone, False
+
+        # 当前归属天线已失去信号，直接切换
+        if now - last_seen[zone] > self.stale_after:
+            track.zone = antenna
+            self.zone_changes += 1
+            return antenna, True
+
+        # 新天线信号强度超过当前归属天线加滞回阈值才切换
+        if ema[antenna] > ema[zone] + self.hysteresis_db:
+            track.zone = antenna
+            self.zone_changes += 1
+            return antenna, True
+
+        return zone, False
+
+    def get_zone(self, epc: bytes) -> int:
+        """获取EPC当前的归属天线号，未跟踪时返回0"""
+        track = self.tracks.get(epc)
+        return track.zone if track else 0
+
+    def forget(self, epc: bytes):
+        """不再跟踪某个EPC"""
+        self.tracks.pop(epc, None)
+
+    def clear(self):
+        """清空所有跟踪状态"""
+        self.tracks.clear()
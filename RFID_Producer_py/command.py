@@ -41,6 +41,44 @@ CMD_RFID_LOOP_STOP = bytes([0xA5, 0x5A, 0x00, 0x08, 0x8C, 0x84, 0x0D, 0x0A])
 CMD_ACK_TYPE_RFID_LOOP_START = 0x83
 CMD_ACK_TYPE_RFID_LOOP_STOP = 0x8D
 
+# 开始盘存命令字（数据为盘存参数，CMD_RFID_LOOP_START 的数据为 00 00）
+CMD_TYPE_RFID_LOOP_START = 0x82
+
+# 标签写入/读取指令（命令字，应答命令字 = 命令字 + 1）
+# 数据格式:
+#   写入: TID(12) + 存储区(1) + 起始字地址(2) + 字数(1) + 访问密码(4) + 数据
+#   读取: TID(12) + 存储区(1) + 起始字地址(2) + 字数(1)
+#   应答: TID(12) + 状态(1, 0x00成功) + 数据(读取应答)
+CMD_TYPE_RFID_WRITE = 0x86
+CMD_TYPE_RFID_READ = 0x88
+CMD_ACK_TYPE_RFID_WRITE = 0x87
+CMD_ACK_TYPE_RFID_READ = 0x89
+
+# 标签存储区
+MEM_BANK_RESERVED = 0x00
+MEM_BANK_EPC = 0x01
+MEM_BANK_TID = 0x02
+MEM_BANK_USER = 0x03
+
+
+def build_command(cmd_type: int, payload: bytes = b'') -> bytes:
+    """
+    构造 A5 5A 指令帧
+
+    Args:
+        cmd_type: 命令字
+        payload: 数据
+
+    Returns:
+        完整指令帧: A5 5A | 长度(2) | 命令字 | 数据 | 异或校验 | 0D 0A
+    """
+    length = len(payload) + 8
+    body = bytes([(length >> 8) & 0xFF, length & 0xFF, cmd_type]) + payload
+    checksum = 0
+    for b in body:
+        checksum ^= b
+    return b'\xA5\x5A' + body + bytes([checksum]) + b'\x0D\x0A'
+
 # 指令字典（可选，便于批量操作）
 device_command = {
     'CMD_RFID_LOOP_START': CMD_RFID_LOOP_START,
@@ -50,7 +88,9 @@ device_command = {
 
 device_command_ack = {
     'CMD_ACK_TYPE_RFID_LOOP_START': CMD_ACK_TYPE_RFID_LOOP_START,
-    'CMD_ACK_TYPE_RFID_LOOP_STOP': CMD_ACK_TYPE_RFID_LOOP_STOP
+    'CMD_ACK_TYPE_RFID_LOOP_STOP': CMD_ACK_TYPE_RFID_LOOP_STOP,
+    'CMD_ACK_TYPE_RFID_WRITE': CMD_ACK_TYPE_RFID_WRITE,
+    'CMD_ACK_TYPE_RFID_READ': CMD_ACK_TYPE_RFID_READ
 }
 
 # 使用示例
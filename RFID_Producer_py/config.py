@@ -0,0 +1,496 @@
+# config.py
+"""
+站点配置模块
+加载站点配置文件（JSON或TOML），与默认配置合并并校验；
+ConfigWatcher 监视配置文件，修改后自动重新加载（无需重启）
+"""
+
+import copy
+import json
+import os
+import threading
+from typing import Optional, Dict, Any, Callable, List
+from flow_control import POLICIES
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    'station_id': 'RFID-PROD-001',
+    'readers': [
+        {'name': 'reader1', 'host': '192.168.1.200', 'port': 2000},
+    ],
+    'tray': {
+        'tray_id': 'TRAY-2024-001',
+        'capacity': 32,
+        'count_antenna': 2,
+        'recent_window': 1000,
+    },
+    'arbitration': {
+        'enabled': True,
+        'alpha': 0.3,
+        'hysteresis_db': 3.0,
+        'stale_after': 2.0,
+        'max_antennas': 8,
+        'max_tags': 50000,
+    },
+    'prefilter': {
+        'enabled': False,
+        'epc_prefixes': [],  # 如 ["E280", "3000/FF00"]（前缀/掩码）
+        'min_rssi': None,  # dBm
+        'antennas': [],
+        'sample_every': 1,
+    },
+    'inventory': {
+        'auto_start': False,
+    },
+    'adaptive_inventory': {
+        'enabled': False,
+        'tick': 0.5,
+        'probe_seconds': 1.0,
+        'min_interval': 1.0,
+        'max_interval': 30.0,
+        'empty_ticks': 6,
+        'burst_rate': 20.0,
+        'min_repeat': 2.0,
+        'settle_seconds': 3.0,
+        'window': 2.0,
+        'forget_after': 30.0,
+        # 各模式的开始盘存指令数据（十六进制，按读写器协议设置盘存参数）
+        'payloads': {
+            'idle': '0000',
+            'active': '0000',
+            'burst': '0000',
+        },
+    },
+    'epc_decoder': {
+        'catalog': '',  # 商品目录文件（JSON: {GTIN: {name, manufacturer, ...}} 或带 gtin 列的CSV）
+        'max_cache': 100000,
+    },
+    'rules': {
+        'enabled': False,
+        'output_host': '127.0.0.1',  # output 动作的UDP目标（剔除控制器、PLC）
+        'output_port': 0,  # 0表示不发送
+        'expected_batch': '',  # 为空时以每个托盘第一个新增标签的批号为准
+        'cooldown': 2.0,  # 同一规则对同一EPC的冷却时间（秒）
+        'latency_budget_ms': 5.0,
+        'rules': [],  # 规则列表，格式见 rule_engine.py
+    },
+    'snapshot': {
+        'enabled': False,
+        'path': 'line_state.snap',
+        'interval': 2.0,
+        'max_age': 12 * 3600.0,  # 超过该时间（秒）的快照不再恢复，0表示不限制
+        'fsync': True,
+    },
+    'storage': {
+        'enabled': True,
+        'path': 'rfid_tags.db',
+        'batch_size': 100,
+    },
+    'export': {
+        'enabled': False,
+        'path': 'export/tags_%Y%m%d.parquet',  # 可包含日期格式，变化时切换文件（需要安装 pyarrow）
+        'row_group_size': 100000,
+        'compression': 'zstd',
+    },
+    'dedup_index': {
+        'enabled': False,
+        'path': 'epc_index.bin',
+        'capacity': 1 << 20,
+        'bloom_bits': 1 << 23,
+        'bloom_hashes': 4,
+    },
+    'upload': {
+        'enabled': False,
+        'host': '192.168.1.10',
+        'port': 9200,
+        'only_new': True,
+        'spool_dir': 'upload_spool',
+        'batch_records': 500,
+        'flush_interval': 1.0,
+        'window': 8,
+        'ack_timeout': 5.0,
+        'retry_interval': 5.0,
+        'segment_bytes': 4 * 1024 * 1024,
+        'max_disk_bytes': 256 * 1024 * 1024,
+    },
+    'feed': {
+        'enabled': False,
+        'host': '127.0.0.1',
+        'port': 9100,
+        'unix_path': '',
+        'queue_size': 10000,
+        'drop_policy': 'drop_oldest',
+    },
+    'profiling': {
+        'trace': False,
+        'trace_capacity': 65536,
+        'output_dir': '.',
+    },
+    'errors': {
+        'log_interval': 10.0,  # 同一错误两次提示的最小间隔（秒）
+        'banner_seconds': 60.0,  # 错误横幅显示最近多少秒内的错误
+        'max_entries': 200,
+    },
+    'watchdog': {
+        'enabled': True,
+        'check_interval': 1.0,
+        'stall_seconds': 15.0,  # 工作线程停顿阈值（秒，需大于 socket.connect_timeout）
+        'tk_stall_seconds': 2.0,
+        'tk_probe_ms': 100,
+        'lag_warn_ms': 200.0,
+        'silence_seconds': 30.0,  # 读写器无数据提示阈值（秒），0表示不提示
+        'dump_dir': '',  # 停顿时调用栈另存目录，为空时只输出到日志
+    },
+    'discovery': {
+        'networks': ['192.168.1.0/24'],  # 读写器搜索网段（CIDR或单个地址）
+        'ports': [2000],
+        'connect_timeout': 0.3,
+        'reply_timeout': 0.5,
+        'max_parallel': 256,
+    },
+    'socket': {
+        'connect_timeout': 5.0,
+        'recv_size': 1024,
+        'send_queue_size': 256,
+        'send_timeout': 2.0,
+    },
+    'ui': {
+        'message_limit': 100,
+        'history_size': 10000,
+        'event_interval_ms': 20,
+        'event_batch': 1000,
+        'event_queue_size': 10000,
+        'event_policy': 'drop_duplicates',
+        'stats_refresh_ms': 1000,
+        'table_rows': 10,
+        'table_max_rows': 100000,
+        'table_refresh_ms': 200,
+        'table_resort_ms': 1000,
+        'fetch_antenna': 1,
+        'after_antenna': 2,
+    },
+    'reconnect_interval': 5.0,
+    'reload_interval': 2.0,
+}
+
+# 取值范围校验: 路径 -> (最小值, 最大值)
+RANGES = {
+    ('tray', 'capacity'): (1, 100000),
+    ('tray', 'count_antenna'): (0, 255),
+    ('tray', 'recent_window'): (0, 10000000),
+    ('arbitration', 'alpha'): (0.0, 1.0),
+    ('arbitration', 'hysteresis_db'): (0.0, 100.0),
+    ('arbitration', 'max_antennas'): (1, 255),
+    ('arbitration', 'max_tags'): (1, 10000000),
+    ('prefilter', 'sample_every'): (1, 1000000),
+    ('adaptive_inventory', 'tick'): (0.05, 60.0),
+    ('adaptive_inventory', 'probe_seconds'): (0.05, 600.0),
+    ('adaptive_inventory', 'min_interval'): (0.05, 3600.0),
+    ('adaptive_inventory', 'max_interval'): (0.05, 3600.0),
+    ('adaptive_inventory', 'empty_ticks'): (1, 100000),
+    ('adaptive_inventory', 'burst_rate'): (0.0, 100000.0),
+    ('adaptive_inventory', 'window'): (0.1, 3600.0),
+    ('epc_decoder', 'max_cache'): (1, 100000000),
+    ('rules', 'output_port'): (0, 65535),
+    ('rules', 'cooldown'): (0.0, 86400.0),
+    ('rules', 'latency_budget_ms'): (0.0, 60000.0),
+    ('snapshot', 'interval'): (0.0, 3600.0),
+    ('snapshot', 'max_age'): (0.0, 365 * 86400.0),
+    ('storage', 'batch_size'): (1, 1000000),
+    ('upload', 'port'): (1, 65535),
+    ('upload', 'batch_records'): (1, 65535),
+    ('upload', 'window'): (1, 1024),
+    ('feed', 'port'): (0, 65535),
+    ('feed', 'queue_size'): (1, 10000000),
+    ('profiling', 'trace_capacity'): (1, 10000000),
+    ('export', 'row_group_size'): (1000, 10000000),
+    ('errors', 'log_interval'): (0.0, 86400.0),
+    ('errors', 'banner_seconds'): (1.0, 86400.0),
+    ('errors', 'max_entries'): (1, 100000),
+    ('watchdog', 'check_interval'): (0.05, 60.0),
+    ('watchdog', 'stall_seconds'): (0.1, 3600.0),
+    ('watchdog', 'tk_stall_seconds'): (0.1, 3600.0),
+    ('watchdog', 'tk_probe_ms'): (10, 10000),
+    ('watchdog', 'lag_warn_ms'): (1.0, 60000.0),
+    ('watchdog', 'silence_seconds'): (0.0, 86400.0),
+    ('discovery', 'connect_timeout'): (0.01, 60.0),
+    ('discovery', 'reply_timeout'): (0.01, 60.0),
+    ('discovery', 'max_parallel'): (1, 4096),
+    ('socket', 'connect_timeout'): (0.1, 600.0),
+    ('socket', 'recv_size'): (64, 16 * 1024 * 1024),
+    ('socket', 'send_queue_size'): (1, 1000000),
+    ('socket', 'send_timeout'): (0.0, 600.0),
+    ('ui', 'message_limit'): (1, 100000),
+    ('ui', 'event_interval_ms'): (1, 10000),
+    ('ui', 'event_batch'): (1, 1000000),
+    ('ui', 'event_queue_size'): (1, 10000000),
+    ('ui', 'stats_refresh_ms'): (100, 60000),
+    ('ui', 'table_rows'): (1, 200),
+    ('ui', 'table_refresh_ms'): (20, 60000),
+    ('ui', 'table_resort_ms'): (20, 600000),
+    ('reconnect_interval',): (0.0, 3600.0),
+    ('reload_interval',): (0.0, 3600.0),
+}
+
+CHOICES = {
+    ('feed', 'drop_policy'): ('drop_oldest', 'drop_newest', 'disconnect'),
+    ('ui', 'event_policy'): POLICIES,
+    ('export', 'compression'): ('zstd', 'snappy', 'gzip', 'none'),
+}
+
+
+class ConfigError(ValueError):
+    """配置错误"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__('配置错误:\n  ' + '\n  '.join(errors))
+        self.errors = errors
+
+
+def merge_config(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """递归合并配置，override中的值覆盖base"""
+    result = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(result.get(key), dict):
+            result[key] = merge_config(result[key], value)
+        else:
+            result[key] = copy.deepcopy(value)
+    return result
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    加载配置
+
+    Args:
+        path: JSON配置文件路径，为空时返回默认配置
+
+    Returns:
+        合并后的配置字典
+    """
+    if not path:
+        return copy.deepcopy(DEFAULT_CONFIG)
+
+    if path.lower().endswith('.toml'):
+        if tomllib is None:
+            raise ValueError("读取TOML配置需要 Python 3.11 或安装 tomli: pip install tomli")
+        with open(path, 'rb') as f:
+            data = tomllib.load(f)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise ValueError(f"配置文件格式错误: {path}")
+
+    config = merge_config(DEFAULT_CONFIG, data)
+    validate_config(config)
+    return config
+
+
+def validate_config(config: Dict[str, Any]):
+    """
+    校验配置（未知的键、类型、取值范围），有错误时抛出 ConfigError
+
+    Args:
+        config: 合并后的配置
+    """
+    errors: List[str] = []
+    _check_types(DEFAULT_CONFIG, config, (), errors)
+
+    for path, (low, high) in RANGES.items():
+        value = _get_path(config, path)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and not low <= value <= high:
+            errors.append(f"{'.'.join(path)} = {value} 超出范围 [{low}, {high}]")
+    for path, choices in CHOICES.items():
+        value = _get_path(config, path)
+        if value not in choices:
+            errors.append(f"{'.'.join(path)} = {value!r} 必须是 {', '.join(choices)} 之一")
+
+    payloads = _get_path(config, ('adaptive_inventory', 'payloads'))
+    if isinstance(payloads, dict):  # 类型错误已由 _check_types 报告
+        for mode, text in payloads.items():
+            try:
+                bytes.fromhex(text)
+            except (TypeError, ValueError):
+                errors.append(f"adaptive_inventory.payloads.{mode} = {text!r} 不是十六进制数据")
+
+    from prefilter import parse_prefix
+    for prefix in _get_path(config, ('prefilter', 'epc_prefixes')) or []:
+        try:
+            parse_prefix(prefix)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"prefilter.epc_prefixes 中的 {prefix!r} 无效: {e}")
+    min_rssi = _get_path(config, ('prefilter', 'min_rssi'))
+    if min_rssi is not None and (isinstance(min_rssi, bool) or not isinstance(min_rssi, (int, float))):
+        errors.append(f"prefilter.min_rssi = {min_rssi!r} 必须是数字或不设置")
+    for antenna in _get_path(config, ('prefilter', 'antennas')) or []:
+        if not isinstance(antenna, int) or isinstance(antenna, bool) or not 0 <= antenna <= 255:
+            errors.append(f"prefilter.antennas 中的 {antenna!r} 不是有效天线号 [0, 255]")
+
+    networks = _get_path(config, ('discovery', 'networks'))
+    if isinstance(networks, list):
+        from discovery import expand_networks
+        try:
+            expand_networks(networks)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"discovery.networks: {e}")
+    for port in _get_path(config, ('discovery', 'ports')) or []:
+        if not isinstance(port, int) or not 1 <= port <= 65535:
+            errors.append(f"discovery.ports 中的 {port!r} 不是有效端口")
+
+    rules = _get_path(config, ('rules', 'rules'))
+    if isinstance(rules, list):
+        from rule_engine import compile_rules
+        try:
+            compile_rules(rules)
+        except ValueError as e:
+            errors.append(f"rules.{e}")
+
+    names = set()
+    for i, reader in enumerate(config.get('readers', [])):
+        if not isinstance(reader, dict):
+            errors.append(f"readers[{i}] 必须是对象")
+            continue
+        for key, kind in (('name', str), ('host', str), ('port', int)):
+            if not isinstance(reader.get(key), kind):
+                errors.append(f"readers[{i}].{key} 缺失或类型错误")
+        port = reader.get('port')
+        if isinstance(port, int) and not 1 <= port <= 65535:
+            errors.append(f"readers[{i}].port = {port} 超出范围 [1, 65535]")
+        if reader.get('name') in names:
+            errors.append(f"readers[{i}].name 重复: {reader.get('name')}")
+        names.add(reader.get('name'))
+
+    if errors:
+        raise ConfigError(errors)
+
+
+def _check_types(default: Dict[str, Any], config: Dict[str, Any], path: tuple, errors: List[str]):
+    """按默认配置中的值类型检查（整数可用于浮点数项，默认值为None的项不检查）"""
+    for key, value in config.items():
+        name = '.'.join(path + (key,))
+        if key not in default:
+            errors.append(f"未知配置项: {name}")
+            continue
+        expected = default[key]
+        if expected is None:
+            continue
+        if isinstance(expected, dict):
+            if not isinstance(value, dict):
+                errors.append(f"{name} 必须是对象")
+            else:
+                _check_types(expected, value, path + (key,), errors)
+        elif isinstance(expected, bool):
+            if not isinstance(value, bool):
+                errors.append(f"{name} 必须是 true/false")
+        elif isinstance(expected, float):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"{name} 必须是数字")
+        elif isinstance(expected, int):
+            if isinstance(value, bool) or not isinstance(value, int):
+                errors.append(f"{name} 必须是整数")
+        elif not isinstance(value, type(expected)):
+            errors.append(f"{name} 类型错误，应为 {type(expected).__name__}")
+
+
+def _get_path(config: Dict[str, Any], path: tuple):
+    value = config
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def changed_sections(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """比较两份配置，返回有变化的顶层配置项"""
+    return [key for key in new if old.get(key) != new[key]]
+
+
+class ConfigWatcher:
+    """配置文件监视类（按修改时间轮询，修改后重新加载并校验）"""
+
+    def __init__(self, path: str, interval: float = 2.0):
+        """
+        初始化监视
+
+        Args:
+            path: 配置文件路径
+            interval: 检查间隔（秒）
+        """
+        self.path = path
+        self.interval = interval
+        self._mtime = self._get_mtime()
+        self._stop_event = threading.Event()
+        self.thread = None
+
+        # 回调函数
+        self.reload_callback = None
+        self.error_callback = None
+
+    def set_callbacks(self,
+                      reload_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      error_callback: Optional[Callable[[str], None]] = None):
+        """
+        设置回调函数（在监视线程中调用）
+
+        Args:
+            reload_callback: 重新加载成功回调(新配置)
+            error_callback: 加载失败回调(错误信息)，失败时继续使用原配置
+        """
+        self.reload_callback = reload_callback
+        self.error_callback = error_callback
+
+    def _get_mtime(self) -> float:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return 0.0
+
+    def start(self):
+        if self.interval <= 0 or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def check(self) -> bool:
+        """检查文件是否修改，修改时重新加载，返回是否加载了新配置"""
+        mtime = self._get_mtime()
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            config = load_config(self.path)
+        except (OSError, ValueError) as e:
+            message = f"重新加载配置失败，继续使用原配置: {e}"
+            print(message)
+            if self.error_callback:
+                self.error_callback(message)
+            return False
+        print(f"配置文件已修改，重新加载: {self.path}")
+        if self.reload_callback:
+            try:
+                self.reload_callback(config)
+            except Exception as e:
+                # 应用配置失败不能结束监视线程，之后的修改仍需重新加载
+                message = f"应用新配置失败: {e}"
+                print(message)
+                if self.error_callback:
+                    self.error_callback(message)
+                return False
+        return True
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
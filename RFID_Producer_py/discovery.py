@@ -0,0 +1,199 @@
+# discovery.py
+"""
+读写器自动发现模块
+在站点网段内并行探测读写器（读写器IP变化后不需要逐个尝试地址）:
+    1. 对网段内每个地址的每个端口发起非阻塞连接（同时进行，数量上限 max_parallel）
+    2. 连接成功后发送查询指令 CMD_RFID_QUERY
+    3. 在 reply_timeout 内返回校验正确的 A5 5A 帧的地址视为读写器
+
+全部在一个线程中用 selectors 完成，/24 网段单端口约在 connect_timeout + reply_timeout 内结束
+"""
+
+import errno
+import ipaddress
+import selectors
+import socket
+import time
+from collections import namedtuple
+from typing import Callable, Iterable, List, Optional, Tuple
+from command import CMD_RFID_QUERY
+from protocol import FrameParser
+
+# 发现结果: 地址, 端口, 应答耗时（毫秒，从发起连接开始）, 应答命令字
+DiscoveredReader = namedtuple('DiscoveredReader', 'host port latency_ms response_cmd')
+
+# 非阻塞连接正在进行的返回值（Windows 为 WSAEWOULDBLOCK）
+_CONNECTING = {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, 10035}
+
+MAX_HOSTS = 4096  # 单次探测的地址数上限（避免误配大网段）
+
+
+def expand_networks(networks: Iterable[str], max_hosts: int = MAX_HOSTS) -> List[str]:
+    """
+    展开网段
+
+    Args:
+        networks: CIDR网段或单个地址，如 ["192.168.1.0/24", "10.0.0.15"]
+        max_hosts: 地址数上限
+
+    Returns:
+        地址列表（去重，保持顺序）
+
+    Raises:
+        ValueError: 格式错误或地址数超出上限
+    """
+    hosts = []
+    seen = set()
+    for text in networks:
+        network = ipaddress.ip_network(text.strip(), strict=False)
+        addresses = network.hosts() if network.num_addresses > 2 else iter(network)
+        for address in addresses:
+            host = str(address)
+            if host not in seen:
+                seen.add(host)
+                hosts.append(host)
+                if len(hosts) > max_hosts:
+                    raise ValueError(f"探测地址数超过 {max_hosts} 个，请缩小网段")
+    return hosts
+
+
+class _Probe:
+    """单个地址的探测状态"""
+
+    __slots__ = ('host', 'port', 'sock', 'started', 'deadline', 'connected', 'parser')
+
+    def __init__(self, host: str, port: int, sock: socket.socket, started: float, deadline: float):
+        self.host = host
+        self.port = port
+        self.sock = sock
+        self.started = started
+        self.deadline = deadline
+        self.connected = False
+        self.parser = None
+
+
+def discover(networks: Iterable[str], ports: Iterable[int], connect_timeout: float = 0.3,
+             reply_timeout: float = 0.5, max_parallel: int = 256, probe: bytes = CMD_RFID_QUERY,
+             progress_callback: Optional[Callable[[int, int], None]] = None) -> List[DiscoveredReader]:
+    """
+    并行探测读写器
+
+    Args:
+        networks: CIDR网段或地址列表
+        ports: 端口列表
+        connect_timeout: 单个地址的连接超时（秒）
+        reply_timeout: 连接后等待查询应答的超时（秒）
+        max_parallel: 同时进行的连接数上限（受进程文件描述符数限制）
+        probe: 查询指令
+        progress_callback: 进度回调(已完成数, 总数)
+
+    Returns:
+        应答的读写器列表（按地址、端口排序）
+    """
+    ports = list(ports)
+    targets = [(host, port) for host in expand_networks(networks) for port in ports]
+    total = len(targets)
+    pending = iter(targets)
+    selector = selectors.DefaultSelector()
+    active: List[_Probe] = []
+    found: List[DiscoveredReader] = []
+    done = 0
+    exhausted = False
+
+    def close(p: _Probe):
+        nonlocal done
+        try:
+            selector.unregister(p.sock)
+        except (KeyError, ValueError):
+            pass
+        p.sock.close()
+        active.remove(p)
+        done += 1
+
+    try:
+        while active or not exhausted:
+            # 补充新的连接
+            now = time.monotonic()
+            while not exhausted and len(active) < max_parallel:
+                target = next(pending, None)
+                if target is None:
+                    exhausted = True
+                    break
+                p = _start_connect(target[0], target[1], now, connect_timeout)
+                if p is None:
+                    done += 1
+                    continue
+                active.append(p)
+                selector.register(p.sock, selectors.EVENT_WRITE, p)
+
+            if not active:
+                break
+            timeout = max(0.0, min(p.deadline for p in active) - time.monotonic())
+            for key, mask in selector.select(timeout):
+                p = key.data
+                if not p.connected:
+                    if p.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) != 0:
+                        close(p)
+                        continue
+                    try:
+                        p.sock.send(probe)
+                    except OSError:
+                        close(p)
+                        continue
+                    p.connected = True
+                    p.parser = FrameParser(max_buffer_size=4096, check_sum=True)
+                    p.deadline = time.monotonic() + reply_timeout
+                    selector.modify(p.sock, selectors.EVENT_READ, p)
+                    continue
+                try:
+                    data = p.sock.recv(4096)
+                except (BlockingIOError, InterruptedError):
+                    continue
+                except OSError:
+                    data = b''
+                frames = p.parser.feed(data) if data else []
+                if frames:
+                    found.append(DiscoveredReader(p.host, p.port,
+                                                  round((time.monotonic() - p.started) * 1000, 1),
+                                                  frames[0][4]))
+                if frames or not data:
+                    close(p)
+
+            # 超时的探测
+            now = time.monotonic()
+            for p in [p for p in active if now >= p.deadline]:
+                close(p)
+            if progress_callback:
+                progress_callback(done, total)
+    finally:
+        for p in list(active):
+            close(p)
+        selector.close()
+
+    found.sort(key=lambda r: (ipaddress.ip_address(r.host), r.port))
+    return found
+
+
+def _start_connect(host: str, port: int, now: float, timeout: float) -> Optional[_Probe]:
+    """发起非阻塞连接，立即失败时返回None"""
+    try:
+        sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    except OSError:
+        return None
+    sock.setblocking(False)
+    err = sock.connect_ex((host, port))
+    if err not in _CONNECTING:
+        sock.close()
+        return None
+    return _Probe(host, port, sock, now, now + timeout)
+
+
+def discover_from_config(config: dict, **kwargs) -> List[DiscoveredReader]:
+    """按配置中的 discovery 部分探测"""
+    return discover(config['networks'], config['ports'], connect_timeout=config['connect_timeout'],
+                    reply_timeout=config['reply_timeout'], max_parallel=config['max_parallel'], **kwargs)
+
+
+def format_results(readers: List[DiscoveredReader]) -> Tuple[str, ...]:
+    """生成结果文本（每个读写器一行）"""
+    return tuple(f"{r.host}:{r.port}  应答 0x{r.response_cmd:02X}  {r.latency_ms}ms" for r in readers)
@@ -0,0 +1,784 @@
+# engine.py
+"""
+RFID生产引擎模块
+负责读写器管理、协议解析、托盘聚合和数据持久化，不依赖任何界面库
+界面（main.py）和无界面服务（service.py）都作为引擎的客户端
+"""
+
+import struct
+import threading
+import time
+from typing import Callable, Optional, Dict, Any, List
+from RFIDReader_CNNT import RFIDReader_CNNT
+from rfid_tag import RFIDTag
+from protocol import FrameParser
+from tray import TrayAggregator
+from production_stats import ProductionStats
+from epc_decoder import default_decoder
+from flow_control import FlowMonitor
+from watchdog import Watchdog, NULL_HEARTBEAT
+from error_aggregator import ErrorAggregator
+from profiling import Profiler, NO_TRACE, STAGE_PARSE, STAGE_DISPATCH
+from command import (CMD_ACK_TYPE_RFID_LOOP_START, CMD_ACK_TYPE_RFID_LOOP_STOP, CMD_TYPE_RFID_LOOP_START,
+                     build_command,
+                     CMD_ACK_TYPE_RFID_WRITE, CMD_ACK_TYPE_RFID_READ)
+from config import load_config, changed_sections
+
+WRITE_ACK_TYPES = (CMD_ACK_TYPE_RFID_WRITE, CMD_ACK_TYPE_RFID_READ)
+
+
+class RFIDEngine:
+    """RFID生产引擎类"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化引擎
+
+        Args:
+            config: 站点配置，为空时使用默认配置
+        """
+        self.config = config if config is not None else load_config()
+
+        # 读写器管理
+        self.readers: Dict[str, RFIDReader_CNNT] = {}
+        self.parsers: Dict[str, FrameParser] = {}
+        self._wanted: Dict[str, bool] = {}  # 读写器是否应保持连接（用于自动重连）
+
+        # 各环节队列的流控统计（读写器发送队列、界面事件队列等在创建时登记）
+        self.flow = FlowMonitor()
+
+        # 错误汇总（同一错误合并计数，限制提示频率）
+        self.errors = ErrorAggregator.from_config(self.config['errors'])
+
+        # 线程停顿监视（各线程心跳，界面另外登记Tk主循环探测）
+        self.watchdog = None
+        if self.config['watchdog']['enabled']:
+            self.watchdog = Watchdog.from_config(self.config['watchdog'])
+
+        # 托盘聚合
+        tray_cfg = self.config['tray']
+        self.tray = TrayAggregator(tray_id=tray_cfg['tray_id'],
+                                   capacity=tray_cfg['capacity'],
+                                   count_antenna=tray_cfg['count_antenna'],
+                                   recent_window=tray_cfg['recent_window'])
+        self.tray.set_callbacks(tray_completed_callback=self._on_tray_completed)
+
+        # 天线仲裁（按信号强度确定标签所在区域）
+        self.arbiter = None
+        arb_cfg = self.config['arbitration']
+        if arb_cfg['enabled']:
+            from arbitration import AntennaArbiter
+            self.arbiter = AntennaArbiter(alpha=arb_cfg['alpha'],
+                                          hysteresis_db=arb_cfg['hysteresis_db'],
+                                          stale_after=arb_cfg['stale_after'],
+                                          max_antennas=arb_cfg['max_antennas'],
+                                          max_tags=arb_cfg['max_tags'])
+
+        # 标签帧预过滤（在解析前丢弃无关读数）
+        self.prefilter = None
+        if self.config['prefilter']['enabled']:
+            from prefilter import FramePrefilter
+            self.prefilter = FramePrefilter.from_config(self.config['prefilter'])
+
+        # GS1 EPC解码（商品目录，解析标签时按GTIN查找产品信息）
+        decoder_cfg = self.config['epc_decoder']
+        default_decoder.max_cache = decoder_cfg['max_cache']
+        if decoder_cfg['catalog']:
+            try:
+                print(f"已加载商品目录: {decoder_cfg['catalog']}, "
+                      f"共 {default_decoder.load_catalog(decoder_cfg['catalog'])} 个商品")
+            except (OSError, ValueError, KeyError) as e:
+                # 目录缺失或格式错误时不使用商品目录继续启动（界面错误横幅中显示）
+                message = f"商品目录加载失败，不使用商品目录: {e}"
+                print(message)
+                self.errors.record('epc_decoder', message)
+
+        # 自适应盘存（按读取速率调整探测间隔和盘存参数）
+        self.inventory_controller = None
+        if self.config['adaptive_inventory']['enabled']:
+            from adaptive_inventory import AdaptiveInventory
+            self.inventory_controller = AdaptiveInventory.from_config(self.config['adaptive_inventory'])
+            self.inventory_controller.set_callbacks(start_callback=self._send_loop_start,
+                                                    stop_callback=self._send_loop_stop,
+                                                    mode_callback=self._on_inventory_mode)
+
+        # 性能诊断（阶段计时、cProfile、tracemalloc，运行中可开关）
+        prof_cfg = self.config['profiling']
+        self.profiler = Profiler(trace_capacity=prof_cfg['trace_capacity'],
+                                 output_dir=prof_cfg['output_dir'])
+        self.profiler.set_tracing(prof_cfg['trace'])
+
+        # 生产统计
+        self.stats = ProductionStats(max_antennas=arb_cfg['max_antennas'])
+
+        # 数据持久化
+        self.store = None
+        storage_cfg = self.config['storage']
+        if storage_cfg['enabled']:
+            from tag_store import TagStore
+            self.store = TagStore(storage_cfg['path'], storage_cfg['batch_size'])
+
+        # 列式导出（Parquet，供质量分析）
+        self.exporter = None
+        export_cfg = self.config['export']
+        if export_cfg['enabled']:
+            from tag_export import TagExporter
+            self.exporter = TagExporter.from_config(export_cfg)
+            self.flow.register(self.exporter.queue)
+
+        # 已处理EPC索引（整个生产过程的重复标签检查）
+        self.epc_index = None
+        index_cfg = self.config['dedup_index']
+        if index_cfg['enabled']:
+            from epc_index import EPCIndex
+            self.epc_index = EPCIndex.open(index_cfg['path'], capacity=index_cfg['capacity'],
+                                           bloom_bits=index_cfg['bloom_bits'],
+                                           bloom_hashes=index_cfg['bloom_hashes'])
+            print(f"已加载EPC索引: {index_cfg['path']}, 已处理 {len(self.epc_index)} 个")
+
+        # 上位系统上传（磁盘队列缓存，断线续传）
+        self.uploader = None
+        upload_cfg = self.config['upload']
+        if upload_cfg['enabled']:
+            from uploader import Uploader
+            self.uploader = Uploader(upload_cfg['host'], upload_cfg['port'],
+                                     spool_dir=upload_cfg['spool_dir'],
+                                     batch_records=upload_cfg['batch_records'],
+                                     flush_interval=upload_cfg['flush_interval'],
+                                     window=upload_cfg['window'],
+                                     ack_timeout=upload_cfg['ack_timeout'],
+                                     retry_interval=upload_cfg['retry_interval'],
+                                     segment_bytes=upload_cfg['segment_bytes'],
+                                     max_disk_bytes=upload_cfg['max_disk_bytes'])
+
+        # 本机标签事件发布
+        self.feed = None
+        feed_cfg = self.config['feed']
+        if feed_cfg['enabled']:
+            from tag_feed import TagFeedServer
+            self.feed = TagFeedServer(host=feed_cfg['host'], port=feed_cfg['port'],
+                                      unix_path=feed_cfg['unix_path'],
+                                      queue_size=feed_cfg['queue_size'],
+                                      drop_policy=feed_cfg['drop_policy'])
+
+        # 标签规则（剔除、报警，在接收线程中执行）
+        self.rules = None
+        if self.config['rules']['enabled']:
+            self.rules = self._create_rules(self.config['rules'])
+
+        # 标签状态
+        self.current_tag: Optional[RFIDTag] = None
+        self.tag_count = 0
+        self.lock = threading.Lock()
+
+        # 产线状态快照（重启后恢复当前托盘和计数）
+        self.snapshotter = None
+        snapshot_cfg = self.config['snapshot']
+        if snapshot_cfg['enabled']:
+            from snapshot import Snapshotter
+            self.restore_snapshot(snapshot_cfg['path'], snapshot_cfg['max_age'])
+            self.snapshotter = Snapshotter(self, snapshot_cfg['path'], snapshot_cfg['interval'],
+                                           snapshot_cfg['fsync'])
+
+        # 工作线程心跳（阈值包含各线程自身的等待时间）
+        stall = self.config['watchdog']['stall_seconds']
+        if self.uploader:
+            self.uploader.heartbeat = self._heartbeat('uploader', stall + upload_cfg['ack_timeout'])
+        if self.feed:
+            self.feed.heartbeat = self._heartbeat('feed', stall + 1.0)
+        if self.exporter:
+            self.exporter.heartbeat = self._heartbeat('export', stall + 1.0)
+        if self.inventory_controller:
+            self.inventory_controller.heartbeat = self._heartbeat(
+                'inventory', stall + self.config['adaptive_inventory']['tick'])
+        if self.snapshotter:
+            self.snapshotter.heartbeat = self._heartbeat('snapshot', stall + snapshot_cfg['interval'])
+
+        # 回调函数
+        self.tag_callback = None
+        self.frame_callback = None
+        self.json_callback = None
+        self.tray_callback = None
+        self.connection_callback = None
+        self.error_callback = None
+        self.alarm_callback = None
+
+        # 自动重连线程
+        self.running = False
+        self._stop_event = threading.Event()
+        self._supervisor_thread = None
+
+        for reader_cfg in self.config['readers']:
+            self.add_reader(reader_cfg['name'], reader_cfg['host'], reader_cfg['port'])
+
+    def set_callbacks(self,
+                      tag_callback: Optional[Callable[[str, RFIDTag, bool], None]] = None,
+                      frame_callback: Optional[Callable[[str, bytes], None]] = None,
+                      json_callback: Optional[Callable[[str, dict], None]] = None,
+                      tray_callback: Optional[Callable[[str, List[str]], None]] = None,
+                      connection_callback: Optional[Callable[[str, bool, str], None]] = None,
+                      error_callback: Optional[Callable[[str, str], None]] = None,
+                      alarm_callback: Optional[Callable[[str, str, RFIDTag, str], None]] = None):
+        """
+        设置回调函数（均在读写器接收线程中调用）
+
+        Args:
+            tag_callback: 标签回调(读写器名称, 标签, 是否为托盘新增)
+            frame_callback: 协议帧回调(读写器名称, 完整帧)
+            json_callback: JSON数据回调(读写器名称, 数据)
+            tray_callback: 托盘完成回调(托盘编号, EPC列表)
+            connection_callback: 连接状态回调(读写器名称, 是否连接, 信息)
+            error_callback: 错误回调(读写器名称, 错误信息)
+            alarm_callback: 规则报警回调(规则名称, 读写器名称, 标签, 报警信息)，在接收线程中调用
+        """
+        self.tag_callback = tag_callback
+        self.frame_callback = frame_callback
+        self.json_callback = json_callback
+        self.tray_callback = tray_callback
+        self.connection_callback = connection_callback
+        self.error_callback = error_callback
+        self.alarm_callback = alarm_callback
+
+    # 读写器管理
+    def add_reader(self, name: str, host: str, port: int) -> RFIDReader_CNNT:
+        """
+        添加读写器
+
+        Args:
+            name: 读写器名称
+            host: 服务器地址
+            port: 服务器端口
+
+        Returns:
+            读写器对象
+        """
+        socket_cfg = self.config['socket']
+        reader = RFIDReader_CNNT(host, port, socket_cfg['connect_timeout'], socket_cfg['recv_size'],
+                                 socket_cfg['send_queue_size'], socket_cfg['send_timeout'])
+        reader.set_callbacks(
+            receive_callback=lambda data, n=name: self._on_reader_data(n, data),
+            connection_callback=lambda connected, msg, n=name: self._on_reader_connection(n, connected, msg),
+            error_callback=lambda msg, n=name: self._on_reader_error(n, msg)
+        )
+        self.readers[name] = reader
+        self.parsers[name] = FrameParser()
+        self._wanted[name] = False
+        self.flow.register(reader.socket_client.send_queue, f"{name}.send")
+        watchdog_cfg = self.config['watchdog']
+        # 接收线程每次最多阻塞 connect_timeout，发送线程每次最多等待1秒
+        reader.socket_client.recv_heartbeat = self._heartbeat(
+            f"{name}.recv", watchdog_cfg['stall_seconds'] + socket_cfg['connect_timeout'],
+            watchdog_cfg['silence_seconds'])
+        reader.socket_client.send_heartbeat = self._heartbeat(f"{name}.send", watchdog_cfg['stall_seconds'] + 1.0)
+        return reader
+
+    def _heartbeat(self, name: str, threshold: Optional[float] = None, silence: float = 0.0):
+        """登记线程心跳，未启用线程监视时返回空心跳"""
+        if self.watchdog is None:
+            return NULL_HEARTBEAT
+        return self.watchdog.register(name, threshold, silence)
+
+    def discover_readers(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> list:
+        """
+        在配置的网段内搜索读写器（阻塞约 connect_timeout + reply_timeout 秒，不要在界面线程中调用）
+
+        Returns:
+            discovery.DiscoveredReader 列表
+        """
+        from discovery import discover_from_config
+        return discover_from_config(self.config['discovery'], progress_callback=progress_callback)
+
+    def get_reader(self, name: Optional[str] = None) -> Optional[RFIDReader_CNNT]:
+        """获取读写器，名称为空时返回第一个读写器"""
+        if name is None:
+            return next(iter(self.readers.values()), None)
+        return self.readers.get(name)
+
+    def get_reader_name(self, reader: Optional[RFIDReader_CNNT] = None) -> Optional[str]:
+        """获取读写器名称，参数为空时返回第一个读写器的名称"""
+        for name, r in self.readers.items():
+            if reader is None or r is reader:
+                return name
+        return None
+
+    def connect(self, name: str, host: Optional[str] = None, port: Optional[int] = None) -> bool:
+        """
+        连接读写器（阻塞）
+
+        Args:
+            name: 读写器名称
+            host: 新的服务器地址（可选）
+            port: 新的服务器端口（可选）
+
+        Returns:
+            连接是否成功
+        """
+        reader = self.readers[name]
+        self._wanted[name] = True
+        if reader.get_connection_status():
+            return True
+        if host is not None and port is not None:
+            reader.set_address(host, port)
+        self.parsers[name].reset()
+        success = reader.connect()
+        if success and self.config['inventory']['auto_start']:
+            self.start_inventory(name)
+        return success
+
+    def disconnect(self, name: str):
+        """断开读写器（不再自动重连）"""
+        self._wanted[name] = False
+        self.readers[name].disconnect()
+
+    def connect_all(self):
+        """并行连接所有读写器"""
+        for name in self.readers:
+            threading.Thread(target=self.connect, args=(name,), daemon=True).start()
+
+    def start_inventory(self, name: Optional[str] = None) -> bool:
+        """发送开始盘存指令（启用自适应盘存时交给控制器）"""
+        reader = self.get_reader(name)
+        if reader is None or not reader.get_connection_status():
+            return False
+        name = name or self.get_reader_name(reader)
+        if self.inventory_controller:
+            success = self.inventory_controller.enable(name)
+        else:
+            success = reader.send_single_cmd('CMD_RFID_LOOP_START')
+        if success:
+            self.stats.set_inventory(name, True)
+        return success
+
+    def stop_inventory(self, name: Optional[str] = None) -> bool:
+        """发送停止盘存指令"""
+        reader = self.get_reader(name)
+        if reader is None or not reader.get_connection_status():
+            return False
+        name = name or self.get_reader_name(reader)
+        if self.inventory_controller:
+            success = self.inventory_controller.disable(name)
+        else:
+            success = reader.send_single_cmd('CMD_RFID_LOOP_STOP')
+        if success:
+            self.stats.set_inventory(name, False)
+        return success
+
+    def _send_loop_start(self, name: str, payload: bytes) -> bool:
+        """发送带盘存参数的开始盘存指令（自适应盘存控制器调用）"""
+        reader = self.readers.get(name)
+        return reader is not None and reader.send_frame(build_command(CMD_TYPE_RFID_LOOP_START, payload))
+
+    def _send_loop_stop(self, name: str) -> bool:
+        """发送停止盘存指令（自适应盘存控制器调用，空闲探测间歇不计入停机）"""
+        reader = self.readers.get(name)
+        return reader is not None and reader.get_connection_status() and \
+            reader.send_single_cmd('CMD_RFID_LOOP_STOP')
+
+    def _create_rules(self, rules_cfg: Dict[str, Any]):
+        from rule_engine import RuleEngine
+        rules = RuleEngine.from_config(rules_cfg)
+        rules.set_callbacks(command_callback=self._send_rule_command, alarm_callback=self._on_rule_alarm)
+        return rules
+
+    def _send_rule_command(self, name: str, frame: bytes) -> bool:
+        """发送规则动作指令帧"""
+        reader = self.readers.get(name)
+        return reader is not None and reader.send_frame(frame)
+
+    def _on_rule_alarm(self, rule: str, reader_name: str, tag: RFIDTag, message: str):
+        if self.alarm_callback:
+            self.alarm_callback(rule, reader_name, tag, message)
+        else:
+            print(f"[{reader_name}] 报警 {rule}: {message}")
+
+    def _on_inventory_mode(self, name: str, old: str, new: str):
+        from adaptive_inventory import MODE_NAMES
+        print(f"读写器 {name} 盘存模式: {MODE_NAMES[old]} -> {MODE_NAMES[new]}")
+
+    def submit_write(self, tid: bytes, epc: Optional[bytes] = None, user: Optional[bytes] = None,
+                     name: Optional[str] = None):
+        """
+        提交标签写入任务（EPC/USER编码）
+
+        Args:
+            tid: 目标标签TID（12字节）
+            epc: 要写入的EPC数据
+            user: 要写入的USER数据
+            name: 读写器名称，为空时使用第一个读写器
+
+        Returns:
+            TagWriteJob
+        """
+        reader = self.get_reader(name)
+        if reader is None:
+            raise ValueError(f"读写器不存在: {name}")
+        return reader.get_write_pipeline().submit(tid, epc, user)
+
+    # 启动和停止
+    def start(self):
+        """启动引擎：连接所有读写器并启动自动重连"""
+        self.running = True
+        self._stop_event.clear()
+        if self.feed:
+            self.feed.start()
+        if self.uploader:
+            self.uploader.start()
+        if self.exporter:
+            self.exporter.start()
+        if self.inventory_controller:
+            self.inventory_controller.start()
+        if self.snapshotter:
+            self.snapshotter.start()
+        if self.watchdog:
+            self.watchdog.start()
+        self.connect_all()
+
+        if self.config['reconnect_interval'] > 0:
+            self._supervisor_thread = threading.Thread(target=self._supervise, daemon=True)
+            self._supervisor_thread.start()
+
+    def stop(self):
+        """停止引擎：断开所有读写器并写入剩余数据"""
+        self.running = False
+        self._stop_event.set()
+        if self.watchdog:
+            self.watchdog.stop()
+        if self.inventory_controller:
+            self.inventory_controller.stop()
+        for name in list(self.readers):
+            self.disconnect(name)
+        if self.feed:
+            self.feed.stop()
+        if self.snapshotter:
+            self.snapshotter.stop()
+        if self.uploader:
+            self.uploader.stop()
+        if self.store:
+            self.store.close()
+        if self.exporter:
+            self.exporter.close()
+        if self.epc_index is not None:
+            self.epc_index.close()
+        if self.rules:
+            self.rules.close()
+
+    def _supervise(self):
+        """自动重连线程函数"""
+        # 重连时逐个同步连接，阈值包含重连间隔和各读写器的连接超时
+        heartbeat = self._heartbeat('supervisor', self.config['watchdog']['stall_seconds']
+                                    + self.config['reconnect_interval']
+                                    + self.config['socket']['connect_timeout'] * len(self.readers))
+        while not self._stop_event.wait(self.config['reconnect_interval'] or 1.0):
+            heartbeat.beat()
+            if self.store:
+                self.store.flush()
+            if self.exporter:
+                self.exporter.check_rotate()
+            if self.epc_index is not None:
+                self.epc_index.flush()
+            for name, reader in list(self.readers.items()):
+                if self._wanted.get(name) and not reader.get_connection_status():
+                    print(f"读写器 {name} 未连接，尝试重连")
+                    self.connect(name)
+        heartbeat.pause()
+
+    # 数据处理
+    def process_frame(self, reader_name: str, frame: bytes, trace_slot: int = NO_TRACE,
+                      receive_ns: int = 0) -> Optional[RFIDTag]:
+        """
+        处理一个完整的协议帧
+
+        Args:
+            reader_name: 读写器名称
+            frame: 完整帧
+            trace_slot: 阶段计时槽位
+            receive_ns: 收到数据的时间（time.monotonic_ns），用于统计规则动作耗时
+
+        Returns:
+            标签帧解析成功时返回标签对象，否则返回None
+        """
+        if self.frame_callback:
+            self.frame_callback(reader_name, frame)
+
+        cmd = frame[4]
+        if cmd in WRITE_ACK_TYPES:
+            reader = self.readers.get(reader_name)
+            if reader is not None and reader.write_pipeline is not None:
+                reader.write_pipeline.on_frame(frame)
+            return None
+
+        if cmd == CMD_ACK_TYPE_RFID_LOOP_STOP:
+            if self.inventory_controller:
+                # 空闲探测间歇的停止应答不计入停机
+                self.inventory_controller.on_inventory_stopped(reader_name)
+            else:
+                self.stats.set_inventory(reader_name, False)
+            return None
+
+        if cmd != CMD_ACK_TYPE_RFID_LOOP_START:
+            return None
+
+        if self.prefilter is not None and not self.prefilter.accept(frame):
+            return None
+
+        tag = RFIDTag()
+        if not tag.from_bytes(frame):
+            self._on_reader_error(reader_name, tag.error_message)
+            return None
+        tracer = self.profiler.tracer
+        tracer.mark(trace_slot, STAGE_PARSE)
+        tag.trace_slot = trace_slot
+        if self.inventory_controller:
+            self.inventory_controller.record_tag(reader_name, tag.antenna_num, tag.epc_bytes)
+
+        with self.lock:
+            if self.arbiter:
+                tag.zone_antenna, tag.zone_changed = self.arbiter.update(
+                    tag.epc_bytes, tag.antenna_num, tag.rssi, time.monotonic())
+            else:
+                tag.zone_antenna, tag.zone_changed = tag.antenna_num, True
+            self.current_tag = tag
+            self.tag_count += 1
+            tray_id = self.tray.tray_id  # 加入前的托盘编号（加入后可能已切换到下一托盘）
+            is_new = self.tray.add(tag)
+            if is_new:
+                tag.tray_id = tray_id
+                if self.epc_index is not None:
+                    tag.duplicate = not self.epc_index.add(tag.epc_bytes)
+
+        # 规则动作优先于统计、存储和发布执行
+        rules = self.rules
+        if rules is not None:
+            rules.evaluate(reader_name, tag, is_new, tray_id, receive_ns)
+
+        self.stats.record_tag(reader_name, tag.antenna_num, is_new, zone=tag.zone_antenna)
+
+        if self.store:
+            self.store.add(reader_name, tag, tray_id)
+
+        if self.exporter:
+            self.exporter.add(reader_name, tag, is_new, tray_id)
+
+        if self.uploader and (is_new or not self.config['upload']['only_new']):
+            self.uploader.add_tag(reader_name, tag, is_new, tray_id)
+
+        if self.feed:
+            self.feed.publish(reader_name, tag, is_new, tray_id)
+
+        tracer.mark(trace_slot, STAGE_DISPATCH)
+        if self.tag_callback:
+            self.tag_callback(reader_name, tag, is_new)
+
+        return tag
+
+    def set_tray(self, tray_id: str, capacity: Optional[int] = None):
+        """设置当前托盘编号和装载数量"""
+        with self.lock:
+            self.tray.set_tray(tray_id, capacity)
+
+    def restore_snapshot(self, path: str, max_age: float = 0.0) -> bool:
+        """
+        从快照恢复当前托盘、最近EPC窗口和计数
+
+        Args:
+            path: 快照文件路径
+            max_age: 快照的最长有效时间（秒），0表示不限制
+
+        Returns:
+            是否已恢复
+        """
+        from snapshot import load_snapshot
+        start = time.perf_counter()
+        try:
+            state = load_snapshot(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"读取快照失败，不恢复产线状态: {e}")
+            return False
+        if state is None:
+            return False
+        if max_age > 0 and state.age > max_age:
+            print(f"快照已过期（{state.age / 3600:.1f}小时前），不恢复产线状态")
+            return False
+
+        with self.lock:
+            self.tray.restore(state.tray_id, state.tray_epcs, state.recent,
+                              state.completed_trays, state.total_count)
+            self.tag_count = state.tag_count
+            self.current_tag = state.current_tag
+        if state.counters:
+            counters = dict(state.counters)
+            counters['downtime'] += max(0.0, state.age)  # 进程停止期间计为停机
+            self.stats.restore_counters(counters)
+        print(f"已从快照恢复产线状态: 托盘 {state.tray_id} 已装载 {len(state.tray_epcs)} 个, "
+              f"最近窗口 {len(state.recent)} 个, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+        if self.uploader and state.upload_next_seq > self.uploader.queue.next_seq:
+            print(f"警告: 上传队列序号 {self.uploader.queue.next_seq} 小于快照记录的 "
+                  f"{state.upload_next_seq}，磁盘队列可能已丢失")
+        return True
+
+    # 配置热加载
+    def apply_config(self, config: Dict[str, Any]) -> List[str]:
+        """
+        应用重新加载的配置（运行中可调整的部分立即生效）
+
+        可立即生效: 读写器列表和地址、托盘装载数量和计数天线、天线仲裁参数、预过滤、标签规则、
+                   盘存参数、批量提交大小、阶段计时、自动重连间隔、界面参数、错误汇总
+        需要重启:   数据库、EPC索引、列式导出、上传、本机事件发布、读写器超时和接收缓冲、线程监视
+
+        Args:
+            config: 新配置（已校验）
+
+        Returns:
+            变更说明列表
+        """
+        old = self.config
+        messages = []
+        sections = changed_sections(old, config)
+
+        # 先创建新的预过滤，失败时不修改任何状态
+        prefilter = self.prefilter
+        if 'prefilter' in sections:
+            prefilter = None
+            if config['prefilter']['enabled']:
+                from prefilter import FramePrefilter
+                try:
+                    prefilter = FramePrefilter.from_config(config['prefilter'])
+                except (ValueError, TypeError) as e:
+                    return [f"预过滤配置无效，继续使用原配置: {e}"]
+
+        with self.lock:
+            self.config = config
+            if 'tray' in sections:
+                tray_cfg = config['tray']
+                self.tray.capacity = tray_cfg['capacity']
+                self.tray.count_antenna = tray_cfg['count_antenna']
+                messages.append(f"托盘参数: 装载数量 {tray_cfg['capacity']}, 计数天线 {tray_cfg['count_antenna']}")
+            if 'arbitration' in sections and self.arbiter:
+                arb_cfg = config['arbitration']
+                self.arbiter.alpha = arb_cfg['alpha']
+                self.arbiter.hysteresis_db = arb_cfg['hysteresis_db']
+                self.arbiter.stale_after = arb_cfg['stale_after']
+                messages.append("天线仲裁参数已更新")
+            if 'prefilter' in sections:
+                self.prefilter = prefilter
+                messages.append(f"预过滤已{'更新' if self.prefilter else '关闭'}")
+
+        if 'errors' in sections:
+            errors_cfg = config['errors']
+            self.errors.log_interval = errors_cfg['log_interval']
+            self.errors.banner_seconds = errors_cfg['banner_seconds']
+            self.errors.max_entries = errors_cfg['max_entries']
+        if 'storage' in sections and self.store:
+            self.store.batch_size = config['storage']['batch_size']
+        if 'epc_decoder' in sections and config['epc_decoder']['catalog']:
+            try:
+                count = default_decoder.load_catalog(config['epc_decoder']['catalog'])
+                messages.append(f"商品目录已重新加载，共 {count} 个商品")
+            except (OSError, ValueError, KeyError) as e:
+                messages.append(f"商品目录加载失败: {e}")
+        if 'rules' in sections:
+            old_rules = self.rules
+            try:
+                self.rules = self._create_rules(config['rules']) if config['rules']['enabled'] else None
+                messages.append(f"标签规则已{'更新' if self.rules else '关闭'}")
+                if old_rules:
+                    old_rules.close()
+            except (OSError, ValueError) as e:
+                messages.append(f"标签规则加载失败: {e}")
+        if 'profiling' in sections:
+            messages.append(self.profiler.set_tracing(config['profiling']['trace']))
+        if 'readers' in sections:
+            messages.extend(self._apply_readers(config['readers']))
+
+        for key in ('dedup_index', 'export', 'upload', 'feed', 'socket', 'adaptive_inventory', 'snapshot', 'watchdog'):
+            if key in sections:
+                messages.append(f"配置项 {key} 已修改，重启后生效")
+        if config['storage']['path'] != old['storage']['path'] or \
+                config['storage']['enabled'] != old['storage']['enabled']:
+            messages.append("数据库配置已修改，重启后生效")
+        return messages
+
+    def _apply_readers(self, readers_cfg: List[Dict[str, Any]]) -> List[str]:
+        """按新配置增加、删除读写器或修改地址"""
+        messages = []
+        wanted = {r['name']: r for r in readers_cfg}
+        for name in list(self.readers):
+            if name not in wanted:
+                self.disconnect(name)
+                del self.readers[name]
+                self.parsers.pop(name, None)
+                self._wanted.pop(name, None)
+                self.flow.unregister(f"{name}.send")
+                if self.watchdog:
+                    self.watchdog.unregister(f"{name}.recv")
+                    self.watchdog.unregister(f"{name}.send")
+                messages.append(f"已移除读写器 {name}")
+
+        for name, reader_cfg in wanted.items():
+            reader = self.readers.get(name)
+            if reader is None:
+                self.add_reader(name, reader_cfg['host'], reader_cfg['port'])
+                messages.append(f"已添加读写器 {name} {reader_cfg['host']}:{reader_cfg['port']}")
+                if self.running:
+                    threading.Thread(target=self.connect, args=(name,), daemon=True).start()
+            elif (reader.host, reader.port) != (reader_cfg['host'], reader_cfg['port']):
+                was_wanted = self._wanted.get(name, False)
+                self.disconnect(name)
+                reader.set_address(reader_cfg['host'], reader_cfg['port'])
+                messages.append(f"读写器 {name} 地址改为 {reader_cfg['host']}:{reader_cfg['port']}")
+                if was_wanted:
+                    threading.Thread(target=self.connect, args=(name,), daemon=True).start()
+        return messages
+
+    # 读写器回调处理
+    def _on_reader_data(self, name: str, data):
+        """读写器数据接收回调"""
+        if isinstance(data, dict):
+            if self.json_callback:
+                self.json_callback(name, data)
+            return
+
+        self.profiler.run(self.feed_bytes, name, data)
+
+    def feed_bytes(self, reader_name: str, data: bytes):
+        """
+        输入一段原始字节流（实时接收或离线回放），切分成帧后逐帧处理
+
+        Args:
+            reader_name: 读写器名称（数据来源）
+            data: 原始字节数据
+        """
+        receive_ns = time.monotonic_ns()
+        parser = self.parsers.get(reader_name)
+        if parser is None:
+            parser = self.parsers[reader_name] = FrameParser()
+        frames = parser.feed(data)
+        if not frames:
+            return
+        tracer = self.profiler.tracer
+        frame_ns = time.monotonic_ns() if tracer.enabled else 0
+        for frame in frames:
+            self.process_frame(reader_name, frame, tracer.begin(receive_ns, frame_ns), receive_ns)
+
+    def _on_reader_connection(self, name: str, connected: bool, message: str):
+        """读写器连接状态回调"""
+        self.stats.set_connected(name, connected)
+        if not connected and self.inventory_controller:
+            self.inventory_controller.forget(name)
+        if self.connection_callback:
+            self.connection_callback(name, connected, message)
+
+    def _on_reader_error(self, name: str, error_msg: str):
+        """读写器错误回调（重复错误按间隔合并后再通知）"""
+        notify, message = self.errors.record(name, error_msg)
+        if notify and self.error_callback:
+            self.error_callback(name, message)
+
+    def _on_tray_completed(self, tray_id: str, epcs: List[str]):
+        """托盘完成回调"""
+        print(f"托盘 {tray_id} 已完成，共 {len(epcs)} 个标签")
+        self.stats.record_tray()
+        if self.uploader:
+            self.uploader.add_tray(tray_id, len(epcs))
+        if self.tray_callback:
+            self.tray_callback(tray_id, epcs)
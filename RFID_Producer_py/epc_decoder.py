@@ -0,0 +1,246 @@
+# epc_decoder.py
+"""
+GS1 EPC解码模块
+将96位EPC解码为 标头 / 过滤值 / 分区 / 厂商识别代码 / 项目代码 / 序列号，支持:
+    SGTIN-96 (0x30)  商品（GTIN + 序列号）
+    SSCC-96  (0x31)  物流单元
+    SGLN-96  (0x32)  位置
+    GRAI-96  (0x33)  可回收资产
+
+各编码方案的分区表在导入时预先计算为 (移位, 掩码, 位数) 形式，解码只做整数移位和查表。
+同一商品（厂商识别代码 + 项目代码）的标签共用一个 Product 对象:
+    键缓存:   EPC中序列号之前的高位整数 -> 解码出的公共字段（命中时只需取出序列号）
+    商品缓存: (厂商识别代码, 项目代码) -> Product（商品目录中的名称、生产企业等）
+批量解码（decode_many / decode_buffer）用于回放、导出等需要一次处理大量EPC的场合
+"""
+
+import csv
+import json
+import struct
+import threading
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+HEADER_SGTIN_96 = 0x30
+HEADER_SSCC_96 = 0x31
+HEADER_SGLN_96 = 0x32
+HEADER_GRAI_96 = 0x33
+
+EPC_BITS = 96
+EPC_BYTES = 12
+
+# 分区表: 分区值 -> (厂商识别代码位数, 厂商识别代码十进制位数, 项目代码位数, 项目代码十进制位数)
+# GS1 EPC Tag Data Standard，厂商识别代码 + 项目代码 共同占用固定位数
+PARTITIONS = {
+    # SGTIN: 指示符 + 商品项目代码
+    HEADER_SGTIN_96: ('sgtin', 38, (
+        (40, 12, 4, 1), (37, 11, 7, 2), (34, 10, 10, 3), (30, 9, 14, 4),
+        (27, 8, 17, 5), (24, 7, 20, 6), (20, 6, 24, 7))),
+    # SSCC: 扩展位 + 系列代码（序列号位为24位保留位）
+    HEADER_SSCC_96: ('sscc', 24, (
+        (40, 12, 18, 5), (37, 11, 21, 6), (34, 10, 24, 7), (30, 9, 28, 8),
+        (27, 8, 31, 9), (24, 7, 34, 10), (20, 6, 38, 11))),
+    # SGLN: 位置参考代码 + 41位扩展
+    HEADER_SGLN_96: ('sgln', 41, (
+        (40, 12, 1, 0), (37, 11, 4, 1), (34, 10, 7, 2), (30, 9, 11, 3),
+        (27, 8, 14, 4), (24, 7, 17, 5), (20, 6, 21, 6))),
+    # GRAI: 资产类型代码 + 38位序列号
+    HEADER_GRAI_96: ('grai', 38, (
+        (40, 12, 4, 0), (37, 11, 7, 1), (34, 10, 10, 2), (30, 9, 14, 3),
+        (27, 8, 17, 4), (24, 7, 20, 5), (20, 6, 24, 6))),
+}
+
+# 解码结果
+DecodedEPC = namedtuple('DecodedEPC', 'scheme filter company_prefix reference serial product')
+# 商品（同一厂商识别代码和项目代码的标签共用）
+Product = namedtuple('Product', 'gtin company_prefix item_reference name manufacturer '
+                                'license_number package_spec package_method')
+
+_EPC_STRUCT = struct.Struct('>QI')  # 96位EPC拆为高64位和低32位
+_new_tuple = tuple.__new__  # 直接创建namedtuple（跳过参数处理，缓存命中时使用）
+
+
+def _build_tables():
+    """
+    预先计算各编码方案的字段位置
+
+    Returns:
+        {标头: (方案名, 序列号位数, 序列号掩码, [(厂商代码移位, 厂商代码掩码, 厂商代码十进制位数,
+                                               项目代码掩码, 项目代码十进制位数) 按分区值])}
+    """
+    tables = {}
+    for header, (scheme, serial_bits, partitions) in PARTITIONS.items():
+        rows = []
+        for cp_bits, cp_digits, ref_bits, ref_digits in partitions:
+            rows.append((serial_bits + ref_bits, (1 << cp_bits) - 1, cp_digits,
+                         (1 << ref_bits) - 1, ref_digits))
+        tables[header] = (scheme, serial_bits, (1 << serial_bits) - 1, tuple(rows))
+    return tables
+
+
+TABLES = _build_tables()
+
+
+def gs1_check_digit(digits: str) -> str:
+    """计算GS1校验码（从右往左奇数位乘3）"""
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        total += int(ch) * (3 if i % 2 == 0 else 1)
+    return str((10 - total % 10) % 10)
+
+
+def sgtin_to_gtin(company_prefix: str, item_reference: str) -> str:
+    """由厂商识别代码和项目代码（含指示符）生成GTIN-14"""
+    body = item_reference[:1] + company_prefix + item_reference[1:]
+    return body + gs1_check_digit(body)
+
+
+def to_uri(decoded: DecodedEPC) -> str:
+    """生成EPC纯标识URI，如 urn:epc:id:sgtin:0614141.812345.6789"""
+    parts = [decoded.company_prefix, decoded.reference]
+    if decoded.scheme != 'sscc':
+        parts.append(str(decoded.serial))
+    return f"urn:epc:id:{decoded.scheme}:{'.'.join(parts)}"
+
+
+class EPCDecoder:
+    """GS1 EPC解码类（带商品缓存）"""
+
+    def __init__(self, catalog: Optional[Dict[str, dict]] = None, max_cache: int = 100000):
+        """
+        初始化解码器
+
+        Args:
+            catalog: 商品目录 {GTIN-14: {'name':..., 'manufacturer':..., ...}}
+            max_cache: 键缓存的最大条目数，超出后清空重建
+        """
+        self.catalog: Dict[str, dict] = catalog or {}
+        self.max_cache = max_cache
+        self.lock = threading.Lock()
+        self._keys: Dict[int, Tuple] = {}  # EPC高位 -> ((方案, 过滤值, 厂商代码, 项目代码), 商品)
+        self._products: Dict[Tuple[str, str], Product] = {}
+
+        # 统计信息（多个接收线程同时解码时为近似值）
+        self.hits = 0
+        self.misses = 0
+
+    # 商品目录
+    def set_catalog(self, catalog: Dict[str, dict]):
+        """替换商品目录并清除缓存"""
+        with self.lock:
+            self.catalog = catalog
+            self._keys = {}
+            self._products = {}
+
+    def load_catalog(self, path: str) -> int:
+        """
+        加载商品目录文件
+
+        Args:
+            path: JSON（{GTIN: {...}}）或CSV（表头包含 gtin 列）文件
+
+        Returns:
+            商品数量
+        """
+        if path.lower().endswith('.csv'):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                catalog = {row['gtin'].strip().zfill(14): row for row in csv.DictReader(f)}
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                catalog = {gtin.zfill(14): info for gtin, info in json.load(f).items()}
+        self.set_catalog(catalog)
+        return len(catalog)
+
+    def _get_product(self, company_prefix: str, item_reference: str) -> Product:
+        """获取商品对象（同一商品只创建一次）"""
+        key = (company_prefix, item_reference)
+        product = self._products.get(key)
+        if product is None:
+            gtin = sgtin_to_gtin(company_prefix, item_reference)
+            info = self.catalog.get(gtin, {})
+            product = Product(gtin, company_prefix, item_reference,
+                              info.get('name', ''), info.get('manufacturer', ''),
+                              info.get('license_number', ''), info.get('package_spec', ''),
+                              info.get('package_method', ''))
+            self._products[key] = product
+        return product
+
+    # 解码
+    def decode(self, epc: bytes) -> Optional[DecodedEPC]:
+        """
+        解码单个EPC
+
+        Args:
+            epc: 原始EPC字节（12字节）
+
+        Returns:
+            DecodedEPC，不是支持的GS1编码时返回None
+        """
+        if len(epc) != EPC_BYTES:
+            return None
+        return self._decode_int(int.from_bytes(epc, 'big'))
+
+    def _decode_int(self, value: int) -> Optional[DecodedEPC]:
+        header = value >> 88
+        table = TABLES.get(header)
+        if table is None:
+            return None
+        scheme, serial_bits, serial_mask, rows = table
+
+        key = value >> serial_bits
+        cached = self._keys.get(key)
+        if cached is not None:
+            self.hits += 1
+            return _new_tuple(DecodedEPC, cached[0] + (value & serial_mask, cached[1]))
+
+        self.misses += 1
+        filter_value = (value >> 85) & 0x7
+        partition = (value >> 82) & 0x7
+        if partition >= len(rows):
+            return None
+        cp_shift, cp_mask, cp_digits, ref_mask, ref_digits = rows[partition]
+        company_prefix = (value >> cp_shift) & cp_mask
+        reference = (value >> serial_bits) & ref_mask
+        if company_prefix >= 10 ** cp_digits or (ref_digits and reference >= 10 ** ref_digits):
+            return None  # 超出十进制位数，不是有效编码
+        cp_text = str(company_prefix).zfill(cp_digits)
+        ref_text = str(reference).zfill(ref_digits) if ref_digits else ''
+
+        with self.lock:
+            product = self._get_product(cp_text, ref_text) if header == HEADER_SGTIN_96 else None
+            if len(self._keys) >= self.max_cache:
+                self._keys = {}
+            self._keys[key] = ((scheme, filter_value, cp_text, ref_text), product)
+        return DecodedEPC(scheme, filter_value, cp_text, ref_text, value & serial_mask, product)
+
+    def decode_many(self, epcs: Iterable[bytes]) -> List[Optional[DecodedEPC]]:
+        """批量解码EPC（顺序与输入一致）"""
+        decode_int = self._decode_int
+        from_bytes = int.from_bytes
+        return [decode_int(from_bytes(epc, 'big')) if len(epc) == EPC_BYTES else None
+                for epc in epcs]
+
+    def decode_buffer(self, data: bytes) -> List[Optional[DecodedEPC]]:
+        """
+        批量解码连续存放的EPC（如二进制批次中的EPC列）
+
+        Args:
+            data: N × 12字节
+
+        Returns:
+            解码结果列表
+        """
+        if len(data) % EPC_BYTES:
+            raise ValueError(f"数据长度 {len(data)} 不是 {EPC_BYTES} 的整数倍")
+        decode_int = self._decode_int
+        return [decode_int((high << 32) | low) for high, low in _EPC_STRUCT.iter_unpack(data)]
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        return {'hits': self.hits, 'misses': self.misses, 'keys': len(self._keys),
+                'products': len(self._products), 'catalog': len(self.catalog)}
+
+
+# 默认解码器（RFIDTag 解析时使用，引擎启动时加载商品目录）
+default_decoder = EPCDecoder()
+decode_epc = default_decoder.decode
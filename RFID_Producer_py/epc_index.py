@@ -0,0 +1,302 @@
+# epc_index.py
+"""
+EPC去重索引模块
+以原始12字节EPC为键的紧凑哈希集合（开放寻址，定长槽位存放在连续字节数组中），
+可选布隆过滤器前置快速排除；支持保存到磁盘并在重启时通过mmap直接映射加载
+
+与Python set保存显示用十六进制字符串相比，每个EPC只占约13字节（槽位+占用标记）
+
+文件格式（小端）:
+    头部: 魔数'EPCI' | 版本(2) | 键长(2) | 槽位数(8) | 已用数(8) | 布隆位数(8) | 布隆哈希数(2)
+    占用标记: 槽位数字节
+    槽位数据: 槽位数 × 键长字节
+    布隆过滤器: 布隆位数/8 字节
+"""
+
+import mmap
+import os
+import struct
+import threading
+from typing import Optional
+
+MAGIC = b'EPCI'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQQH')
+EPC_LEN = 12
+MAX_LOAD = 0.7
+_MIX = 0x9E3779B97F4A7C15
+_MASK64 = (1 << 64) - 1
+
+
+def _hash_pair(key: bytes):
+    """由EPC计算两个稳定的64位哈希值（不受PYTHONHASHSEED影响）"""
+    value = int.from_bytes(key, 'little')
+    h1 = ((value & _MASK64) * _MIX ^ (value >> 64) * 0xC2B2AE3D27D4EB4F) & _MASK64
+    h1 ^= h1 >> 29
+    h2 = ((h1 * 0xBF58476D1CE4E5B9) & _MASK64) | 1
+    return h1, h2
+
+
+class EPCIndex:
+    """EPC去重索引类"""
+
+    def __init__(self, capacity: int = 1 << 20, bloom_bits: int = 0, bloom_hashes: int = 4,
+                 key_size: int = EPC_LEN):
+        """
+        初始化空索引
+
+        Args:
+            capacity: 初始槽位数（向上取整为2的幂），超过负载上限时自动扩容
+            bloom_bits: 布隆过滤器位数，0表示不使用
+            bloom_hashes: 布隆过滤器哈希函数个数
+            key_size: 键长（字节）
+        """
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.key_size = key_size
+        self.capacity = size
+        self.count = 0
+        self.bloom_bits = (bloom_bits + 7) // 8 * 8
+        self.bloom_hashes = bloom_hashes
+
+        self.used = bytearray(size)
+        self.slots = bytearray(size * key_size)
+        self.bloom = bytearray(self.bloom_bits // 8)
+
+        self.lock = threading.Lock()
+        self.path = None
+        self._file = None
+        self._mmap = None
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, key: bytes) -> bool:
+        return self.contains(key)
+
+    def contains(self, key: bytes) -> bool:
+        """EPC是否已存在（O(1)）"""
+        h1, h2 = _hash_pair(key)
+        with self.lock:
+            if self.bloom_bits and not self._bloom_check(h1, h2):
+                return False
+            return self._find(key, h1) >= 0
+
+    def add(self, key: bytes) -> bool:
+        """
+        加入EPC
+
+        Args:
+            key: 原始EPC字节
+
+        Returns:
+            bool: 是否为新加入（False表示已存在，即重复）
+        """
+        if len(key) != self.key_size:
+            raise ValueError(f"键长必须为{self.key_size}字节")
+        h1, h2 = _hash_pair(key)
+        with self.lock:
+            if self.bloom_bits and not self._bloom_check(h1, h2):
+                slot = self._find_empty(h1)
+            else:
+                slot = self._find(key, h1)
+                if slot >= 0:
+                    return False
+                slot = self._find_empty(h1)
+
+            self._store(slot, key)
+            if self.bloom_bits:
+                self._bloom_add(h1, h2)
+            self.count += 1
+            self._dirty = True
+
+            if self.count > self.capacity * MAX_LOAD:
+                self._grow()
+            return True
+
+    # 哈希表操作（调用方持有锁）
+    def _find(self, key: bytes, h1: int) -> int:
+        """查找键所在槽位，不存在时返回-1"""
+        mask = self.capacity - 1
+        size = self.key_size
+        used = self.used
+        slots = self.slots
+        i = h1 & mask
+        while used[i]:
+            off = i * size
+            if slots[off:off + size] == key:
+                return i
+            i = (i + 1) & mask
+        return -1
+
+    def _find_empty(self, h1: int) -> int:
+        mask = self.capacity - 1
+        used = self.used
+        i = h1 & mask
+        while used[i]:
+            i = (i + 1) & mask
+        return i
+
+    def _store(self, slot: int, key: bytes):
+        off = slot * self.key_size
+        self.slots[off:off + self.key_size] = key
+        self.used[slot] = 1
+
+    def _bloom_check(self, h1: int, h2: int) -> bool:
+        bits = self.bloom_bits
+        bloom = self.bloom
+        for i in range(self.bloom_hashes):
+            bit = (h1 + i * h2) % bits
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _bloom_add(self, h1: int, h2: int):
+        bits = self.bloom_bits
+        bloom = self.bloom
+        for i in range(self.bloom_hashes):
+            bit = (h1 + i * h2) % bits
+            bloom[bit >> 3] |= 1 << (bit & 7)
+
+    def _grow(self):
+        """容量翻倍并重新散列"""
+        old_used, old_slots, size = self.used, self.slots, self.key_size
+        old_capacity = self.capacity
+        self.capacity *= 2
+        self.used = bytearray(self.capacity)
+        self.slots = bytearray(self.capacity * size)
+        for i in range(old_capacity):
+            if old_used[i]:
+                key = bytes(old_slots[i * size:(i + 1) * size])
+                self._store(self._find_empty(_hash_pair(key)[0]), key)
+        del old_used, old_slots
+        print(f"EPC索引扩容: {old_capacity} -> {self.capacity}")
+
+        # 映射的文件大小已不匹配，改为内存数据，下次保存时重新映射
+        if self._mmap is not None:
+            self.bloom = bytearray(self.bloom)
+            self._release_mmap()
+
+    # 持久化
+    def save(self, path: Optional[str] = None):
+        """
+        保存到磁盘（写临时文件后重命名，保证文件完整）并以mmap方式重新映射
+
+        Args:
+            path: 文件路径，为空时使用加载时的路径
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("未指定索引文件路径")
+        with self.lock:
+            if self._mmap is not None and path == self.path:
+                # 已映射到该文件，数据已直接写在文件中
+                self._write_header_mmap()
+                self._mmap.flush()
+                self._dirty = False
+                return
+
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, self.key_size, self.capacity,
+                                    self.count, self.bloom_bits, self.bloom_hashes))
+                f.write(self.used)
+                f.write(self.slots)
+                f.write(self.bloom)
+                f.flush()
+                os.fsync(f.fileno())
+            self._release_mmap()
+            os.replace(tmp_path, path)
+            self._map_file(path)
+            self._dirty = False
+
+    def flush(self):
+        """将变化写入磁盘（仅在有变化时）"""
+        if self._dirty and self.path:
+            self.save()
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True) -> 'EPCIndex':
+        """
+        从磁盘加载索引
+
+        Args:
+            path: 文件路径
+            use_mmap: 是否以mmap映射文件（启动时不需要读取整个文件）
+
+        Returns:
+            EPCIndex
+        """
+        index = cls.__new__(cls)
+        index.lock = threading.Lock()
+        index._file = None
+        index._mmap = None
+        index._dirty = False
+        index.path = path
+
+        if use_mmap:
+            index._map_file(path)
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+            index._attach(memoryview(bytearray(data)))
+        return index
+
+    @classmethod
+    def open(cls, path: str, capacity: int = 1 << 20, bloom_bits: int = 0,
+             bloom_hashes: int = 4) -> 'EPCIndex':
+        """打开索引文件，不存在时创建"""
+        if os.path.exists(path):
+            return cls.load(path)
+        index = cls(capacity, bloom_bits, bloom_hashes)
+        index.save(path)
+        return index
+
+    def _map_file(self, path: str):
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self.path = path
+        self._attach(memoryview(self._mmap))
+
+    def _attach(self, view: memoryview):
+        """将文件内容（mmap或内存）作为索引数据"""
+        magic, version, key_size, capacity, count, bloom_bits, bloom_hashes = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("EPC索引文件格式错误")
+        self.key_size = key_size
+        self.capacity = capacity
+        self.count = count
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+
+        pos = HEADER.size
+        self.used = view[pos:pos + capacity]
+        pos += capacity
+        self.slots = view[pos:pos + capacity * key_size]
+        pos += capacity * key_size
+        self.bloom = view[pos:pos + bloom_bits // 8]
+
+    def _write_header_mmap(self):
+        HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, self.key_size, self.capacity,
+                         self.count, self.bloom_bits, self.bloom_hashes)
+
+    def _release_mmap(self):
+        if self._mmap is None:
+            return
+        # 先复制出仍需使用的数据，再释放映射
+        self.used = bytearray(self.used)
+        self.slots = bytearray(self.slots)
+        self.bloom = bytearray(self.bloom)
+        self._mmap.close()
+        self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def close(self):
+        """保存并关闭"""
+        if self.path:
+            self.save()
+        with self.lock:
+            self._release_mmap()
@@ -0,0 +1,170 @@
+# error_aggregator.py
+"""
+错误汇总模块
+读写器连接反复断开时错误会在短时间内大量出现，逐条弹窗或打印会阻塞界面、淹没日志。
+错误按 来源 + 类别 + 内容（数字归一化）合并:
+    计数:   每次出现都计数
+    通知:   同一错误首次出现时通知，之后每 log_interval 秒最多通知一次（附带期间重复次数）
+    横幅:   最近 banner_seconds 秒内出现过的错误按类别汇总为一行（界面非模态状态栏显示），
+            次数从上次确认起累计
+记录在调用线程中完成（只持有短时间的锁），不依赖任何界面库
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 错误类别: (类别名称, 关键字)，按顺序匹配第一个
+CATEGORIES = (
+    ('连接', ('连接', '断开', 'Connection', 'connect')),
+    ('发送', ('发送',)),
+    ('接收', ('接收',)),
+    ('解析', ('解析', '校验', '帧', '长度')),
+    ('指令', ('指令',)),
+)
+CATEGORY_OTHER = '其他'
+
+_NUMBER_RE = re.compile(r'\d+')
+
+
+def categorize(message: str) -> str:
+    """按关键字确定错误类别"""
+    for category, keywords in CATEGORIES:
+        for keyword in keywords:
+            if keyword in message:
+                return category
+    return CATEGORY_OTHER
+
+
+class _ErrorEntry:
+    """同一错误的汇总"""
+
+    __slots__ = ('source', 'category', 'message', 'count', 'unacknowledged', 'suppressed', 'first', 'last',
+                 'last_notified')
+
+    def __init__(self, source: str, category: str, message: str, now: float):
+        self.source = source
+        self.category = category
+        self.message = message
+        self.count = 0
+        self.unacknowledged = 0  # 上次确认以来的次数
+        self.suppressed = 0  # 上次通知以来未通知的次数
+        self.first = now
+        self.last = now
+        self.last_notified = 0.0
+
+
+class ErrorAggregator:
+    """错误汇总类"""
+
+    def __init__(self, log_interval: float = 10.0, banner_seconds: float = 60.0, max_entries: int = 200):
+        """
+        初始化错误汇总
+
+        Args:
+            log_interval: 同一错误两次通知的最小间隔（秒）
+            banner_seconds: 横幅显示最近多少秒内的错误
+            max_entries: 最多保留的不同错误数（超出后移除最久未出现的）
+        """
+        self.log_interval = log_interval
+        self.banner_seconds = banner_seconds
+        self.max_entries = max_entries
+
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Tuple[str, str], _ErrorEntry]" = OrderedDict()
+        self.totals: Dict[str, int] = {}  # 类别 -> 累计次数
+
+        # 统计信息
+        self.recorded = 0
+        self.notified = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'ErrorAggregator':
+        """由配置中的 errors 部分创建"""
+        return cls(log_interval=config['log_interval'], banner_seconds=config['banner_seconds'],
+                   max_entries=config['max_entries'])
+
+    def record(self, source: str, message: str, now: Optional[float] = None) -> Tuple[bool, str]:
+        """
+        记录一次错误（任意线程）
+
+        Args:
+            source: 错误来源（读写器名称）
+            message: 错误信息
+
+        Returns:
+            (是否需要通知, 通知文本（包含期间重复次数）)
+        """
+        if now is None:
+            now = time.monotonic()
+        key = (source, _NUMBER_RE.sub('#', message))
+        with self.lock:
+            self.recorded += 1
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = _ErrorEntry(source, categorize(message), message, now)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            else:
+                self.entries.move_to_end(key)
+            entry.count += 1
+            entry.unacknowledged += 1
+            entry.message = message
+            entry.last = now
+            self.totals[entry.category] = self.totals.get(entry.category, 0) + 1
+
+            if entry.last_notified and now - entry.last_notified < self.log_interval:
+                entry.suppressed += 1
+                return False, message
+            suppressed = entry.suppressed
+            entry.suppressed = 0
+            entry.last_notified = now
+            self.notified += 1
+        if suppressed:
+            return True, f"{message}（{self.log_interval:g}秒内重复 {suppressed} 次）"
+        return True, message
+
+    def acknowledge(self):
+        """确认当前错误（横幅清空，之后新出现的错误重新计数显示）"""
+        with self.lock:
+            for entry in self.entries.values():
+                entry.unacknowledged = 0
+
+    def summary(self, now: Optional[float] = None) -> List[Tuple[str, int, str]]:
+        """
+        最近出现的错误按类别汇总
+
+        Returns:
+            [(类别, 次数, 最近一条错误信息)]，按最近出现时间倒序
+        """
+        if now is None:
+            now = time.monotonic()
+        since = now - self.banner_seconds
+        categories: Dict[str, list] = {}
+        with self.lock:
+            for entry in reversed(self.entries.values()):
+                if entry.last <= since:
+                    break  # 按最近出现排序，之后的都更早
+                if not entry.unacknowledged:
+                    continue
+                item = categories.get(entry.category)
+                if item is None:
+                    categories[entry.category] = [entry.unacknowledged, f"{entry.source}: {entry.message}"]
+                else:
+                    item[0] += entry.unacknowledged
+        return [(category, count, message) for category, (count, message) in categories.items()]
+
+    def banner_text(self, now: Optional[float] = None) -> str:
+        """横幅文本，没有需要显示的错误时返回空字符串"""
+        items = self.summary(now)
+        if not items:
+            return ''
+        counts = ' | '.join(f"{category}错误 {count}次" for category, count, _ in items)
+        return f"{counts}    最近: {items[0][2]}"
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {'recorded': self.recorded, 'notified': self.notified, 'distinct': len(self.entries),
+                    'totals': dict(self.totals)}
@@ -0,0 +1,140 @@
+# event_channel.py
+"""
+事件通道模块
+读写器接收线程、循环发送线程、连接线程只发布不可变事件（namedtuple），
+由唯一的消费者（界面的Tk主线程）按顺序取出并应用，界面状态和控件只在消费者线程中修改
+
+事件分两个有上限的队列（flow_control.BoundedQueue）:
+    数据队列: 帧、标签、JSON事件，界面处理不过来时按配置策略处理（默认同一读写器同一EPC的标签事件合并为最新一条）
+    控制队列: 连接、错误、消息和调用事件，优先处理，满时丢弃最早的事件
+读写器数据速率超过界面处理能力时内存占用保持在上限以内，丢弃/合并数量见流控统计
+"""
+
+import queue
+import traceback
+from collections import namedtuple
+from typing import Callable, Dict, Optional
+from flow_control import BoundedQueue, POLICY_DROP_DUPLICATES, POLICY_DROP_OLDEST
+
+# 事件类型
+FrameEvent = namedtuple('FrameEvent', 'reader frame')
+TagEvent = namedtuple('TagEvent', 'reader tag is_new')
+JsonEvent = namedtuple('JsonEvent', 'reader data')
+ConnectionEvent = namedtuple('ConnectionEvent', 'reader connected message')
+ErrorEvent = namedtuple('ErrorEvent', 'reader message')
+MessageEvent = namedtuple('MessageEvent', 'text')
+AlarmEvent = namedtuple('AlarmEvent', 'rule reader tag message')
+CallEvent = namedtuple('CallEvent', 'func args')  # 在消费者线程中调用 func(*args)
+
+DATA_EVENTS = (FrameEvent, TagEvent, JsonEvent)
+
+
+def event_key(event):
+    """数据事件的合并键（同一读写器同一EPC的标签事件），其他事件不合并"""
+    if type(event) is TagEvent:
+        return event.reader, event.tag.epc_bytes
+    return None
+
+
+class EventChannel:
+    """单消费者事件通道类"""
+
+    def __init__(self, max_batch: int = 1000, max_size: int = 10000,
+                 policy: str = POLICY_DROP_DUPLICATES, control_size: int = 1000):
+        """
+        初始化事件通道
+
+        Args:
+            max_batch: 每次处理的最大事件数（避免长时间占用界面线程）
+            max_size: 数据队列上限
+            policy: 数据队列满时的策略（flow_control.POLICIES）
+            control_size: 控制队列上限
+        """
+        # block 策略时接收线程最多等待1秒（反压到读写器），避免界面打开模态对话框期间长时间阻塞
+        self.data_queue = BoundedQueue('ui.data', max_size, policy, key=event_key, block_timeout=1.0)
+        self.control_queue = BoundedQueue('ui.control', control_size, POLICY_DROP_OLDEST)
+        self.max_batch = max_batch
+        self.handlers: Dict[type, Callable] = {}
+        self._draining = False
+
+        self.applied = 0  # 已处理的事件数（只由消费者修改）
+
+    def subscribe(self, event_type: type, handler: Callable):
+        """
+        注册事件处理函数（在消费者线程中调用）
+
+        Args:
+            event_type: 事件类型
+            handler: 处理函数，参数为事件
+        """
+        self.handlers[event_type] = handler
+
+    def publish(self, event) -> bool:
+        """发布事件（任意线程），返回是否已加入队列"""
+        if type(event) in DATA_EVENTS:
+            return self.data_queue.put(event)
+        return self.control_queue.put(event)
+
+    def call(self, func: Callable, *args):
+        """在消费者线程中调用函数"""
+        self.publish(CallEvent(func, args))
+
+    def pending(self) -> int:
+        """待处理的事件数"""
+        return self.data_queue.qsize() + self.control_queue.qsize()
+
+    def drain(self, max_events: Optional[int] = None) -> int:
+        """
+        取出并应用事件（只能在消费者线程中调用）
+
+        Args:
+            max_events: 最多处理的事件数，为空时使用 max_batch
+
+        Returns:
+            处理的事件数
+        """
+        if self._draining:
+            return 0  # 处理函数中打开模态对话框时，嵌套的事件循环不重复处理
+        self._draining = True
+        count = 0
+        limit = max_events or self.max_batch
+        get_control = self.control_queue.get_nowait
+        get_data = self.data_queue.get_nowait
+        try:
+            while count < limit:
+                try:
+                    event = get_control()
+                except queue.Empty:
+                    try:
+                        event = get_data()
+                    except queue.Empty:
+                        break
+                count += 1
+                try:
+                    if type(event) is CallEvent:
+                        event.func(*event.args)
+                    else:
+                        handler = self.handlers.get(type(event))
+                        if handler:
+                            handler(event)
+                except Exception:
+                    print(f"事件处理错误: {event.__class__.__name__}")
+                    traceback.print_exc()
+        finally:
+            self._draining = False
+            self.applied += count
+        return count
+
+    def pump_tk(self, widget, interval_ms: int = 20):
+        """
+        在Tk主线程中周期处理事件
+
+        Args:
+            widget: 任意Tk控件（用于 after）
+            interval_ms: 处理间隔（毫秒），事件积压时立即继续处理
+        """
+        def _pump():
+            count = self.drain()
+            widget.after(1 if count >= self.max_batch else interval_ms, _pump)
+
+        widget.after(interval_ms, _pump)
@@ -0,0 +1,227 @@
+# flow_control.py
+"""
+流量控制模块
+接收 → 解析 → 各消费方 之间的每个队列都有上限，队列满时按该环节的策略处理:
+    block            生产方等待（最多 block_timeout 秒，超时后丢弃），用于不能丢的指令发送
+    drop_oldest      丢弃最早的一项，保留最新数据
+    drop_duplicates  队列中已有相同键的项时用新项替换（合并），否则丢弃新项
+    count_only       不再保存新项，只计数（消费方根据丢弃数显示汇总）
+
+各环节的内存上限:
+    读写器接收:  接收线程同步解析（FrameParser缓冲区有上限），下游阻塞时停止读取socket，
+               由TCP窗口反压到读写器
+    指令发送:    SocketClient.send_queue（block）
+    界面事件:    EventChannel 数据队列（默认 drop_duplicates，按EPC合并）和控制队列（drop_oldest）
+    本机发布:    TagFeedServer 每个订阅方的队列（tag_feed.py）
+    上传:        内存批次（batch_records）+ 磁盘队列上限（max_disk_bytes）
+    数据库:      TagStore 按 batch_size 批量提交
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+POLICY_BLOCK = 'block'
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_DROP_DUPLICATES = 'drop_duplicates'
+POLICY_COUNT_ONLY = 'count_only'
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_DROP_DUPLICATES, POLICY_COUNT_ONLY)
+
+
+class BoundedQueue:
+    """有上限的队列类（多生产方，单消费方或多消费方）"""
+
+    def __init__(self, name: str, maxsize: int, policy: str = POLICY_DROP_OLDEST,
+                 key: Optional[Callable[[Any], Any]] = None, block_timeout: Optional[float] = None):
+        """
+        初始化队列
+
+        Args:
+            name: 环节名称（用于统计）
+            maxsize: 最大项数
+            policy: 队列满时的策略
+            key: drop_duplicates 策略的合并键函数，返回None的项不合并
+            block_timeout: block 策略的最长等待时间（秒），None表示一直等待
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"不支持的流控策略: {policy}")
+        if maxsize <= 0:
+            raise ValueError("队列上限必须大于0")
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.key = key
+        self.block_timeout = block_timeout
+
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        # drop_duplicates 时每项为 [键, 数据]，合并时原位替换数据，保持原来的顺序
+        self.items = deque()
+        self.keyed: Dict[Any, list] = {}
+        self.closed = False
+
+        # 统计信息
+        self.put_count = 0
+        self.shed_count = 0  # 丢弃（含 count_only 只计数的项）
+        self.coalesced_count = 0  # 合并到已有项
+        self.blocked_count = 0  # 生产方等待次数
+        self.high_water = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def qsize(self) -> int:
+        return len(self.items)
+
+    def put(self, item, timeout: Optional[float] = None) -> bool:
+        """
+        加入一项
+
+        Args:
+            item: 数据
+            timeout: block 策略的等待时间，为空时使用 block_timeout
+
+        Returns:
+            bool: 是否已加入队列（合并到已有项也视为已加入）
+        """
+        keyed = self.policy == POLICY_DROP_DUPLICATES
+        key = self.key(item) if keyed and self.key else None
+        with self.lock:
+            self.put_count += 1
+            if self.closed:
+                self.shed_count += 1
+                return False
+
+            if keyed and key is not None:
+                entry = self.keyed.get(key)
+                if entry is not None and len(self.items) >= self.maxsize:
+                    entry[1] = item
+                    self.coalesced_count += 1
+                    return True
+
+            if len(self.items) >= self.maxsize:
+                if self.policy == POLICY_BLOCK:
+                    self.blocked_count += 1
+                    wait = self.block_timeout if timeout is None else timeout
+                    deadline = None if wait is None else time.monotonic() + wait
+                    while len(self.items) >= self.maxsize and not self.closed:
+                        remaining = None if deadline is None else deadline - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            break
+                        self.not_full.wait(remaining)
+                    if len(self.items) >= self.maxsize or self.closed:
+                        self.shed_count += 1
+                        return False
+                elif self.policy == POLICY_DROP_OLDEST:
+                    self._pop_locked()
+                    self.shed_count += 1
+                else:
+                    self.shed_count += 1
+                    return False
+
+            if keyed:
+                entry = [key, item]
+                if key is not None:
+                    self.keyed[key] = entry
+                self.items.append(entry)
+            else:
+                self.items.append(item)
+            size = len(self.items)
+            if size > self.high_water:
+                self.high_water = size
+            self.not_empty.notify()
+            return True
+
+    def _pop_locked(self):
+        item = self.items.popleft()
+        if self.policy == POLICY_DROP_DUPLICATES:
+            entry = item
+            key, item = entry
+            if key is not None and self.keyed.get(key) is entry:
+                del self.keyed[key]
+        self.not_full.notify()
+        return item
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        取出一项
+
+        Raises:
+            queue.Empty: 超时仍没有数据
+        """
+        with self.lock:
+            if not self.items:
+                self.not_empty.wait(timeout)
+                if not self.items:
+                    raise queue.Empty
+            return self._pop_locked()
+
+    def get_nowait(self):
+        with self.lock:
+            if not self.items:
+                raise queue.Empty
+            return self._pop_locked()
+
+    def get_many(self, max_items: int) -> List[Any]:
+        """一次取出最多 max_items 项（不等待）"""
+        with self.lock:
+            count = min(max_items, len(self.items))
+            return [self._pop_locked() for _ in range(count)]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.keyed.clear()
+            self.not_full.notify_all()
+
+    def close(self):
+        """关闭队列（唤醒等待的生产方和消费方，之后加入的项全部丢弃）"""
+        with self.lock:
+            self.closed = True
+            self.not_full.notify_all()
+            self.not_empty.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'name': self.name, 'policy': self.policy, 'size': len(self.items),
+                    'maxsize': self.maxsize, 'high_water': self.high_water, 'put': self.put_count,
+                    'shed': self.shed_count, 'coalesced': self.coalesced_count,
+                    'blocked': self.blocked_count}
+
+
+class FlowMonitor:
+    """各环节队列的统计汇总类"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queues: Dict[str, BoundedQueue] = {}
+
+    def register(self, bounded_queue: BoundedQueue, name: Optional[str] = None):
+        """登记队列（同名时替换，如读写器重新创建）"""
+        with self.lock:
+            self.queues[name or bounded_queue.name] = bounded_queue
+
+    def unregister(self, name: str):
+        with self.lock:
+            self.queues.pop(name, None)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            queues = list(self.queues.items())
+        return {name: q.get_stats() for name, q in queues}
+
+    def total_shed(self) -> int:
+        """所有环节的丢弃总数"""
+        return sum(stats['shed'] for stats in self.get_stats().values())
+
+    def report(self) -> str:
+        """生成各环节统计文本"""
+        lines = ["流控统计:"]
+        for name, stats in self.get_stats().items():
+            lines.append(f"  {name} [{stats['policy']}]: {stats['size']}/{stats['maxsize']} "
+                         f"(峰值 {stats['high_water']}), 加入 {stats['put']}, 丢弃 {stats['shed']}, "
+                         f"合并 {stats['coalesced']}, 等待 {stats['blocked']}")
+        return '\n'.join(lines)
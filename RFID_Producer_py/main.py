@@ -1,40 +1,67 @@
 # main.py
+import time
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点（在其他模块导入之前）
+
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import messagebox
 from datetime import datetime
-import time
 import threading
-from RFIDReader_CNNT import RFIDReader_CNNT
+from engine import RFIDEngine
 from rfid_tag import RFIDTag
-from command import device_command
+from command import CMD_ACK_TYPE_RFID_LOOP_STOP
+from config import load_config, ConfigWatcher
+from startup_timer import StartupTimer
+from tag_table import TagTableModel, VirtualTagTable
+from production_stats import format_duration
+from profiling import STAGE_UI
+from watchdog import format_stacks, EVENT_STALL, EVENT_RECOVER
+from event_channel import (EventChannel, FrameEvent, TagEvent, JsonEvent, ConnectionEvent,
+                           ErrorEvent, MessageEvent, AlarmEvent)
 
 
 class RFIDProductionSystem:
-    def __init__(self, root):
+    def __init__(self, root, engine: RFIDEngine = None, startup_timer: StartupTimer = None):
         self.root = root
         self.root.title("RFID贴标生产系统")
-        self.root.geometry("1000x800")
+        self.root.geometry("1000x960")
         self.root.configure(bg='#f0f0f0')
         self.root.resizable(True, True)
 
         # 系统状态变量
         self.is_running = False
-        self.current_load = 20
-        self.daily_production = 199999
-        self.line_runtime = "20时10分"
+        self.current_load = 0
+        self.daily_production = 0
+        self.line_runtime = format_duration(0)
         self.error_message = "无异常"
 
+        # RFID生产引擎（读写器管理、协议解析、托盘聚合和持久化），界面只作为客户端
+        self.engine = engine if engine is not None else RFIDEngine()
+        self.ui_config = self.engine.config['ui']
+
         # RFID标签管理
         self.current_tag = None
+        self.zone_display = {}  # 归属天线号 -> 当前显示的EPC
+        self.tag_model = TagTableModel(max_rows=self.ui_config['table_max_rows'])  # 实时标签列表数据
         self.tag_history = []
-        self.max_history_size = 10000
-
-        # RFID读写器（替换原来的SocketClient）
-        self.rfid_reader = RFIDReader_CNNT('192.168.1.200', 2000)
+        self.max_history_size = self.ui_config['history_size']
+
+        self.reader_name = self.engine.get_reader_name()
+        self.rfid_reader = self.engine.get_reader(self.reader_name)
+        self.startup_timer = startup_timer if startup_timer is not None else StartupTimer()
+        self.events = EventChannel(max_batch=self.ui_config['event_batch'],
+                                   max_size=self.ui_config['event_queue_size'],
+                                   policy=self.ui_config['event_policy'])  # 读写器线程 -> Tk主线程
+        self.engine.flow.register(self.events.data_queue)
+        self.engine.flow.register(self.events.control_queue)
         self.setup_rfid_callbacks()
 
+        # 先发起读写器连接，与界面创建并行进行（回调中的界面更新在主循环启动后才执行）
+        self.auto_connect()
+
         # 创建界面（保持原有UI不变）
+        self.create_menu()
         self.create_title_section()
+        self.create_error_banner()
         self.create_socket_section()  # 这个section现在用于RFID读写器连接
         self.create_device_info_section()
         self.create_rfid_info_section()
@@ -43,29 +70,105 @@ class RFIDProductionSystem:
 
         # 启动时间更新
         self.update_time()
+        self.update_production_stats()
+        self.setup_event_handlers()
 
-        # 尝试自动连接RFID读写器
-        self.auto_connect()
+        # 主循环空闲时窗口已完成首次绘制
+        self.root.after_idle(self.on_window_shown)
 
     def setup_rfid_callbacks(self):
         """设置RFID读写器回调函数"""
-        self.rfid_reader.set_callbacks(
-            receive_callback=self.on_rfid_data_received,
+        self.engine.set_callbacks(
+            tag_callback=self.on_rfid_tag_received,
+            frame_callback=self.on_rfid_frame_received,
+            json_callback=self.on_rfid_json_received,
             connection_callback=self.on_rfid_connection_changed,
-            error_callback=self.on_rfid_error
+            error_callback=self.on_rfid_error,
+            alarm_callback=self.on_rule_alarm
         )
+        if self.engine.watchdog:
+            self.engine.watchdog.set_callbacks(event_callback=self.on_watchdog_event)
+
+    def create_menu(self):
+        """创建菜单（诊断工具）"""
+        menubar = tk.Menu(self.root)
+        profiler = self.engine.profiler
+        diag_menu = tk.Menu(menubar, tearoff=0)
+        self.trace_var = tk.BooleanVar(value=profiler.tracing)
+        diag_menu.add_checkbutton(label="阶段计时", variable=self.trace_var,
+                                  command=lambda: self.add_message(profiler.set_tracing(self.trace_var.get())))
+        diag_menu.add_command(label="查看阶段耗时",
+                              command=lambda: self.show_diagnostics("阶段耗时", profiler.dump_stages()))
+        diag_menu.add_separator()
+        diag_menu.add_command(label="开启/关闭 cProfile",
+                              command=lambda: self.show_diagnostics("cProfile", profiler.toggle_cprofile()))
+        diag_menu.add_command(label="开启/关闭 tracemalloc",
+                              command=lambda: self.show_diagnostics("tracemalloc", profiler.toggle_tracemalloc()))
+        diag_menu.add_separator()
+        diag_menu.add_command(label="规则统计",
+                              command=lambda: self.show_diagnostics(
+                                  "规则统计", self.engine.rules.report() if self.engine.rules else "标签规则未启用"))
+        diag_menu.add_command(label="流控统计",
+                              command=lambda: self.show_diagnostics("流控统计", self.engine.flow.report()))
+        diag_menu.add_command(label="线程状态",
+                              command=lambda: self.show_diagnostics(
+                                  "线程状态", self.engine.watchdog.report() if self.engine.watchdog else "线程监视未启用"))
+        diag_menu.add_command(label="线程调用栈",
+                              command=lambda: self.show_diagnostics("线程调用栈", format_stacks()))
+        menubar.add_cascade(label="诊断", menu=diag_menu)
+        self.root.config(menu=menubar)
+
+    def show_diagnostics(self, title: str, text: str):
+        """显示诊断结果（单行结果写入消息框，多行结果在单独窗口中显示）"""
+        print(text)
+        if '\n' not in text:
+            self.add_message(text)
+            return
+        window = tk.Toplevel(self.root)
+        window.title(title)
+        text_widget = tk.Text(window, width=110, height=40, font=("Consolas", 9))
+        text_widget.pack(fill='both', expand=True)
+        text_widget.insert('1.0', text)
+        text_widget.config(state='disabled')
 
     def create_title_section(self):
         """创建标题区域"""
-        title_frame = tk.Frame(self.root, bg='#2c3e50', height=70)
-        title_frame.pack(fill='x', padx=5, pady=5)
-        title_frame.pack_propagate(False)
+        self.title_frame = tk.Frame(self.root, bg='#2c3e50', height=70)
+        self.title_frame.pack(fill='x', padx=5, pady=5)
+        self.title_frame.pack_propagate(False)
 
-        title_label = tk.Label(title_frame, text="RFID贴标生产系统",
+        title_label = tk.Label(self.title_frame, text="RFID贴标生产系统",
                                font=("微软雅黑", 20, "bold"),
                                bg='#2c3e50', fg='white')
         title_label.pack(pady=20)
 
+    def create_error_banner(self):
+        """创建错误横幅（非模态，有错误时显示在标题下方）"""
+        self.error_banner = tk.Frame(self.root, bg='#e74c3c')
+        self.error_banner_label = tk.Label(self.error_banner, text="", font=("微软雅黑", 9),
+                                           bg='#e74c3c', fg='white', anchor='w')
+        self.error_banner_label.pack(side='left', fill='x', expand=True, padx=10, pady=3)
+        tk.Button(self.error_banner, text="×", font=("微软雅黑", 9, "bold"), bg='#e74c3c', fg='white',
+                  relief='flat', command=self.acknowledge_errors).pack(side='right', padx=5)
+        self.error_banner_visible = False
+
+    def refresh_error_banner(self):
+        """按错误汇总更新横幅（没有最近的错误时隐藏）"""
+        text = self.engine.errors.banner_text()
+        if text:
+            self.error_banner_label.config(text=text)
+            if not self.error_banner_visible:
+                self.error_banner.pack(fill='x', padx=5, after=self.title_frame)
+                self.error_banner_visible = True
+        elif self.error_banner_visible:
+            self.error_banner.pack_forget()
+            self.error_banner_visible = False
+
+    def acknowledge_errors(self):
+        """确认错误，隐藏横幅"""
+        self.engine.errors.acknowledge()
+        self.refresh_error_banner()
+
     def create_socket_section(self):
         """创建RFID读写器连接控制区域（保持原有UI结构）"""
         socket_frame = tk.LabelFrame(self.root, text="RFID读写器连接设置",
@@ -83,7 +186,7 @@ class RFIDProductionSystem:
 
         self.host_entry = tk.Entry(config_frame, width=15, font=("微软雅黑", 9),
                                    relief='solid', bd=1)
-        self.host_entry.insert(0, "192.168.1.200")
+        self.host_entry.insert(0, self.rfid_reader.host)
         self.host_entry.pack(side='left', padx=(0, 15))
 
         tk.Label(config_frame, text="端口号:", font=("微软雅黑", 9),
@@ -91,9 +194,14 @@ class RFIDProductionSystem:
 
         self.port_entry = tk.Entry(config_frame, width=8, font=("微软雅黑", 9),
                                    relief='solid', bd=1)
-        self.port_entry.insert(0, "2000")
+        self.port_entry.insert(0, str(self.rfid_reader.port))
         self.port_entry.pack(side='left', padx=(0, 20))
 
+        self.discover_button = tk.Button(config_frame, text="搜索读写器", font=("微软雅黑", 9),
+                                         bg='#ecf0f1', fg='black', width=10, height=1,
+                                         command=self.discover_readers)
+        self.discover_button.pack(side='left')
+
         # 连接状态和控制按钮
         status_frame = tk.Frame(socket_frame, bg='white')
         status_frame.pack(fill='x', padx=10, pady=8)
@@ -195,7 +303,7 @@ class RFIDProductionSystem:
                  bg='white').pack(side='left', padx=(0, 5))
         self.tray_id_entry = tk.Entry(row1_frame, width=30, font=("微软雅黑", 10),
                                       relief='solid', bd=1)
-        self.tray_id_entry.insert(0, "TRAY-2024-001")
+        self.tray_id_entry.insert(0, self.engine.tray.tray_id)
         self.tray_id_entry.pack(side='left', padx=(0, 40))
 
         # 托盘装载货物数量
@@ -203,9 +311,13 @@ class RFIDProductionSystem:
                  bg='white').pack(side='left', padx=(0, 5))
         self.tray_load_entry = tk.Entry(row1_frame, width=15, font=("微软雅黑", 10),
                                         relief='solid', bd=1)
-        self.tray_load_entry.insert(0, "32")
+        self.tray_load_entry.insert(0, str(self.engine.tray.capacity))
         self.tray_load_entry.pack(side='left')
 
+        # 回车后将托盘设置同步到引擎
+        self.tray_id_entry.bind('<Return>', lambda e: self.apply_tray_settings())
+        self.tray_load_entry.bind('<Return>', lambda e: self.apply_tray_settings())
+
         # 第二行：取标内容和贴标后内容放在同一行
         row2_frame = tk.Frame(tray_frame, bg='white')
         row2_frame.grid(row=1, column=0, columnspan=2, sticky='nsew', padx=10, pady=10)
@@ -233,6 +345,17 @@ class RFIDProductionSystem:
         self.after_text.insert("1.0", "")
         self.after_text.pack(fill='both', expand=True)
 
+        # 第三行：实时标签列表
+        row3_frame = tk.Frame(tray_frame, bg='white')
+        row3_frame.grid(row=2, column=0, columnspan=2, sticky='nsew', padx=10, pady=(0, 10))
+        tray_frame.rowconfigure(2, weight=2)
+        tray_frame.columnconfigure(0, weight=1)
+
+        self.tag_table = VirtualTagTable(row3_frame, self.tag_model, height=self.ui_config['table_rows'],
+                                         refresh_ms=self.ui_config['table_refresh_ms'],
+                                         resort_ms=self.ui_config['table_resort_ms'], bg='white')
+        self.tag_table.pack(fill='both', expand=True)
+
     def create_production_stats_section(self):
         """创建生产统计区域（保持不变）"""
         stats_frame = tk.Frame(self.root, bg='#f8f9fa', relief='groove', bd=1)
@@ -259,6 +382,27 @@ class RFIDProductionSystem:
                                     font=("微软雅黑", 10), bg='#f8f9fa', fg='#e74c3c')
         self.daily_label.grid(row=0, column=5, sticky='w', padx=5, pady=15)
 
+        # 读取速率
+        tk.Label(stats_frame, text="读取速率:", font=("微软雅黑", 10, "bold"),
+                 bg='#f8f9fa').grid(row=1, column=0, sticky='w', padx=20, pady=(0, 15))
+        self.read_rate_label = tk.Label(stats_frame, text="0次/分",
+                                        font=("微软雅黑", 10), bg='#f8f9fa', fg='#2c3e50')
+        self.read_rate_label.grid(row=1, column=1, sticky='w', padx=5, pady=(0, 15))
+
+        # 每小时完成托盘
+        tk.Label(stats_frame, text="托盘速率:", font=("微软雅黑", 10, "bold"),
+                 bg='#f8f9fa').grid(row=1, column=2, sticky='w', padx=20, pady=(0, 15))
+        self.tray_rate_label = tk.Label(stats_frame, text="0个/时",
+                                        font=("微软雅黑", 10), bg='#f8f9fa', fg='#2c3e50')
+        self.tray_rate_label.grid(row=1, column=3, sticky='w', padx=5, pady=(0, 15))
+
+        # 停机时间
+        tk.Label(stats_frame, text="停机时间:", font=("微软雅黑", 10, "bold"),
+                 bg='#f8f9fa').grid(row=1, column=4, sticky='w', padx=20, pady=(0, 15))
+        self.downtime_label = tk.Label(stats_frame, text=format_duration(0),
+                                       font=("微软雅黑", 10), bg='#f8f9fa', fg='#2c3e50')
+        self.downtime_label.grid(row=1, column=5, sticky='w', padx=5, pady=(0, 15))
+
     def create_status_control_section(self):
         """创建状态和控制区域（保持不变）"""
         bottom_frame = tk.Frame(self.root, bg='#f0f0f0')
@@ -321,6 +465,25 @@ class RFIDProductionSystem:
         self.time_label.config(text=current_time)
         self.root.after(1000, self.update_time)
 
+    def update_production_stats(self):
+        """按引擎统计快照更新生产统计显示"""
+        stats = self.engine.stats.get_snapshot()
+        self.current_load = self.engine.tray.current_count
+        self.daily_production = stats['daily_production']
+        self.line_runtime = format_duration(stats['runtime'])
+
+        self.runtime_label.config(text=self.line_runtime)
+        self.current_load_label.config(text=str(self.current_load))
+        self.daily_label.config(text=str(self.daily_production))
+
+        antennas = ' '.join(f"A{ant}:{rate:.0f}" for ant, rate in stats['antenna_per_min'].items())
+        rate_text = f"{stats['tags_per_min']:.0f}次/分"
+        self.read_rate_label.config(text=f"{rate_text} ({antennas})" if antennas else rate_text)
+        self.tray_rate_label.config(text=f"{stats['trays_per_hour']:.0f}个/时")
+        self.downtime_label.config(text=format_duration(stats['downtime']))
+        self.refresh_error_banner()
+        self.root.after(self.ui_config['stats_refresh_ms'], self.update_production_stats)
+
     def toggle_production(self):
         """切换产线运行状态 - 主要修改部分"""
         self.is_running = not self.is_running
@@ -333,7 +496,7 @@ class RFIDProductionSystem:
 
             # 发送开始生产指令到RFID读写器
             if self.rfid_reader.get_connection_status():
-                if self.rfid_reader.send_single_cmd('CMD_RFID_LOOP_START'):
+                if self.engine.start_inventory(self.reader_name):
                     self.add_message("发送开始生产指令成功")
                 else:
                     self.add_message("发送开始生产指令失败")
@@ -367,7 +530,7 @@ class RFIDProductionSystem:
 
         # 发送紧急停止指令到RFID读写器
         if self.rfid_reader.get_connection_status():
-            if self.rfid_reader.send_single_cmd('CMD_RFID_LOOP_STOP'):
+            if self.engine.stop_inventory(self.reader_name):
                 self.add_message("发送紧急停止指令成功")
             else:
                 self.add_message("发送紧急停止指令失败")
@@ -380,15 +543,19 @@ class RFIDProductionSystem:
     def auto_connect(self):
         """自动连接RFID读写器"""
         self.add_message("系统启动，准备连接RFID读写器...")
+        # 引擎在后台线程中并行连接所有读写器，不阻塞界面创建
+        self.engine.start()
 
-        def connect_thread():
-            time.sleep(2)  # 延迟2秒连接，让界面先加载完成
-            if self.rfid_reader.connect():
-                self.add_message("自动连接RFID读写器成功")
-            else:
-                self.add_message("自动连接失败，请手动连接")
+    def on_window_shown(self):
+        """窗口首次显示"""
+        self.startup_timer.mark('window')
+        self.add_message(self.startup_timer.report())
 
-        threading.Thread(target=connect_thread, daemon=True).start()
+    def report_startup(self):
+        """输出完整的启动耗时报告"""
+        report = self.startup_timer.report()
+        print(report)
+        self.add_message(report)
 
     def connect_rfid(self):
         """连接RFID读写器"""
@@ -396,70 +563,206 @@ class RFIDProductionSystem:
         try:
             host = self.host_entry.get()
             port = int(self.port_entry.get())
-            self.rfid_reader.host = host
-            self.rfid_reader.port = port
         except ValueError:
             messagebox.showerror("错误", "端口号必须是数字")
             return
 
         def connect_thread():
-            if self.rfid_reader.connect():
+            if self.engine.connect(self.reader_name, host, port):
                 self.add_message(f"手动连接RFID读写器 {host}:{port} 成功")
 
         threading.Thread(target=connect_thread, daemon=True).start()
         self.connect_button.config(state='disabled', text="连接中...")
         self.add_message(f"正在连接RFID读写器 {host}:{port}...")
 
+    def discover_readers(self):
+        """在站点网段内搜索读写器"""
+        def discover_thread():
+            try:
+                readers, error = self.engine.discover_readers(), None
+            except (OSError, ValueError) as e:
+                readers, error = [], str(e)
+            self.events.call(self.apply_discovery, readers, error)
+
+        threading.Thread(target=discover_thread, daemon=True).start()
+        self.discover_button.config(state='disabled', text="搜索中...")
+        self.add_message(f"正在搜索读写器: {', '.join(self.engine.config['discovery']['networks'])}")
+
+    def apply_discovery(self, readers: list, error):
+        """显示搜索结果（Tk主线程），只找到一个时直接填入地址"""
+        from discovery import format_results
+        self.discover_button.config(state='normal', text="搜索读写器")
+        if error:
+            self._append_message(f"搜索读写器失败: {error}")
+            return
+        if not readers:
+            self._append_message("未找到读写器")
+            return
+        for line in format_results(readers):
+            self._append_message(f"找到读写器 {line}")
+        if len(readers) == 1:
+            self.use_discovered_reader(readers[0])
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("选择读写器")
+        listbox = tk.Listbox(window, width=50, height=min(len(readers), 15), font=("Consolas", 10))
+        for line in format_results(readers):
+            listbox.insert(tk.END, line)
+        listbox.pack(fill='both', expand=True, padx=10, pady=10)
+        listbox.selection_set(0)
+
+        def _use(_event=None):
+            selection = listbox.curselection()
+            if selection:
+                self.use_discovered_reader(readers[selection[0]])
+            window.destroy()
+
+        listbox.bind('<Double-Button-1>', _use)
+        tk.Button(window, text="使用该读写器", command=_use).pack(pady=(0, 10))
+
+    def use_discovered_reader(self, reader):
+        """将搜索到的读写器地址填入连接设置"""
+        if self.engine.get_reader(self.reader_name).get_connection_status():
+            self._append_message("读写器已连接，断开后才能修改地址")
+            return
+        self.host_entry.delete(0, tk.END)
+        self.host_entry.insert(0, reader.host)
+        self.port_entry.delete(0, tk.END)
+        self.port_entry.insert(0, str(reader.port))
+        self._append_message(f"已选择读写器 {reader.host}:{reader.port}，点击连接")
+
+    def apply_tray_settings(self):
+        """将界面上的托盘编号和装载数量同步到引擎"""
+        try:
+            capacity = int(self.tray_load_entry.get())
+        except ValueError:
+            messagebox.showerror("错误", "托盘装载货物数量必须是数字")
+            return
+        self.engine.set_tray(self.tray_id_entry.get().strip(), capacity)
+        self.add_message(f"托盘设置已更新: {self.tray_id_entry.get().strip()}, 数量 {capacity}")
+
     def disconnect_rfid(self):
         """断开RFID读写器连接"""
-        self.rfid_reader.disconnect()
+        self.engine.disconnect(self.reader_name)
         self.add_message("手动断开RFID读写器连接")
 
-    # RFID读写器回调函数
-    def on_rfid_data_received(self, data):
-        """RFID数据接收回调"""
-        def update_ui():
-            if isinstance(data, bytes):
-                # 处理二进制数据
-                hex_str = ' '.join([f'{b:02X}' for b in data])
-                # self.add_message(f"收到RFID数据: {hex_str}")
-                self.process_rfid_data(data)
-            elif isinstance(data, dict):
-                # 处理JSON数据
-                self.add_message(f"收到RFID JSON数据: {data}")
-                self.handle_json_data(data)
-
-        self.root.after(0, update_ui)
-
-    def on_rfid_connection_changed(self, connected, message):
-        """RFID连接状态回调"""
-        def update_ui():
-            if connected:
-                self.socket_status_label.config(text="● 已连接", fg='#27ae60')
-                self.connect_button.config(state='disabled', text="已连接")
-                self.disconnect_button.config(state='normal', bg='#e74c3c')
-                self.host_entry.config(state='disabled')
-                self.port_entry.config(state='disabled')
-            else:
-                self.socket_status_label.config(text="● 未连接", fg='#e74c3c')
-                self.connect_button.config(state='normal', text="连接RFID读写器")
-                self.disconnect_button.config(state='disabled', bg='#95a5a6')
-                self.host_entry.config(state='normal')
-                self.port_entry.config(state='normal')
+    # RFID引擎回调函数（在读写器线程中调用，只发布事件，界面更新由Tk主线程统一应用）
+    def on_rfid_frame_received(self, reader_name, frame: bytes):
+        """RFID协议帧回调"""
+        self.events.publish(FrameEvent(reader_name, frame))
 
-            self.add_message(message)
+    def on_rfid_tag_received(self, reader_name, tag: RFIDTag, is_new: bool):
+        """RFID标签回调（引擎已完成解析）"""
+        if self.startup_timer.mark('first_tag'):
+            self.events.call(self.report_startup)
+        # 标签列表数据直接更新（线程安全），表格控件按刷新间隔只渲染可见行
+        self.tag_model.upsert(tag)
+        self.events.publish(TagEvent(reader_name, tag, is_new))
 
-        self.root.after(0, update_ui)
+    def on_rfid_json_received(self, reader_name, data: dict):
+        """RFID JSON数据回调"""
+        self.events.publish(JsonEvent(reader_name, data))
 
-    def on_rfid_error(self, error_msg):
-        """RFID错误回调"""
-        def update_ui():
-            self.add_message(f"RFID错误: {error_msg}")
-            # 只在重要错误时显示弹窗
-            if "连接" in error_msg or "断开" in error_msg:
-                messagebox.showerror("RFID错误", error_msg)
+    def on_rfid_connection_changed(self, reader_name, connected, message):
+        """RFID连接状态回调"""
+        if connected and self.startup_timer.mark('first_connected'):
+            self.events.call(self.report_startup)
+        self.events.publish(ConnectionEvent(reader_name, connected, message))
 
-        self.root.after(0, update_ui)
+    def on_rfid_error(self, reader_name, error_msg):
+        """RFID错误回调"""
+        self.events.publish(ErrorEvent(reader_name, error_msg))
+
+    def on_watchdog_event(self, event, name, seconds):
+        """线程监视回调（监视线程，Tk主线程停顿时消息在恢复后显示）"""
+        if event == EVENT_STALL:
+            text = f"线程停顿: {name} 已 {seconds:.1f} 秒没有响应（调用栈已输出到日志）"
+        elif event == EVENT_RECOVER:
+            text = f"线程恢复: {name}"
+        else:
+            text = f"读写器无数据: {name} 已 {seconds:.1f} 秒没有收到数据"
+        print(text)
+        self.add_message(text)
+
+    def on_rule_alarm(self, rule, reader_name, tag, message):
+        """标签规则报警回调"""
+        self.events.publish(AlarmEvent(rule, reader_name, tag, message))
+
+    # 事件处理（Tk主线程）
+    def setup_event_handlers(self):
+        """注册事件处理函数并启动事件处理"""
+        self.events.subscribe(FrameEvent, lambda e: self.process_rfid_data(e.frame))
+        self.events.subscribe(TagEvent, self.apply_tag_event)
+        self.events.subscribe(JsonEvent, self.apply_json_event)
+        self.events.subscribe(ConnectionEvent, self.apply_connection_event)
+        self.events.subscribe(ErrorEvent, self.apply_error_event)
+        self.events.subscribe(AlarmEvent, self.apply_alarm_event)
+        self.events.subscribe(MessageEvent, lambda e: self._append_message(e.text))
+        self.events.pump_tk(self.root, self.ui_config['event_interval_ms'])
+        if self.engine.watchdog:
+            self.engine.watchdog.probe_tk(self.root)
+
+    def apply_tag_event(self, event: TagEvent):
+        """应用标签事件"""
+        if event.tag.duplicate:
+            self._append_message(f"重复标签（本次生产已处理过）: {event.tag.epc}")
+        self.update_rfid_data(event.tag)
+
+    def apply_json_event(self, event: JsonEvent):
+        """应用JSON数据事件"""
+        self._append_message(f"收到RFID JSON数据: {event.data}")
+        self.handle_json_data(event.data)
+
+    def apply_connection_event(self, event: ConnectionEvent):
+        """应用连接状态事件"""
+        if event.connected:
+            self.socket_status_label.config(text="● 已连接", fg='#27ae60')
+            self.connect_button.config(state='disabled', text="已连接")
+            self.disconnect_button.config(state='normal', bg='#e74c3c')
+            self.host_entry.config(state='disabled')
+            self.port_entry.config(state='disabled')
+        else:
+            self.socket_status_label.config(text="● 未连接", fg='#e74c3c')
+            self.connect_button.config(state='normal', text="连接RFID读写器")
+            self.disconnect_button.config(state='disabled', bg='#95a5a6')
+            self.host_entry.config(state='normal')
+            self.port_entry.config(state='normal')
+
+        self._append_message(event.message)
+
+    def apply_alarm_event(self, event: AlarmEvent):
+        """应用规则报警事件（提示音，贴标后内容区域红色显示）"""
+        self.root.bell()
+        self._append_message(f"报警 [{event.rule}] {event.message}")
+        self.after_text.delete('1.0', tk.END)
+        self.after_text.insert('1.0', f"报警 [{event.rule}] {event.message}\nEPC: {event.tag.epc}", 'alarm')
+        self.after_text.tag_config('alarm', foreground='#e74c3c')
+
+    def apply_error_event(self, event: ErrorEvent):
+        """应用错误事件"""
+        self._append_message(f"RFID错误: {event.message}")
+        # 错误汇总显示在横幅中，不再弹窗（连接反复断开时弹窗会阻塞界面）
+        self.refresh_error_banner()
+
+    # 配置热加载
+    def on_config_reloaded(self, config: dict):
+        """配置文件重新加载回调（监视线程）"""
+        messages = self.engine.apply_config(config)
+        self.events.call(self.apply_ui_config, config['ui'], messages)
+
+    def apply_ui_config(self, ui_config: dict, messages: list):
+        """应用界面配置（Tk主线程）"""
+        self.ui_config = ui_config
+        self.max_history_size = ui_config['history_size']
+        self.events.max_batch = ui_config['event_batch']
+        self.tag_model.max_rows = ui_config['table_max_rows']
+        self.tag_table.refresh_ms = ui_config['table_refresh_ms']
+        self.tag_table.resort_ms = ui_config['table_resort_ms']
+        self.zone_display.clear()
+        self._append_message("站点配置已重新加载")
+        for message in messages:
+            self._append_message(message)
 
     def process_rfid_data(self, data: bytes):
         """处理RFID二进制数据"""
@@ -476,10 +779,8 @@ class RFIDProductionSystem:
             command = data[4]  # 命令字
             self.add_message(f"解析协议: 长度={len(data)}, 命令=0x{command:02X}")
 
-            # 根据命令类型更新界面
-            if command == 0x83:  # loop应答
-                self.update_rfid_data(data)
-            elif command == 0x8D:  # loop停止应答
+            # 标签数据（loop应答）由引擎解析后通过 on_rfid_tag_received 更新界面
+            if command == CMD_ACK_TYPE_RFID_LOOP_STOP:  # loop停止应答
                 self.update_production_status(data)
 
         except Exception as e:
@@ -498,24 +799,9 @@ class RFIDProductionSystem:
             self.add_message(f"收到JSON数据: {data}")
 
     def handle_production_data(self, data):
-        """处理生产数据"""
+        """处理生产数据（生产统计由引擎根据标签事件计算，这里只记录上位机下发的数据）"""
         production_data = data.get('data', {})
-
-        if 'daily_production' in production_data:
-            self.daily_production = production_data['daily_production']
-            self.daily_label.config(text=str(self.daily_production))
-
-        if 'current_load' in production_data:
-            self.current_load = production_data['current_load']
-            self.current_load_label.config(text=str(self.current_load))
-            self.tray_load_entry.delete(0, tk.END)
-            self.tray_load_entry.insert(0, str(self.current_load))
-
-        if 'line_runtime' in production_data:
-            self.line_runtime = production_data['line_runtime']
-            self.runtime_label.config(text=self.line_runtime)
-
-        self.add_message("生产数据已更新")
+        self.add_message(f"收到生产数据: {production_data}")
 
     def handle_status_update(self, data):
         """处理状态更新"""
@@ -573,41 +859,21 @@ class RFIDProductionSystem:
         # 根据你的实际协议实现
         pass
 
-    def process_rfid_data_epc_tid_user(self, data: bytes) -> dict:
-        """
-                解析RFID数据并返回RFIDTag对象
-
-                Args:
-                    data: 接收到的完整数据包
-
-                Returns:
-                    RFIDTag: 包含解析结果的标签对象
-                """
-        tag = RFIDTag()
-        success = tag.from_bytes(data)
-
-        if success:
-            self.current_tag = tag
-            # 添加到历史记录
-            # self.tag_history.append(tag)
-            # # 限制历史记录大小
-            # if len(self.tag_history) > self.max_history_size:
-            #     self.tag_history.pop(0)
-        return tag
-
-    def update_rfid_data(self, data: bytes):
-        """根据二进制数据更新RFID数据"""
-        print('update_rfid_data')
-        # 根据你的实际协议实现
-        tag = self.process_rfid_data_epc_tid_user(data)
-        # display_text = f"EPC: {result['epc']}\nTID: {result['tid']}\nUSER: {result['user']}\nRSSI: {result['rssi']}\nPC: {result['pc']}\nant_num: {result['ant_num']}"
+    def update_rfid_data(self, tag: RFIDTag):
+        """根据引擎解析出的标签更新RFID数据"""
+        self.engine.profiler.tracer.mark(tag.trace_slot, STAGE_UI)
+        self.current_tag = tag
+        # 按仲裁后的归属天线显示，标签归属未变化且正在显示时不重复刷新
         if tag.success:
+            zone = tag.zone_antenna or tag.antenna_num
+            if not tag.zone_changed and self.zone_display.get(zone) == tag.epc:
+                return
+            self.zone_display[zone] = tag.epc
             display_text = self._format_tag_list_display(tag)
-            if tag.antenna_num == 1:
+            if zone == self.ui_config['fetch_antenna']:
                 self.update_element_text(self.fetch_text, display_text)
-            elif tag.antenna_num == 2:
+            elif zone == self.ui_config['after_antenna']:
                 self.update_element_text(self.after_text, display_text)
-        pass
 
     def _format_tag_display(self, tag: RFIDTag) -> str:
         """格式化标签信息用于显示"""
@@ -617,6 +883,7 @@ class RFIDProductionSystem:
                 f"RSSI: {tag.rssi:.1f} dBm\n"
                 f"天线: {tag.antenna_num}\n"
                 f"产品: {tag.product_name}\n"
+                f"GTIN: {tag.gtin or '无'}\n"
                 f"生产企业: {tag.manufacturer}\n"
                 f"许可证: {tag.license_number}\n"
                 f"生产日期: {tag.production_date}\n"
@@ -636,25 +903,27 @@ class RFIDProductionSystem:
                 f"天线: {tag.antenna_num}\n")
 
     def add_message(self, message):
-        """添加消息到消息框"""
-        def _add_message():
-            self.message_text.config(state='normal')
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.message_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.message_text.see(tk.END)
-            self.message_text.config(state='disabled')
-
-            # 限制消息数量
-            lines = int(self.message_text.index('end-1c').split('.')[0])
-            if lines > 100:  # 保留最近100条消息
-                self.message_text.delete('1.0', '2.0')
+        """添加消息到消息框（任意线程均可调用）"""
+        self.events.publish(MessageEvent(message))
+
+    def _append_message(self, message):
+        """在消息框末尾追加消息（Tk主线程）"""
+        self.message_text.config(state='normal')
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.message_text.insert(tk.END, f"[{timestamp}] {message}\n")
+        self.message_text.see(tk.END)
+        self.message_text.config(state='disabled')
 
-        self.root.after(0, _add_message)
+        # 限制消息数量
+        lines = int(self.message_text.index('end-1c').split('.')[0])
+        excess = lines - self.ui_config['message_limit']
+        if excess > 0:  # 保留最近的消息
+            self.message_text.delete('1.0', f'{excess + 1}.0')
 
     def on_closing(self):
         """程序关闭时的清理工作"""
-        if hasattr(self, 'rfid_reader'):
-            self.rfid_reader.disconnect()
+        if hasattr(self, 'engine'):
+            self.engine.stop()
         self.root.destroy()
 
     def update_element_text(self, element, text: str, **kwargs) -> bool:
@@ -736,17 +1005,37 @@ class RFIDProductionSystem:
                 print(f"更新控件文本失败: {e}")
                 return False
 
-        self.root.after(0, _update)
+        # Tk控件只能在主线程中修改，其他线程通过事件通道转交
+        if threading.current_thread() is threading.main_thread():
+            _update()
+        else:
+            self.events.call(_update)
         return True
 
 
 def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='RFID贴标生产系统')
+    parser.add_argument('-c', '--config', help='站点配置文件（JSON/TOML，修改后自动重新加载）')
+    args = parser.parse_args()
+
+    startup_timer = StartupTimer(_STARTUP_T0)
+    startup_timer.mark('imports')
+
     root = tk.Tk()
-    app = RFIDProductionSystem(root)
+    engine = RFIDEngine(load_config(args.config))
+    startup_timer.mark('engine')
+    app = RFIDProductionSystem(root, engine, startup_timer)
 
     # 设置关闭窗口事件
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
 
+    # 监视配置文件，修改后在运行中应用
+    if args.config:
+        watcher = ConfigWatcher(args.config, engine.config['reload_interval'])
+        watcher.set_callbacks(reload_callback=app.on_config_reloaded, error_callback=app.add_message)
+        watcher.start()
+
     root.mainloop()
 
 
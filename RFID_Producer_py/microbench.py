@@ -0,0 +1,515 @@
+# microbench.py
+"""
+协议基础操作微基准测试
+对最常修改的基础操作单独计时（端到端吞吐见 replay.py），发现具体哪一步变慢:
+    frame.*     FrameParser 帧切分（干净数据流 / 含噪声和伪帧头的数据流）、异或校验
+    tag.*       RFIDTag.from_bytes / to_dict / from_dict
+    hex.*       十六进制格式化的几种写法（RFIDTag 当前使用 join）
+    command.*   command.build_command 指令帧构造
+    filter.*    FramePrefilter.accept、GS1 EPC解码
+    dedup.*     EPCIndex 去重、TrayAggregator 托盘计数
+
+测试数据由固定随机种子生成，每次运行完全相同。计时方式:
+    1. 预热: 先运行若干次（不计入结果），之后按 min_time 确定每个样本的循环次数
+    2. 采样: 采集 samples 个样本，每个样本为 循环次数 × 每次操作数 的平均单次耗时
+    3. 统计: 中位数、平均值、标准差、p95（纳秒/次）
+
+用法:
+    python microbench.py                              # 运行全部
+    python microbench.py -k frame -k hex              # 只运行名称包含关键字的项
+    python microbench.py --save baseline.json         # 保存为基线
+    python microbench.py --compare baseline.json      # 与基线比较，中位数变慢超过阈值时返回1
+"""
+
+import argparse
+import binascii
+import gc
+import json
+import math
+import platform
+import random
+import statistics
+import struct
+import sys
+import time
+from collections import namedtuple
+from typing import Callable, List, Optional, Tuple
+from command import build_command, CMD_RFID_QUERY, CMD_TYPE_RFID_READ, CMD_TYPE_RFID_WRITE, MEM_BANK_USER
+from epc_decoder import EPCDecoder
+from epc_index import EPCIndex
+from prefilter import FramePrefilter
+from protocol import FrameParser, xor_checksum, verify_checksum
+from rfid_tag import RFIDTag
+from tray import TrayAggregator
+
+DEFAULT_SEED = 20240501
+CORPUS_SIZE = 2000  # 每种测试数据的条数
+CHUNK_SIZE = 1460  # 模拟TCP分段大小
+
+BASELINE_VERSION = 1
+
+# 测试项: 名称, 说明, 准备函数(测试数据) -> (被测函数, 每次调用的操作数)
+Benchmark = namedtuple('Benchmark', 'name description setup')
+
+# 测试结果（耗时单位均为纳秒/次）
+BenchResult = namedtuple('BenchResult', 'name loops ops median mean stdev p95 samples')
+
+# 比较结果: 名称, 基线中位数, 当前中位数, 变化比例, 结论
+Comparison = Tuple[str, float, float, float, str]
+
+
+# 测试数据
+class Corpus:
+    """固定种子生成的测试数据"""
+
+    def __init__(self, seed: int = DEFAULT_SEED, size: int = CORPUS_SIZE):
+        rng = random.Random(seed)
+        self.epcs = [self._sgtin96(rng) for _ in range(size)]
+        self.frames = [self._tag_frame(rng, epc) for epc in self.epcs]
+        self.stream = b''.join(self.frames)
+        self.noisy_stream = self._noisy(rng, self.frames)
+        self.tags = []
+        for frame in self.frames:
+            tag = RFIDTag()
+            tag.from_bytes(frame)
+            self.tags.append(tag)
+        self.dicts = [tag.to_dict() for tag in self.tags]
+        self.commands = [self._command(rng) for _ in range(size)]
+        # 重复读取: 每个EPC平均出现4次，顺序打乱（接近产线上同一标签被多次读到的情况）
+        self.reads = [rng.randrange(size) for _ in range(size * 4)]
+
+    @staticmethod
+    def _sgtin96(rng: random.Random) -> bytes:
+        """SGTIN-96 EPC（分区5: 7位厂商代码 + 6位项目代码），少量为非GS1编码"""
+        if rng.random() < 0.05:
+            return bytes(rng.getrandbits(8) for _ in range(12))
+        company = rng.choice((6901234, 6923456, 6940001))
+        item = rng.randrange(100000, 1000000)
+        serial = rng.getrandbits(38)
+        value = (0x30 << 88) | (1 << 85) | (5 << 82) | (company << 58) | (item << 38) | serial
+        return value.to_bytes(12, 'big')
+
+    @staticmethod
+    def _tag_frame(rng: random.Random, epc: bytes) -> bytes:
+        """标签上报帧（命令字 0x83，51字节数据区）"""
+        tid = bytes([0xE2, 0x80, 0x11, 0x05]) + bytes(rng.getrandbits(8) for _ in range(8))
+        user = bytes(rng.getrandbits(8) for _ in range(16))
+        rssi = rng.randrange(-750, -300)
+        antenna = rng.choice((1, 2, 2, 2, 3, 4))
+        body = bytes([0x00, 0x35, 0x83]) + b'\x30\x00' + epc + tid + user + struct.pack('>h', rssi) + bytes([antenna])
+        return b'\xA5\x5A' + body + bytes([xor_checksum(body)]) + b'\x0D\x0A'
+
+    @staticmethod
+    def _noisy(rng: random.Random, frames: List[bytes]) -> bytes:
+        """帧之间插入随机噪声，部分噪声包含伪帧头（长度非法、帧尾错误、校验错误）"""
+        parts = []
+        for frame in frames:
+            roll = rng.random()
+            if roll < 0.1:
+                parts.append(bytes(rng.getrandbits(8) for _ in range(rng.randrange(1, 40))))
+            elif roll < 0.15:
+                parts.append(b'\xA5\x5A\x00\x03')  # 长度非法
+            elif roll < 0.2:
+                bad = bytearray(frame)
+                bad[-3] ^= 0xFF  # 校验错误
+                parts.append(bytes(bad))
+            elif roll < 0.22:
+                parts.append(frame[:rng.randrange(4, len(frame) - 1)])  # 截断的帧
+            parts.append(frame)
+        return b''.join(parts)
+
+    @staticmethod
+    def _command(rng: random.Random) -> Tuple[int, bytes]:
+        roll = rng.random()
+        if roll < 0.5:
+            return CMD_RFID_QUERY[4], b''
+        tid = bytes(rng.getrandbits(8) for _ in range(12))
+        if roll < 0.75:
+            return CMD_TYPE_RFID_READ, tid + bytes([MEM_BANK_USER, 0, 0, 8])
+        data = bytes(rng.getrandbits(8) for _ in range(16))
+        return CMD_TYPE_RFID_WRITE, tid + bytes([MEM_BANK_USER, 0, 0, 8]) + bytes(4) + data
+
+
+def _chunks(data: bytes, size: int = CHUNK_SIZE) -> List[bytes]:
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+# 测试项
+def _setup_feed_clean(corpus: Corpus):
+    chunks = _chunks(corpus.stream)
+
+    def run():
+        parser = FrameParser(check_sum=False)
+        for chunk in chunks:
+            parser.feed(chunk)
+    return run, len(corpus.frames)
+
+
+def _setup_feed_noisy(corpus: Corpus):
+    chunks = _chunks(corpus.noisy_stream)
+
+    def run():
+        parser = FrameParser(check_sum=True)
+        for chunk in chunks:
+            parser.feed(chunk)
+    return run, len(corpus.frames)
+
+
+def _setup_verify_checksum(corpus: Corpus):
+    frames = corpus.frames
+
+    def run():
+        for frame in frames:
+            verify_checksum(frame)
+    return run, len(frames)
+
+
+def _setup_from_bytes(corpus: Corpus):
+    frames = corpus.frames
+
+    def run():
+        for frame in frames:
+            RFIDTag().from_bytes(frame)
+    return run, len(frames)
+
+
+def _setup_to_dict(corpus: Corpus):
+    tags = corpus.tags
+
+    def run():
+        for tag in tags:
+            tag.to_dict()
+    return run, len(tags)
+
+
+def _setup_from_dict(corpus: Corpus):
+    dicts = corpus.dicts
+
+    def run():
+        for data in dicts:
+            RFIDTag().from_dict(data)
+    return run, len(dicts)
+
+
+def _setup_hex_join(corpus: Corpus):
+    epcs = corpus.epcs
+
+    def run():
+        for epc in epcs:
+            ' '.join([f'{b:02X}' for b in epc])
+    return run, len(epcs)
+
+
+def _setup_hex_method(corpus: Corpus):
+    epcs = corpus.epcs
+
+    def run():
+        for epc in epcs:
+            epc.hex(' ').upper()
+    return run, len(epcs)
+
+
+def _setup_hex_binascii(corpus: Corpus):
+    epcs = corpus.epcs
+
+    def run():
+        for epc in epcs:
+            binascii.hexlify(epc, ' ').decode('ascii').upper()
+    return run, len(epcs)
+
+
+def _setup_build_command(corpus: Corpus):
+    commands = corpus.commands
+
+    def run():
+        for cmd, payload in commands:
+            build_command(cmd, payload)
+    return run, len(commands)
+
+
+def _setup_prefilter(corpus: Corpus):
+    prefilter = FramePrefilter(epc_prefixes=['30'], min_rssi=-70.0, antennas=[1, 2, 3])
+    frames = corpus.frames
+
+    def run():
+        accept = prefilter.accept
+        for frame in frames:
+            accept(frame)
+    return run, len(frames)
+
+
+def _setup_epc_decode(corpus: Corpus):
+    decoder = EPCDecoder()
+    epcs = corpus.epcs
+
+    def run():
+        decode = decoder.decode
+        for epc in epcs:
+            decode(epc)
+    return run, len(epcs)
+
+
+def _setup_index_add(corpus: Corpus):
+    keys = [corpus.epcs[i] for i in corpus.reads]
+
+    def run():
+        index = EPCIndex(capacity=len(corpus.epcs) * 2)
+        add = index.add
+        for key in keys:
+            add(key)
+    return run, len(keys)
+
+
+def _setup_index_contains(corpus: Corpus):
+    index = EPCIndex(capacity=len(corpus.epcs) * 2)
+    for epc in corpus.epcs[::2]:
+        index.add(epc)
+    epcs = corpus.epcs
+
+    def run():
+        contains = index.contains
+        for epc in epcs:
+            contains(epc)
+    return run, len(epcs)
+
+
+def _setup_tray_add(corpus: Corpus):
+    tags = [corpus.tags[i] for i in corpus.reads]
+
+    def run():
+        tray = TrayAggregator(capacity=32, count_antenna=0)
+        add = tray.add
+        for tag in tags:
+            add(tag)
+    return run, len(tags)
+
+
+BENCHMARKS = (
+    Benchmark('frame.feed_clean', 'FrameParser.feed 干净数据流（按1460字节分段，不校验）', _setup_feed_clean),
+    Benchmark('frame.feed_noisy', 'FrameParser.feed 含噪声和伪帧头的数据流（校验）', _setup_feed_noisy),
+    Benchmark('frame.verify_checksum', 'verify_checksum 标签帧', _setup_verify_checksum),
+    Benchmark('tag.from_bytes', 'RFIDTag.from_bytes（含EPC解码）', _setup_from_bytes),
+    Benchmark('tag.to_dict', 'RFIDTag.to_dict', _setup_to_dict),
+    Benchmark('tag.from_dict', 'RFIDTag.from_dict', _setup_from_dict),
+    Benchmark('hex.join_format', "' '.join(f'{b:02X}') 12字节EPC", _setup_hex_join),
+    Benchmark('hex.bytes_hex', "bytes.hex(' ').upper() 12字节EPC", _setup_hex_method),
+    Benchmark('hex.binascii', "binascii.hexlify(sep=' ') 12字节EPC", _setup_hex_binascii),
+    Benchmark('command.build_command', 'build_command 查询/读取/写入指令', _setup_build_command),
+    Benchmark('filter.prefilter_accept', 'FramePrefilter.accept 前缀+RSSI+天线', _setup_prefilter),
+    Benchmark('filter.epc_decode', 'EPCDecoder.decode SGTIN-96（带缓存）', _setup_epc_decode),
+    Benchmark('dedup.index_add', 'EPCIndex.add 重复读取（每次新建索引）', _setup_index_add),
+    Benchmark('dedup.index_contains', 'EPCIndex.contains 半数命中', _setup_index_contains),
+    Benchmark('dedup.tray_add', 'TrayAggregator.add 重复读取（每次新建托盘）', _setup_tray_add),
+)
+
+
+# 计时
+def _time_loops(func: Callable[[], None], loops: int) -> float:
+    timer = time.perf_counter
+    start = timer()
+    for _ in range(loops):
+        func()
+    return timer() - start
+
+
+def calibrate(func: Callable[[], None], min_time: float) -> int:
+    """确定每个样本的循环次数（单个样本耗时不少于 min_time）"""
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_time:
+            return loops
+        if elapsed <= 0:
+            loops *= 10
+        else:
+            loops = max(loops + 1, int(math.ceil(loops * min_time / elapsed)))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """已排序数据的百分位数（线性插值）"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * fraction
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def run_benchmark(bench: Benchmark, corpus: Corpus, samples: int = 20, warmup: int = 3,
+                  min_time: float = 0.02) -> BenchResult:
+    """
+    运行一个测试项
+
+    Args:
+        bench: 测试项
+        corpus: 测试数据
+        samples: 样本数
+        warmup: 预热次数（不计入结果）
+        min_time: 单个样本的最短耗时（秒）
+
+    Returns:
+        测试结果（纳秒/次）
+    """
+    func, ops = bench.setup(corpus)
+    for _ in range(warmup):
+        func()
+    loops = calibrate(func, min_time)
+
+    gc.collect()
+    values = []
+    for _ in range(samples):
+        values.append(_time_loops(func, loops) * 1e9 / (loops * ops))
+    ordered = sorted(values)
+    return BenchResult(bench.name, loops, ops, statistics.median(ordered), statistics.mean(ordered),
+                       statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+                       percentile(ordered, 0.95), values)
+
+
+def select_benchmarks(keywords: Optional[List[str]] = None) -> List[Benchmark]:
+    """按关键字选择测试项（名称包含任一关键字）"""
+    if not keywords:
+        return list(BENCHMARKS)
+    return [b for b in BENCHMARKS if any(k in b.name for k in keywords)]
+
+
+# 基线
+def save_baseline(path: str, results: List[BenchResult], seed: int):
+    """保存测试结果为基线文件（JSON）"""
+    data = {
+        'version': BASELINE_VERSION,
+        'seed': seed,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'benchmarks': {r.name: {'median': r.median, 'mean': r.mean, 'stdev': r.stdev, 'p95': r.p95,
+                                'loops': r.loops, 'ops': r.ops} for r in results},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"基线文件版本不支持: {data.get('version')}")
+    return data
+
+
+def compare(results: List[BenchResult], baseline: dict, threshold: float = 0.1) -> List[Comparison]:
+    """
+    与基线比较中位数
+
+    变慢比例超过 threshold，且差值大于两者标准差之和（排除噪声）时判定为变慢
+
+    Returns:
+        [(名称, 基线中位数, 当前中位数, 变化比例, 结论)]，结论为 '变慢' / '变快' / '持平' / '新增'
+    """
+    rows = []
+    base = baseline['benchmarks']
+    for r in results:
+        old = base.get(r.name)
+        if old is None:
+            rows.append((r.name, 0.0, r.median, 0.0, '新增'))
+            continue
+        change = r.median / old['median'] - 1 if old['median'] else 0.0
+        significant = abs(r.median - old['median']) > r.stdev + old['stdev']
+        if change > threshold and significant:
+            verdict = '变慢'
+        elif change < -threshold and significant:
+            verdict = '变快'
+        else:
+            verdict = '持平'
+        rows.append((r.name, old['median'], r.median, change, verdict))
+    return rows
+
+
+# 输出
+def format_ns(value: float) -> str:
+    if value >= 1e6:
+        return f"{value / 1e6:.2f}ms"
+    if value >= 1e3:
+        return f"{value / 1e3:.2f}us"
+    return f"{value:.1f}ns"
+
+
+def format_result(r: BenchResult) -> str:
+    return (f"{r.name:<26} 中位数 {format_ns(r.median):>9}  平均 {format_ns(r.mean):>9}  "
+            f"标准差 ±{r.stdev / r.median * 100 if r.median else 0:4.1f}%  p95 {format_ns(r.p95):>9}  "
+            f"({r.loops}×{r.ops}次/样本)")
+
+
+def format_comparison(rows: List[Comparison]) -> str:
+    lines = ["与基线比较（中位数）:"]
+    for name, old, new, change, verdict in rows:
+        if verdict == '新增':
+            lines.append(f"  {name:<26} {'-':>9} -> {format_ns(new):>9}  新增")
+        else:
+            lines.append(f"  {name:<26} {format_ns(old):>9} -> {format_ns(new):>9}  {change * 100:+6.1f}%  {verdict}")
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='RFID协议基础操作微基准测试')
+    parser.add_argument('-k', '--keyword', action='append', help='只运行名称包含关键字的项（可多次指定）')
+    parser.add_argument('-n', '--samples', type=int, default=20, help='每项的样本数')
+    parser.add_argument('-w', '--warmup', type=int, default=3, help='预热次数')
+    parser.add_argument('--min-time', type=float, default=0.02, help='单个样本的最短耗时（秒）')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='测试数据随机种子')
+    parser.add_argument('--save', metavar='FILE', help='保存结果为基线文件')
+    parser.add_argument('--compare', metavar='FILE', help='与基线文件比较')
+    parser.add_argument('--threshold', type=float, default=0.1, help='判定变慢的比例（0.1 表示慢10%%）')
+    parser.add_argument('--list', action='store_true', help='列出测试项')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    benchmarks = select_benchmarks(args.keyword)
+    if args.list:
+        for bench in benchmarks:
+            print(f"{bench.name:<26} {bench.description}")
+        return 0
+    if not benchmarks:
+        print("没有匹配的测试项")
+        return 1
+    if args.samples < 2:
+        print("样本数至少为2")
+        return 1
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_baseline(args.compare)
+        except (OSError, ValueError) as e:
+            print(f"加载基线失败: {e}")
+            return 1
+        if baseline['seed'] != args.seed:
+            print(f"注意: 基线的测试数据种子为 {baseline['seed']}，与本次 {args.seed} 不同")
+
+    print(f"Python {platform.python_version()} ({platform.python_implementation()}), "
+          f"样本 {args.samples}, 预热 {args.warmup}, 种子 {args.seed}")
+    corpus = Corpus(args.seed)
+    results = []
+    for bench in benchmarks:
+        result = run_benchmark(bench, corpus, samples=args.samples, warmup=args.warmup, min_time=args.min_time)
+        results.append(result)
+        print(format_result(result))
+
+    if args.save:
+        save_baseline(args.save, results, args.seed)
+        print(f"基线已保存: {args.save}")
+
+    if baseline is not None:
+        rows = compare(results, baseline, args.threshold)
+        print(format_comparison(rows))
+        slower = [row[0] for row in rows if row[4] == '变慢']
+        if slower:
+            print(f"变慢超过 {args.threshold * 100:.0f}%: {', '.join(slower)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# prefilter.py
+"""
+标签帧预过滤模块
+在创建RFIDTag对象、解析十六进制字符串和产品信息之前，直接按原始帧固定偏移检查:
+    EPC前缀（带掩码）: 字节7-18
+    RSSI阈值:         字节47-48（有符号大端，单位0.1dBm）
+    天线号:           字节49
+不符合条件的帧直接丢弃，符合条件的帧可按比例抽样，以减少噪声较多站点的解析开销
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EPC_OFFSET = 7
+EPC_LEN = 12
+RSSI_OFFSET = 47
+ANTENNA_OFFSET = 49
+MIN_TAG_FRAME_LEN = 51
+
+# 丢弃原因
+DROP_SHORT = 'short'
+DROP_ANTENNA = 'antenna'
+DROP_RSSI = 'rssi'
+DROP_EPC = 'epc'
+DROP_SAMPLED = 'sampled'
+
+
+def parse_prefix(text: str) -> Tuple[int, int, int]:
+    """
+    解析EPC前缀规则
+
+    Args:
+        text: "E280" 或 "E280/FFF0"（前缀/掩码，十六进制，忽略空格）
+
+    Returns:
+        (字节数, 前缀值, 掩码值)
+    """
+    text = text.replace(' ', '')
+    prefix_hex, _, mask_hex = text.partition('/')
+    if not prefix_hex or len(prefix_hex) % 2 or len(prefix_hex) > EPC_LEN * 2:
+        raise ValueError(f"EPC前缀格式错误: {text}")
+    mask_hex = mask_hex or 'F' * len(prefix_hex)
+    if len(mask_hex) != len(prefix_hex):
+        raise ValueError(f"EPC掩码长度必须与前缀一致: {text}")
+    mask = int(mask_hex, 16)
+    return len(prefix_hex) // 2, int(prefix_hex, 16) & mask, mask
+
+
+class FramePrefilter:
+    """标签帧预过滤类"""
+
+    def __init__(self, epc_prefixes: Iterable[str] = (), min_rssi: Optional[float] = None,
+                 antennas: Iterable[int] = (), sample_every: int = 1):
+        """
+        初始化预过滤
+
+        Args:
+            epc_prefixes: 允许的EPC前缀规则列表（满足任一即可），为空表示不限制
+            min_rssi: 最低RSSI（dBm），低于该值的读数丢弃，None表示不限制
+            antennas: 允许的天线号，为空表示不限制
+            sample_every: 抽样间隔，通过过滤的帧每N帧保留1帧（1表示全部保留）。
+                          托盘计数依赖每个标签至少被保留一次，只适合标签会被重复读取多次的站点
+        """
+        self.rules: List[Tuple[int, int, int]] = [parse_prefix(p) for p in epc_prefixes]
+        self.min_rssi_raw = None if min_rssi is None else int(round(min_rssi * 10))
+        self.antenna_table = None
+        antennas = list(antennas)
+        if antennas:
+            self.antenna_table = bytearray(256)
+            for ant in antennas:
+                self.antenna_table[ant] = 1
+        self.sample_every = max(1, int(sample_every))
+
+        self.lock = threading.Lock()
+        self._sample_counter = 0
+        self.passed = 0
+        self.dropped: Dict[str, int] = {DROP_SHORT: 0, DROP_ANTENNA: 0, DROP_RSSI: 0,
+                                        DROP_EPC: 0, DROP_SAMPLED: 0}
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'FramePrefilter':
+        """由配置中的 prefilter 部分创建"""
+        return cls(epc_prefixes=config['epc_prefixes'], min_rssi=config['min_rssi'],
+                   antennas=config['antennas'], sample_every=config['sample_every'])
+
+    def accept(self, frame: bytes) -> bool:
+        """
+        检查标签帧是否需要解析（只读取固定偏移的字节，不创建对象）
+
+        Args:
+            frame: 完整标签帧
+
+        Returns:
+            bool: 是否保留
+        """
+        reason = self._check(frame)
+        with self.lock:
+            if reason is None and self.sample_every > 1:
+                self._sample_counter += 1
+                if self._sample_counter < self.sample_every:
+                    reason = DROP_SAMPLED
+                else:
+                    self._sample_counter = 0
+            if reason is None:
+                self.passed += 1
+                return True
+            self.dropped[reason] += 1
+            return False
+
+    def _check(self, frame: bytes) -> Optional[str]:
+        """返回丢弃原因，保留时返回None"""
+        if len(frame) < MIN_TAG_FRAME_LEN:
+            return DROP_SHORT
+
+        if self.antenna_table is not None and not self.antenna_table[frame[ANTENNA_OFFSET]]:
+            return DROP_ANTENNA
+
+        if self.min_rssi_raw is not None:
+            rssi_raw = int.from_bytes(frame[RSSI_OFFSET:RSSI_OFFSET + 2], 'big', signed=True)
+            if rssi_raw < self.min_rssi_raw:
+                return DROP_RSSI
+
+        if self.rules:
+            for length, prefix, mask in self.rules:
+                if int.from_bytes(frame[EPC_OFFSET:EPC_OFFSET + length], 'big') & mask == prefix:
+                    break
+            else:
+                return DROP_EPC
+
+        return None
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        with self.lock:
+            stats = {'passed': self.passed}
+            stats.update(self.dropped)
+            return stats
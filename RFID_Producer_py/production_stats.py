@@ -0,0 +1,254 @@
+# production_stats.py
+"""
+生产统计模块
+根据标签事件、托盘完成、连接和盘存启停事件增量计算生产统计:
+每分钟读取数、各天线读取速率、每小时完成托盘数、运行/停机时间、今日生产总量
+
+计数保存在固定长度的时间桶环形数组中，每个事件O(1)更新，界面读取时直接使用维护好的合计值
+"""
+
+import threading
+import time
+from array import array
+from datetime import date
+from typing import Dict, Optional, Set
+
+
+class RateRing:
+    """时间桶环形计数器（统计最近一段时间内的事件数）"""
+
+    def __init__(self, bucket_seconds: float = 1.0, buckets: int = 60):
+        """
+        初始化计数器
+
+        Args:
+            bucket_seconds: 每个时间桶的时长（秒）
+            buckets: 时间桶个数，统计窗口 = bucket_seconds × buckets
+        """
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.counts = array('L', [0]) * buckets
+        self.total = 0  # 窗口内合计
+        self.current = None  # 当前时间桶序号
+
+    @property
+    def window(self) -> float:
+        """统计窗口（秒）"""
+        return self.bucket_seconds * self.buckets
+
+    def _advance(self, now: float):
+        """移动到当前时间桶，清除已过期的桶（最多清除一圈）"""
+        index = int(now // self.bucket_seconds)
+        if self.current is None:
+            self.current = index
+            return
+        steps = index - self.current
+        if steps <= 0:
+            return
+        counts = self.counts
+        for i in range(self.current + 1, self.current + 1 + min(steps, self.buckets)):
+            slot = i % self.buckets
+            self.total -= counts[slot]
+            counts[slot] = 0
+        self.current = index
+
+    def add(self, now: float, n: int = 1):
+        """记录n个事件"""
+        self._advance(now)
+        self.counts[self.current % self.buckets] += n
+        self.total += n
+
+    def count(self, now: float) -> int:
+        """窗口内的事件数"""
+        self._advance(now)
+        return self.total
+
+
+class ProductionStats:
+    """生产统计类（线程安全）"""
+
+    def __init__(self, bucket_seconds: float = 1.0, window_buckets: int = 60,
+                 tray_bucket_seconds: float = 60.0, tray_window_buckets: int = 60,
+                 max_antennas: int = 8):
+        """
+        初始化生产统计
+
+        Args:
+            bucket_seconds: 标签读取速率的时间桶时长（秒）
+            window_buckets: 标签读取速率的时间桶个数（默认统计最近1分钟）
+            tray_bucket_seconds: 托盘完成速率的时间桶时长（秒）
+            tray_window_buckets: 托盘完成速率的时间桶个数（默认统计最近1小时）
+            max_antennas: 最大天线号
+        """
+        self.lock = threading.Lock()
+        self.max_antennas = max_antennas
+
+        # 速率统计
+        self.reads = RateRing(bucket_seconds, window_buckets)
+        self.new_tags = RateRing(bucket_seconds, window_buckets)
+        self.antenna_reads = [RateRing(bucket_seconds, window_buckets) for _ in range(max_antennas + 1)]
+        self.zone_reads = [RateRing(bucket_seconds, window_buckets) for _ in range(max_antennas + 1)]
+        self.trays = RateRing(tray_bucket_seconds, tray_window_buckets)
+
+        # 累计统计
+        self.total_reads = 0
+        self.total_trays = 0
+        self.daily_production = 0
+        self.day = date.today()
+
+        # 运行/停机时间: 有读写器已连接且正在盘存时视为运行
+        self.connected: Set[str] = set()
+        self.inventory: Set[str] = set()
+        self.started_at = time.monotonic()
+        self.state_since = self.started_at
+        self.line_running = False
+        self.runtime = 0.0
+        self.downtime = 0.0
+
+    # 事件记录
+    def record_tag(self, reader_name: str, antenna: int, is_new: bool, now: Optional[float] = None,
+                   zone: int = 0):
+        """
+        记录一次标签读取
+
+        Args:
+            reader_name: 读写器名称
+            antenna: 实际读到标签的天线号
+            is_new: 是否计入托盘
+            now: 时间（time.monotonic），为空时取当前时间
+            zone: 仲裁后的归属天线号（0表示未仲裁，不计入区域统计）
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.reads.add(now)
+            self.total_reads += 1
+            if 0 < antenna <= self.max_antennas:
+                self.antenna_reads[antenna].add(now)
+            if 0 < zone <= self.max_antennas:
+                self.zone_reads[zone].add(now)
+            if is_new:
+                self.new_tags.add(now)
+                self._check_day()
+                self.daily_production += 1
+            # 收到标签说明读写器正在盘存（如读写器上电即处于循环盘存模式）
+            if reader_name not in self.inventory:
+                self.inventory.add(reader_name)
+                self._update_state(now)
+
+    def record_tray(self, now: Optional[float] = None):
+        """记录一个托盘完成"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self.trays.add(now)
+            self.total_trays += 1
+
+    def set_connected(self, reader_name: str, connected: bool, now: Optional[float] = None):
+        """记录读写器连接状态变化（断开时同时视为停止盘存）"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            if connected:
+                self.connected.add(reader_name)
+            else:
+                self.connected.discard(reader_name)
+                self.inventory.discard(reader_name)
+            self._update_state(now)
+
+    def set_inventory(self, reader_name: str, running: bool, now: Optional[float] = None):
+        """记录读写器盘存启停"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            if running:
+                self.inventory.add(reader_name)
+            else:
+                self.inventory.discard(reader_name)
+            self._update_state(now)
+
+    def _update_state(self, now: float):
+        """更新运行/停机状态并累计上一状态的持续时间（调用方持有锁）"""
+        running = bool(self.connected & self.inventory)
+        if running == self.line_running:
+            return
+        self._accumulate(now)
+        self.line_running = running
+
+    def _accumulate(self, now: float):
+        elapsed = now - self.state_since
+        if self.line_running:
+            self.runtime += elapsed
+        else:
+            self.downtime += elapsed
+        self.state_since = now
+
+    def _check_day(self):
+        """跨天时清零今日生产总量"""
+        today = date.today()
+        if today != self.day:
+            self.day = today
+            self.daily_production = 0
+
+    # 快照恢复
+    def get_counters(self, now: Optional[float] = None) -> Dict[str, object]:
+        """获取累计统计（用于快照）"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self._accumulate(now)
+            return {'total_reads': self.total_reads, 'total_trays': self.total_trays,
+                    'daily_production': self.daily_production, 'day': self.day.toordinal(),
+                    'runtime': self.runtime, 'downtime': self.downtime}
+
+    def restore_counters(self, counters: Dict[str, object]):
+        """从快照恢复累计统计（今日生产总量只在同一天内恢复）"""
+        with self.lock:
+            self.total_reads = counters['total_reads']
+            self.total_trays = counters['total_trays']
+            self.runtime = counters['runtime']
+            self.downtime = counters['downtime']
+            if counters['day'] == self.day.toordinal():
+                self.daily_production = counters['daily_production']
+
+    # 查询
+    def get_snapshot(self, now: Optional[float] = None) -> Dict[str, object]:
+        """
+        获取统计快照
+
+        Returns:
+            dict: tags_per_min（每分钟读取数）、new_per_min（每分钟新增标签数）、
+                  antenna_per_min（各天线每分钟读取数）、zone_per_min（各归属天线区域每分钟读取数）、
+                  trays_per_hour、total_reads、
+                  total_trays、daily_production、runtime、downtime（秒）、line_running
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            self._accumulate(now)
+            self._check_day()
+            per_min = 60.0 / self.reads.window
+            per_hour = 3600.0 / self.trays.window
+            return {
+                'tags_per_min': self.reads.count(now) * per_min,
+                'new_per_min': self.new_tags.count(now) * per_min,
+                'antenna_per_min': {ant: ring.count(now) * per_min
+                                    for ant, ring in enumerate(self.antenna_reads)
+                                    if ant and ring.total},
+                'zone_per_min': {zone: ring.count(now) * per_min
+                                 for zone, ring in enumerate(self.zone_reads)
+                                 if zone and ring.total},
+                'trays_per_hour': self.trays.count(now) * per_hour,
+                'total_reads': self.total_reads,
+                'total_trays': self.total_trays,
+                'daily_production': self.daily_production,
+                'runtime': self.runtime,
+                'downtime': self.downtime,
+                'line_running': self.line_running,
+            }
+
+
+def format_duration(seconds: float) -> str:
+    """将秒数格式化为"X时X分"（与界面原有显示格式一致）"""
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}时{minutes % 60}分"
@@ -0,0 +1,264 @@
+# profiling.py
+"""
+性能诊断模块
+StageTracer: 记录每帧数据在各处理阶段的时间戳（time.monotonic_ns），保存在预分配的环形数组中，
+             按需输出各阶段耗时直方图
+Profiler:    运行中开启/关闭阶段计时、cProfile和tracemalloc，无需重启产线
+             （service.py 通过信号控制，界面通过“诊断”菜单控制）
+
+处理阶段:
+    receive  收到读写器数据（进入引擎）
+    frame    切分出完整帧
+    parse    标签解析完成
+    dispatch 调用标签回调
+    ui       界面应用标签显示
+"""
+
+import cProfile
+import io
+import itertools
+import os
+import threading
+import time
+import tracemalloc
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, List
+
+STAGES = ('receive', 'frame', 'parse', 'dispatch', 'ui')
+STAGE_RECEIVE, STAGE_FRAME, STAGE_PARSE, STAGE_DISPATCH, STAGE_UI = range(len(STAGES))
+NO_TRACE = -1
+HISTOGRAM_BUCKETS = 24  # 按2的幂划分（微秒）: <1, <2, <4 ... 约8秒
+
+
+class StageTracer:
+    """处理阶段计时类"""
+
+    def __init__(self, capacity: int = 65536):
+        """
+        初始化计时环形数组
+
+        Args:
+            capacity: 保留的最近帧数
+        """
+        self.capacity = capacity
+        self.times = array('q', [0]) * (capacity * len(STAGES))
+        self._counter = itertools.count()  # next() 在CPython中是原子操作，多个接收线程无需加锁
+        self.enabled = False
+
+    def begin(self, receive_ns: int, frame_ns: int) -> int:
+        """
+        为一帧分配计时槽位
+
+        Args:
+            receive_ns: 收到数据的时间（time.monotonic_ns）
+            frame_ns: 切分出完整帧的时间
+
+        Returns:
+            槽位号，未开启计时时返回 NO_TRACE
+        """
+        if not self.enabled:
+            return NO_TRACE
+        slot = next(self._counter) % self.capacity
+        base = slot * len(STAGES)
+        times = self.times
+        times[base] = receive_ns
+        times[base + 1] = frame_ns
+        times[base + 2] = times[base + 3] = times[base + 4] = 0
+        return slot
+
+    def mark(self, slot: int, stage: int):
+        """记录阶段时间"""
+        if slot >= 0:
+            self.times[slot * len(STAGES) + stage] = time.monotonic_ns()
+
+    def reset(self):
+        """清除已记录的数据"""
+        for i in range(len(self.times)):
+            self.times[i] = 0
+        self._counter = itertools.count()
+
+    def get_latencies(self) -> Dict[str, List[int]]:
+        """
+        计算各阶段耗时（纳秒）
+
+        Returns:
+            {'receive->frame': [...], ..., 'total': [...]}，total为收到数据到最后记录阶段的耗时
+        """
+        n = len(STAGES)
+        result: Dict[str, List[int]] = {f"{STAGES[i - 1]}->{STAGES[i]}": [] for i in range(1, n)}
+        result['total'] = []
+        times = self.times
+        for slot in range(self.capacity):
+            base = slot * n
+            if not times[base]:
+                continue
+            prev = times[base]
+            last = prev
+            for i in range(1, n):
+                t = times[base + i]
+                if not t:
+                    continue
+                result[f"{STAGES[i - 1]}->{STAGES[i]}"].append(t - prev)
+                prev = last = t
+            result['total'].append(last - times[base])
+        return result
+
+    def histogram_report(self) -> str:
+        """生成各阶段耗时直方图文本"""
+        lines = ["阶段耗时统计:"]
+        for name, values in self.get_latencies().items():
+            if not values:
+                lines.append(f"  {name}: 无数据")
+                continue
+            values.sort()
+            count = len(values)
+            p50 = values[count // 2] / 1000
+            p95 = values[min(count - 1, int(count * 0.95))] / 1000
+            p99 = values[min(count - 1, int(count * 0.99))] / 1000
+            lines.append(f"  {name}: n={count}, p50={p50:.1f}µs, p95={p95:.1f}µs, "
+                         f"p99={p99:.1f}µs, max={values[-1] / 1000:.1f}µs")
+
+            buckets = [0] * HISTOGRAM_BUCKETS
+            for v in values:
+                buckets[min(HISTOGRAM_BUCKETS - 1, (v // 1000).bit_length())] += 1
+            peak = max(buckets)
+            for i, c in enumerate(buckets):
+                if c:
+                    upper = 1 << i
+                    bar = '#' * max(1, c * 40 // peak)
+                    lines.append(f"    <{upper:>8}µs {c:>8} {bar}")
+        return '\n'.join(lines)
+
+
+class Profiler:
+    """运行时性能诊断控制类"""
+
+    def __init__(self, trace_capacity: int = 65536, output_dir: str = '.',
+                 tracemalloc_frames: int = 1):
+        """
+        初始化诊断控制
+
+        Args:
+            trace_capacity: 阶段计时保留的最近帧数
+            output_dir: cProfile结果文件保存目录
+            tracemalloc_frames: tracemalloc保存的调用栈深度
+        """
+        self.tracer = StageTracer(trace_capacity)
+        self.output_dir = output_dir
+        self.tracemalloc_frames = tracemalloc_frames
+
+        # cProfile: 每个线程一个Profile对象（cProfile只记录开启它的线程）
+        self.lock = threading.Lock()
+        self.cprofile_enabled = False
+        self._profiles: Dict[int, cProfile.Profile] = {}
+        self._local = threading.local()
+
+    # 阶段计时
+    @property
+    def tracing(self) -> bool:
+        return self.tracer.enabled
+
+    def set_tracing(self, enabled: bool) -> str:
+        """开启或关闭阶段计时（开启时清除旧数据）"""
+        if enabled and not self.tracer.enabled:
+            self.tracer.reset()
+        self.tracer.enabled = enabled
+        return f"阶段计时已{'开启' if enabled else '关闭'}"
+
+    def dump_stages(self) -> str:
+        """输出阶段耗时直方图"""
+        return self.tracer.histogram_report()
+
+    # cProfile
+    def run(self, func: Callable, *args):
+        """
+        执行热路径函数（cProfile开启时在当前线程的Profile下执行）
+
+        Args:
+            func: 要执行的函数
+            *args: 参数
+        """
+        if not self.cprofile_enabled:
+            return func(*args)
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self.lock:
+                self._profiles[threading.get_ident()] = profile
+        return profile.runcall(func, *args)
+
+    def toggle_cprofile(self) -> str:
+        """开启或关闭cProfile，关闭时保存结果并返回耗时最多的函数"""
+        with self.lock:
+            if not self.cprofile_enabled:
+                self._profiles = {}
+                self._local = threading.local()
+                self.cprofile_enabled = True
+                return "cProfile已开启"
+            self.cprofile_enabled = False
+            profiles = list(self._profiles.values())
+            self._profiles = {}
+
+        if not profiles:
+            return "cProfile已关闭（无数据）"
+        # pstats只在保存结果时用到，不在启动时导入
+        import pstats
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        path = os.path.join(self.output_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof")
+        stats.dump_stats(path)
+
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(15)
+        return f"cProfile已关闭，结果已保存: {path}\n{out.getvalue()}"
+
+    # tracemalloc
+    def toggle_tracemalloc(self, top: int = 15) -> str:
+        """开启或关闭tracemalloc，关闭时返回内存分配最多的位置"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            return "tracemalloc已开启"
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        lines = [f"tracemalloc已关闭，当前 {current / 1024:.1f}KB，峰值 {peak / 1024:.1f}KB"]
+        for stat in snapshot.statistics('lineno')[:top]:
+            lines.append(f"  {stat}")
+        return '\n'.join(lines)
+
+    def status(self) -> str:
+        return (f"阶段计时: {'开' if self.tracing else '关'}, "
+                f"cProfile: {'开' if self.cprofile_enabled else '关'}, "
+                f"tracemalloc: {'开' if tracemalloc.is_tracing() else '关'}")
+
+
+def install_signal_handlers(profiler: Profiler, output: Callable[[str], None] = print) -> bool:
+    """
+    安装诊断信号（仅POSIX）:
+        SIGUSR1 输出阶段耗时直方图（未开启计时时开启）
+        SIGUSR2 开启/关闭 cProfile 和 tracemalloc
+
+    Returns:
+        bool: 是否安装成功
+    """
+    import signal
+    if not hasattr(signal, 'SIGUSR1'):
+        return False
+
+    def on_usr1(signum, frame):
+        if profiler.tracing:
+            output(profiler.dump_stages())
+        else:
+            output(profiler.set_tracing(True))
+
+    def on_usr2(signum, frame):
+        output(profiler.toggle_cprofile())
+        if profiler.cprofile_enabled != tracemalloc.is_tracing():
+            output(profiler.toggle_tracemalloc())
+
+    signal.signal(signal.SIGUSR1, on_usr1)
+    signal.signal(signal.SIGUSR2, on_usr2)
+    return True
@@ -0,0 +1,117 @@
+# protocol.py
+"""
+协议帧处理模块
+从TCP字节流中切分 A5 5A 协议帧（处理粘包、半包和噪声重同步）
+
+帧格式: A5 5A | 长度(2字节, 大端, 含帧头帧尾) | 命令字 | 数据... | 校验 | 0D 0A
+校验为长度字段到数据末尾所有字节的异或值
+"""
+
+from typing import List
+
+FRAME_HEADER = b'\xA5\x5A'
+FRAME_TAIL = b'\x0D\x0A'
+MIN_FRAME_LEN = 8  # 帧头2 + 长度2 + 命令1 + 校验1 + 帧尾2
+
+
+def xor_checksum(data: bytes) -> int:
+    """计算异或校验值"""
+    value = 0
+    for b in data:
+        value ^= b
+    return value
+
+
+def verify_checksum(frame: bytes) -> bool:
+    """校验完整帧的异或校验位"""
+    if len(frame) < MIN_FRAME_LEN:
+        return False
+    return xor_checksum(frame[2:-3]) == frame[-3]
+
+
+class FrameParser:
+    """A5 5A 协议帧解析器"""
+
+    def __init__(self, max_buffer_size: int = 65536, check_sum: bool = False):
+        """
+        初始化帧解析器
+
+        Args:
+            max_buffer_size: 缓冲区上限（字节），超出后丢弃缓存数据
+            check_sum: 是否校验异或校验位
+        """
+        self.buffer = bytearray()
+        self.max_buffer_size = max_buffer_size
+        self.check_sum = check_sum
+
+        # 统计信息
+        self.frame_count = 0
+        self.dropped_bytes = 0
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """
+        输入新收到的字节数据，返回其中所有完整的帧
+
+        Args:
+            data: 新收到的字节数据
+
+        Returns:
+            完整帧列表
+        """
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = 0
+        n = len(buf)
+
+        while True:
+            start = buf.find(FRAME_HEADER, pos)
+            if start < 0:
+                # 末尾的 A5 可能是下一帧帧头的前半部分，保留
+                keep = n - 1 if n > pos and buf[n - 1] == 0xA5 else n
+                self.dropped_bytes += keep - pos
+                pos = keep
+                break
+
+            self.dropped_bytes += start - pos
+            pos = start
+            if n - pos < 4:
+                break
+
+            length = (buf[pos + 2] << 8) | buf[pos + 3]
+            if length < MIN_FRAME_LEN:
+                # 长度非法，跳过该帧头重新同步
+                pos += 1
+                self.dropped_bytes += 1
+                continue
+
+            end = pos + length
+            if end > n:
+                break
+
+            if buf[end - 2] != 0x0D or buf[end - 1] != 0x0A:
+                pos += 1
+                self.dropped_bytes += 1
+                continue
+
+            frame = bytes(buf[pos:end])
+            if self.check_sum and not verify_checksum(frame):
+                pos += 1
+                self.dropped_bytes += 1
+                continue
+
+            frames.append(frame)
+            pos = end
+
+        del buf[:pos]
+
+        if len(buf) > self.max_buffer_size:
+            self.dropped_bytes += len(buf)
+            buf.clear()
+
+        self.frame_count += len(frames)
+        return frames
+
+    def reset(self):
+        """清空缓冲区"""
+        self.buffer.clear()
@@ -0,0 +1,391 @@
+# replay.py
+"""
+离线回放工具
+将抓取的读写器原始数据（二进制抓包文件，或程序打印输出的十六进制日志）
+通过与实时系统相同的帧切分、标签解析、天线仲裁、去重和托盘逻辑重新处理，
+结果写入CSV、SQLite或Parquet文件
+
+用法:
+    python replay.py capture1.bin capture2.log -o result.csv
+    python replay.py logs/*.log -o result.parquet   # 需要安装 pyarrow
+    python replay.py line1.log line2.log -o result.db --independent --jobs 8
+
+多个输入文件默认视为同一条产线按顺序抓取的数据，按给出的顺序通过同一个引擎处理，
+托盘编号、最近托盘EPC去重和天线仲裁状态在文件之间延续（只有帧切分缓冲按文件重置，
+跨文件边界的半帧丢弃）。--independent 时每个文件单独处理（可并行），适合不同产线的抓包。
+
+输入格式（自动识别）:
+    二进制文件: 读写器TCP原始字节流
+    文本文件:   包含 "接收到二进制数据: A5 5A ..." 或 "收到RFID数据: A5 5A ..." 的日志，
+               或每行只有十六进制字节的文本
+
+限制:
+    抓包文件和日志中没有读取时间，标签时间戳（timestamp、timestamp_ns）为回放时的时间，
+    天线仲裁也按回放时的时钟计算。回放速度远快于实时，stale_after 超时基本不会触发，
+    读数间隔较长的站点回放结果中归属天线切换会比实时少
+"""
+
+import argparse
+import csv
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+from config import load_config
+
+CHUNK_SIZE = 64 * 1024
+
+# 日志中接收数据的标记（SocketClient 和 RFIDReader_CNNT 会各打印一次同一段数据，只取其中一种）
+LOG_MARKERS = ('接收到二进制数据:', '收到RFID数据:')
+HEX_LINE_RE = re.compile(r'^[0-9A-Fa-f]{2}(\s*[0-9A-Fa-f]{2})*$')
+
+COLUMNS = ('source', 'reader', 'timestamp', 'epc', 'tid', 'user_data', 'rssi',
+           'antenna_num', 'zone_antenna', 'tray_id', 'is_new')
+
+
+# 输入读取
+def is_text_file(path: str) -> bool:
+    """根据文件开头判断是否为文本日志"""
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+    if not head:
+        return False
+    if head.startswith(b'\xA5\x5A'):
+        return False
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 截断在多字节字符中间时仍视为文本
+        if e.start < len(head) - 3:
+            return False
+    return True
+
+
+def detect_marker(path: str) -> Optional[str]:
+    """扫描日志，确定使用哪一种接收数据标记（流式读取）"""
+    found = set()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            for marker in LOG_MARKERS:
+                if marker in line:
+                    if marker == LOG_MARKERS[0]:
+                        return marker
+                    found.add(marker)
+    return LOG_MARKERS[1] if found else None
+
+
+def iter_binary_chunks(path: str) -> Iterator[bytes]:
+    """按块读取二进制抓包文件"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_log_chunks(path: str) -> Iterator[bytes]:
+    """逐行读取十六进制日志，返回其中的接收数据"""
+    marker = detect_marker(path)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if marker:
+                pos = line.find(marker)
+                if pos < 0:
+                    continue
+                hex_text = line[pos + len(marker):].strip()
+            else:
+                hex_text = line.strip()
+                if not HEX_LINE_RE.match(hex_text):
+                    continue
+            try:
+                yield bytes.fromhex(hex_text)
+            except ValueError:
+                continue
+
+
+def iter_input_chunks(path: str) -> Iterator[bytes]:
+    """按文件类型读取输入"""
+    if is_text_file(path):
+        return iter_log_chunks(path)
+    return iter_binary_chunks(path)
+
+
+# 输出
+class CsvSink:
+    """CSV输出"""
+
+    def __init__(self, path: str, header: bool = True):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        if header:
+            self.writer.writerow(COLUMNS)
+
+    def write(self, row: tuple):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteSink:
+    """SQLite输出"""
+
+    CREATE_SQL = f"CREATE TABLE IF NOT EXISTS replay_events ({', '.join(COLUMNS)})"
+    INSERT_SQL = f"INSERT INTO replay_events VALUES ({', '.join('?' * len(COLUMNS))})"
+
+    def __init__(self, path: str, batch_size: int = 5000):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(self.CREATE_SQL)
+        self.batch_size = batch_size
+        self.pending: List[tuple] = []
+
+    def write(self, row: tuple):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.conn.executemany(self.INSERT_SQL, self.pending)
+            self.conn.commit()
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+
+class ParquetSink:
+    """Parquet输出（需要 pyarrow）"""
+
+    def __init__(self, path: str, batch_size: int = 50000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("输出Parquet需要安装 pyarrow: pip install pyarrow")
+        self.pa = pa
+        self.schema = pa.schema([
+            ('source', pa.string()), ('reader', pa.string()), ('timestamp', pa.string()),
+            ('epc', pa.string()), ('tid', pa.string()), ('user_data', pa.string()),
+            ('rssi', pa.float32()), ('antenna_num', pa.uint8()), ('zone_antenna', pa.uint8()),
+            ('tray_id', pa.string()), ('is_new', pa.bool_()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch_size = batch_size
+        self.pending: List[tuple] = []
+
+    def write(self, row: tuple):
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            columns = list(zip(*self.pending))
+            self.writer.write_table(self.pa.table(
+                [self.pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+                schema=self.schema))
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def output_format(path: str) -> str:
+    """根据扩展名确定输出格式"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.db', '.sqlite', '.sqlite3'):
+        return 'sqlite'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def open_sink(path: str, fmt: str, header: bool = True):
+    if fmt == 'sqlite':
+        return SqliteSink(path)
+    if fmt == 'parquet':
+        return ParquetSink(path)
+    return CsvSink(path, header)
+
+
+# 处理
+def build_replay_config(config_path: Optional[str]) -> dict:
+    """回放使用站点配置中的解析和托盘参数，但不连接读写器、不写实时数据库、不发布事件"""
+    config = load_config(config_path)
+    config['readers'] = []
+    config['storage']['enabled'] = False
+    config['export']['enabled'] = False
+    config['feed']['enabled'] = False
+    config['dedup_index']['enabled'] = False
+    config['upload']['enabled'] = False
+    config['adaptive_inventory']['enabled'] = False
+    config['snapshot']['enabled'] = False
+    config['rules']['enabled'] = False
+    config['inventory']['auto_start'] = False
+    config['reconnect_interval'] = 0
+    return config
+
+
+def replay_files(paths: List[str], output: str, fmt: str, config_path: Optional[str] = None,
+                 header: bool = True) -> List[dict]:
+    """
+    按顺序回放输入文件（同一个引擎，产线状态在文件之间延续）
+
+    Args:
+        paths: 输入文件（按抓取顺序）
+        output: 输出文件
+        fmt: 输出格式
+        config_path: 站点配置文件
+        header: CSV是否写表头
+
+    Returns:
+        每个文件的统计信息
+    """
+    from engine import RFIDEngine
+
+    engine = RFIDEngine(build_replay_config(config_path))
+    sink = open_sink(output, fmt, header)
+    results = []
+    current = {}
+
+    def on_tag(name, tag, is_new):
+        counts = current['counts']
+        counts['tags'] += 1
+        counts['new'] += is_new
+        sink.write((current['source'], name, tag.timestamp, tag.epc, tag.tid, tag.user_data, tag.rssi,
+                    tag.antenna_num, tag.zone_antenna, tag.tray_id, is_new))
+
+    def on_tray(tray_id, epcs):
+        current['counts']['trays'] += 1
+
+    engine.set_callbacks(tag_callback=on_tag, tray_callback=on_tray)
+
+    try:
+        for path in paths:
+            source = os.path.basename(path)
+            reader_name = os.path.splitext(source)[0]
+            counts = {'file': path, 'bytes': 0, 'tags': 0, 'new': 0, 'trays': 0}
+            current['source'] = source
+            current['counts'] = counts
+            for chunk in iter_input_chunks(path):
+                counts['bytes'] += len(chunk)
+                engine.feed_bytes(reader_name, chunk)
+
+            # 帧切分缓冲按文件重置（文件末尾的半帧计入丢弃字节）
+            parser = engine.parsers.pop(reader_name, None)
+            counts['frames'] = parser.frame_count if parser else 0
+            counts['dropped_bytes'] = (parser.dropped_bytes + len(parser.buffer)) if parser else 0
+            results.append(counts)
+    finally:
+        sink.close()
+    return results
+
+
+def process_file(path: str, output: str, fmt: str, config_path: Optional[str] = None,
+                 header: bool = True) -> dict:
+    """单独回放一个输入文件（产线状态从初始状态开始）"""
+    return replay_files([path], output, fmt, config_path, header)[0]
+
+
+def merge_outputs(parts: List[str], output: str, fmt: str):
+    """按输入顺序合并各文件的输出（流式，不整体载入内存）"""
+    if fmt == 'csv':
+        with open(output, 'wb') as out:
+            for i, part in enumerate(parts):
+                with open(part, 'rb') as f:
+                    if i > 0:
+                        f.readline()  # 跳过表头
+                    shutil.copyfileobj(f, out)
+    elif fmt == 'sqlite':
+        sink = SqliteSink(output)
+        sink.close()
+        conn = sqlite3.connect(output)
+        for part in parts:
+            conn.execute('ATTACH DATABASE ? AS part', (part,))
+            conn.execute('INSERT INTO replay_events SELECT * FROM part.replay_events')
+            conn.commit()
+            conn.execute('DETACH DATABASE part')
+        conn.close()
+    else:
+        import pyarrow.parquet as pq
+        writer = None
+        for part in parts:
+            pf = pq.ParquetFile(part)
+            if writer is None:
+                writer = pq.ParquetWriter(output, pf.schema_arrow)
+            for batch in pf.iter_batches():
+                writer.write_batch(batch)
+        if writer:
+            writer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='RFID读写器抓包数据离线回放')
+    parser.add_argument('inputs', nargs='+', help='抓包文件（二进制或十六进制日志）')
+    parser.add_argument('-o', '--output', required=True, help='输出文件（.csv / .db / .parquet）')
+    parser.add_argument('-c', '--config', help='站点配置文件（托盘、仲裁参数）')
+    parser.add_argument('--independent', action='store_true',
+                        help='各文件单独处理（不同产线的抓包），产线状态不在文件之间延续')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='并行处理的进程数（只用于 --independent）')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fmt = output_format(args.output)
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("输出Parquet需要安装 pyarrow: pip install pyarrow")
+            return 1
+
+    start = time.perf_counter()
+    if os.path.exists(args.output):
+        os.remove(args.output)
+
+    if not args.independent:
+        results = replay_files(args.inputs, args.output, fmt, args.config)
+    elif len(args.inputs) == 1:
+        results = [process_file(args.inputs[0], args.output, fmt, args.config)]
+    else:
+        # 多个文件：各自写入临时输出（可并行），再按输入顺序合并
+        tmp_dir = tempfile.mkdtemp(prefix='rfid_replay_')
+        ext = os.path.splitext(args.output)[1] or '.csv'
+        parts = [os.path.join(tmp_dir, f"part{i:05d}{ext}") for i in range(len(args.inputs))]
+        jobs = min(args.jobs, len(args.inputs))
+        try:
+            if jobs <= 1:
+                results = [process_file(path, part, fmt, args.config)
+                           for path, part in zip(args.inputs, parts)]
+            else:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    futures = [pool.submit(process_file, path, part, fmt, args.config)
+                               for path, part in zip(args.inputs, parts)]
+                    results = [f.result() for f in futures]
+            merge_outputs(parts, args.output, fmt)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    total_tags = 0
+    for r in results:
+        total_tags += r['tags']
+        print(f"{r['file']}: {r['bytes']}字节, {r['frames']}帧, 标签 {r['tags']} (新增 {r['new']}), "
+              f"完成托盘 {r['trays']}, 丢弃 {r['dropped_bytes']}字节")
+    elapsed = time.perf_counter() - start
+    print(f"回放完成: {len(results)}个文件, 标签 {total_tags}, 耗时 {elapsed:.2f}秒 -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 # rfid_tag.py
+import time
 from datetime import datetime
 from typing import Optional, Dict, Any
+from epc_decoder import decode_epc, to_uri
 
 
 class RFIDTag:
@@ -13,8 +15,22 @@ class RFIDTag:
         self.user_data: str = ""  # USER数据（十六进制字符串）
         self.rssi: float = 0.0  # RSSI信号强度（dBm）
         self.antenna_num: int = 0  # 天线号
+        self.zone_antenna: int = 0  # 仲裁后的归属天线号（0表示未仲裁）
+        self.zone_changed: bool = False  # 本次读数是否改变了归属天线
+        self.tray_id: str = ""  # 计入的托盘编号（未计入托盘时为空）
+        self.duplicate: bool = False  # 是否为本次生产中已处理过的EPC（重复标签）
         self.pc: str = ""  # PC数据（十六进制字符串）
 
+        # 原始字节数据（用于二进制输出和快速比较）
+        self.epc_bytes: bytes = b""
+        self.tid_bytes: bytes = b""
+        self.user_bytes: bytes = b""
+
+        # GS1 EPC解码结果（epc_decoder.DecodedEPC，不是GS1编码时为None）
+        self.epc_info = None
+        self.gtin: str = ""  # 商品GTIN-14（SGTIN编码）
+        self.serial: int = 0  # EPC序列号
+
         # 产品信息
         self.product_name: str = ""  # 产品名称
         self.manufacturer: str = ""  # 生产企业
@@ -31,6 +47,8 @@ class RFIDTag:
 
         # 系统信息
         self.timestamp: str = ""  # 读取时间戳
+        self.timestamp_ns: int = 0  # 读取时间戳（纳秒，time.time_ns）
+        self.trace_slot: int = -1  # 阶段计时槽位（profiling.StageTracer，-1表示未计时）
         self.success: bool = False  # 解析是否成功
         self.error_message: str = ""  # 错误信息
 
@@ -57,14 +75,17 @@ class RFIDTag:
 
             # 解析EPC数据 (字节8-19，共12字节)
             epc_data = data[7:19]
+            self.epc_bytes = bytes(epc_data)
             self.epc = ' '.join([f'{b:02X}' for b in epc_data])
 
             # 解析TID数据 (字节20-31，共12字节)
             tid_data = data[19:31]
+            self.tid_bytes = bytes(tid_data)
             self.tid = ' '.join([f'{b:02X}' for b in tid_data])
 
             # 解析USER数据 (字节32-47，共16字节)
             user_data = data[31:47]
+            self.user_bytes = bytes(user_data)
             self.user_data = ' '.join([f'{b:02X}' for b in user_data])
 
             # 解析RSSI数据 (字节47-48，共2字节)
@@ -76,7 +97,8 @@ class RFIDTag:
             self.antenna_num = data[49]
 
             # 设置时间戳
-            self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.timestamp_ns = time.time_ns()
+            self.timestamp = datetime.fromtimestamp(self.timestamp_ns / 1e9).strftime("%Y-%m-%d %H:%M:%S")
 
             # 从USER数据中解析产品信息（根据实际协议实现）
             self._parse_product_info()
@@ -90,8 +112,69 @@ class RFIDTag:
             self.success = False
             return False
 
+    def from_record(self, epc: str, tid: str, user_data: str, rssi: float, antenna_num: int,
+                    timestamp: str, timestamp_ns: int = 0) -> bool:
+        """
+        从存储记录（十六进制文本字段，如数据库 tag_events 表）恢复标签信息，并重新解析产品信息
+
+        Args:
+            epc: EPC数据（十六进制字符串）
+            tid: TID数据（十六进制字符串）
+            user_data: USER数据（十六进制字符串）
+            rssi: RSSI信号强度（dBm）
+            antenna_num: 天线号
+            timestamp: 读取时间戳（"%Y-%m-%d %H:%M:%S"）
+            timestamp_ns: 读取时间戳（纳秒），为0时由 timestamp 计算
+
+        Returns:
+            bool: 恢复是否成功
+        """
+        try:
+            self.epc = epc or ""
+            self.tid = tid or ""
+            self.user_data = user_data or ""
+            self.epc_bytes = bytes.fromhex(self.epc)
+            self.tid_bytes = bytes.fromhex(self.tid)
+            self.user_bytes = bytes.fromhex(self.user_data)
+            self.rssi = float(rssi or 0.0)
+            self.antenna_num = int(antenna_num or 0)
+            self.timestamp = timestamp or ""
+            if not timestamp_ns and self.timestamp:
+                timestamp_ns = int(datetime.strptime(self.timestamp, "%Y-%m-%d %H:%M:%S").timestamp()) * 10**9
+            self.timestamp_ns = timestamp_ns
+
+            self._parse_product_info()
+
+            self.success = True
+            self.error_message = ""
+            return True
+
+        except (ValueError, TypeError) as e:
+            self.error_message = f'恢复标签记录失败: {str(e)}'
+            self.success = False
+            return False
+
     def _parse_product_info(self):
-        """从USER数据中解析产品信息（需要根据实际协议实现）"""
+        """从EPC（GS1编码）和USER数据中解析产品信息"""
+        info = decode_epc(self.epc_bytes)
+        self.epc_info = info
+        if info is not None:
+            self.serial = info.serial
+            product = info.product
+            if product is not None:
+                self.gtin = product.gtin
+                if product.name:
+                    # 商品目录中的产品（同一商品共用，不逐个标签生成）
+                    self.product_name = product.name
+                    self.manufacturer = product.manufacturer
+                    self.license_number = product.license_number
+                    self.package_spec = product.package_spec
+                    self.package_method = product.package_method
+                    self.batch_number = f"BATCH-{self.tid[:6]}"
+                    self.production_date = ""
+                    self.quantity = 1
+                    return
+
         try:
             # 示例解析逻辑，根据你的实际协议修改
             if self.user_data:
@@ -147,6 +230,9 @@ class RFIDTag:
             'rssi': self.rssi,
             'antenna_num': self.antenna_num,
             'pc': self.pc,
+            'epc_uri': to_uri(self.epc_info) if self.epc_info else '',
+            'gtin': self.gtin,
+            'serial': self.serial,
 
             # 产品信息
             'product_name': self.product_name,
@@ -178,6 +264,8 @@ class RFIDTag:
             self.rssi = data.get('rssi', 0.0)
             self.antenna_num = data.get('antenna_num', 0)
             self.pc = data.get('pc', '')
+            self.gtin = data.get('gtin', '')
+            self.serial = data.get('serial', 0)
 
             # 产品信息
             self.product_name = data.get('product_name', '')
@@ -213,6 +301,7 @@ class RFIDTag:
         return (f"EPC: {self.epc}\n"
                 f"TID: {self.tid}\n"
                 f"产品: {self.product_name}\n"
+                f"GTIN: {self.gtin or '无'}\n"
                 f"生产企业: {self.manufacturer}\n"
                 f"批号: {self.batch_number}\n"
                 f"信号强度: {self.rssi:.1f} dBm\n"
@@ -0,0 +1,350 @@
+# rule_engine.py
+"""
+标签规则引擎模块
+在接收线程中对每个解析后的标签执行声明式规则，命中时立即触发动作（剔除门、报警等）
+
+规则条件（同一规则内的条件全部满足才命中，未配置的条件不检查）:
+    antennas:         天线号（归属天线）列表
+    readers:          读写器名称列表
+    new_only:         只检查托盘新增的标签
+    rssi_min/rssi_max: RSSI范围（dBm）
+    epc_prefixes:     EPC前缀（"前缀/掩码"，满足任一）
+    exclude_prefixes: EPC前缀（满足任一则不命中），用于“非本产品”
+    batch_mismatch:   批号与当前托盘批号不一致（expected_batch 为空时以托盘第一个新增标签的批号为准）
+    duplicate:        本次生产已处理过的EPC（需要启用 dedup_index）
+
+规则动作:
+    command: 向读写器发送指令帧（剔除门、蜂鸣等），{"type": "command", "cmd": "8C", "payload": "", "reader": ""}
+    output:  向输出地址发送一条UDP消息（PLC、剔除控制器），{"type": "output", "message": "REJECT {epc}"}
+    alarm:   界面/服务报警，{"type": "alarm", "message": "批号错误: {batch}"}
+    消息模板可用字段: rule reader epc antenna rssi tray_id batch expected_batch
+
+规则在加载时编译为单个Python表达式（按开销从低到高排列条件），指令帧和前缀掩码预先计算，
+执行时只做属性比较；动作不经过队列（UDP非阻塞发送、读写器指令进入发送队列），
+命中后记录从收到数据到动作完成的耗时
+"""
+
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from command import build_command
+from prefilter import parse_prefix
+from rfid_tag import RFIDTag
+
+ACTION_COMMAND = 'command'
+ACTION_OUTPUT = 'output'
+ACTION_ALARM = 'alarm'
+ACTIONS = (ACTION_COMMAND, ACTION_OUTPUT, ACTION_ALARM)
+
+RULE_KEYS = ('name', 'antennas', 'readers', 'new_only', 'rssi_min', 'rssi_max', 'epc_prefixes',
+             'exclude_prefixes', 'batch_mismatch', 'duplicate', 'cooldown', 'actions')
+
+LATENCY_RING = 1024  # 耗时统计保留的最近命中数
+MAX_COOLDOWN_TAGS = 10000  # 每条规则冷却表的最大EPC数
+
+
+def _prefix_expr(prefixes: List[str]) -> str:
+    """EPC前缀列表 -> 表达式（满足任一）"""
+    checks = []
+    for text in prefixes:
+        length, prefix, mask = parse_prefix(text)
+        checks.append(f"(from_bytes(t.epc_bytes[:{length}], 'big') & {mask}) == {prefix}")
+    return '(' + ' or '.join(checks) + ')'
+
+
+def compile_predicate(rule: Dict[str, Any]) -> Tuple[Callable, str]:
+    """
+    将规则条件编译为判断函数
+
+    Args:
+        rule: 规则配置
+
+    Returns:
+        (判断函数(reader, t, new, ref), 表达式文本)，ref 为当前托盘批号
+    """
+    env = {'from_bytes': int.from_bytes}
+    parts = []
+    if rule.get('antennas'):
+        env['antennas'] = frozenset(int(a) for a in rule['antennas'])
+        parts.append("(t.zone_antenna or t.antenna_num) in antennas")
+    if rule.get('readers'):
+        env['readers'] = frozenset(rule['readers'])
+        parts.append("reader in readers")
+    if rule.get('new_only'):
+        parts.append("new")
+    if rule.get('rssi_min') is not None:
+        parts.append(f"t.rssi >= {float(rule['rssi_min'])!r}")
+    if rule.get('rssi_max') is not None:
+        parts.append(f"t.rssi <= {float(rule['rssi_max'])!r}")
+    if rule.get('duplicate'):
+        parts.append("t.duplicate")
+    if rule.get('batch_mismatch'):
+        parts.append("ref and t.batch_number != ref")
+    if rule.get('epc_prefixes'):
+        parts.append(_prefix_expr(rule['epc_prefixes']))
+    if rule.get('exclude_prefixes'):
+        parts.append('not ' + _prefix_expr(rule['exclude_prefixes']))
+
+    source = ' and '.join(parts) or 'True'
+    name = rule.get('name', '')
+    predicate = eval(compile(f"lambda reader, t, new, ref: {source}", f"<rule {name}>", 'eval'), env)
+    return predicate, source
+
+
+def compile_actions(actions: List[Dict[str, Any]]) -> List[Tuple[str, Any, Any]]:
+    """
+    预处理规则动作
+
+    Returns:
+        [(动作类型, 目标, 数据)]: command -> (读写器名称或None, 指令帧)，output/alarm -> (None, 消息模板)
+    """
+    compiled = []
+    for i, action in enumerate(actions):
+        kind = action.get('type')
+        if kind not in ACTIONS:
+            raise ValueError(f"actions[{i}].type 必须是 {', '.join(ACTIONS)} 之一")
+        if kind == ACTION_COMMAND:
+            cmd = action.get('cmd')
+            cmd = int(cmd, 16) if isinstance(cmd, str) else cmd
+            if not isinstance(cmd, int) or not 0 <= cmd <= 0xFF:
+                raise ValueError(f"actions[{i}].cmd 必须是命令字（0-FF）")
+            frame = build_command(cmd, bytes.fromhex(action.get('payload', '')))
+            compiled.append((kind, action.get('reader') or None, frame))
+        else:
+            compiled.append((kind, None, action.get('message', '{rule} {epc}')))
+    return compiled
+
+
+class Rule:
+    """编译后的规则"""
+
+    __slots__ = ('name', 'predicate', 'source', 'actions', 'cooldown', 'last_fired', 'matched', 'fired')
+
+    def __init__(self, config: Dict[str, Any], default_cooldown: float = 2.0):
+        unknown = set(config) - set(RULE_KEYS)
+        if unknown:
+            raise ValueError(f"未知规则项: {', '.join(sorted(unknown))}")
+        self.name = config.get('name', '')
+        self.predicate, self.source = compile_predicate(config)
+        self.actions = compile_actions(config.get('actions', []))
+        self.cooldown = float(config.get('cooldown', default_cooldown))
+        # EPC -> 最近触发时间（按触发时间排序，同一标签冷却期内不重复触发）
+        self.last_fired: "OrderedDict[bytes, float]" = OrderedDict()
+        self.matched = 0
+        self.fired = 0
+
+
+def compile_rules(rules: List[Dict[str, Any]], default_cooldown: float = 2.0) -> List[Rule]:
+    """
+    编译规则列表
+
+    Raises:
+        ValueError: 规则格式错误（信息中包含规则序号）
+    """
+    compiled = []
+    for i, config in enumerate(rules):
+        if not isinstance(config, dict):
+            raise ValueError(f"rules[{i}] 必须是对象")
+        config = dict(config)
+        config.setdefault('name', f"rule{i + 1}")
+        try:
+            compiled.append(Rule(config, default_cooldown))
+        except (ValueError, TypeError, SyntaxError) as e:
+            raise ValueError(f"rules[{i}] ({config['name']}): {e}")
+    return compiled
+
+
+class RuleEngine:
+    """标签规则引擎类"""
+
+    def __init__(self, rules: List[Dict[str, Any]], output_host: str = '127.0.0.1', output_port: int = 0,
+                 expected_batch: str = '', cooldown: float = 2.0, latency_budget_ms: float = 5.0):
+        """
+        初始化规则引擎
+
+        Args:
+            rules: 规则配置列表
+            output_host: output 动作的UDP目标地址
+            output_port: output 动作的UDP目标端口，0表示不发送
+            expected_batch: 期望批号，为空时以每个托盘第一个新增标签的批号为准
+            cooldown: 同一规则对同一EPC的默认冷却时间（秒）
+            latency_budget_ms: 动作耗时预算（毫秒），超出时计数
+        """
+        self.rules = compile_rules(rules, cooldown)
+        self.expected_batch = expected_batch
+        self.latency_budget_ns = int(latency_budget_ms * 1e6)
+        self.output_address = (output_host, output_port)
+        self.output_socket = None
+        if output_port:
+            self.output_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.output_socket.setblocking(False)
+
+        self.lock = threading.Lock()
+        self._tray_id = None
+        self._tray_batch = ''
+
+        # 统计信息
+        self.evaluated = 0
+        self.fired = 0
+        self.output_errors = 0
+        self.over_budget = 0
+        self.max_latency_ns = 0
+        self._latencies = [0] * LATENCY_RING
+        self._latency_pos = 0
+        self._latency_count = 0
+
+        # 回调函数
+        self.command_callback = None
+        self.alarm_callback = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'RuleEngine':
+        """由配置中的 rules 部分创建"""
+        return cls(config['rules'], output_host=config['output_host'], output_port=config['output_port'],
+                   expected_batch=config['expected_batch'], cooldown=config['cooldown'],
+                   latency_budget_ms=config['latency_budget_ms'])
+
+    def set_callbacks(self,
+                      command_callback: Optional[Callable[[str, bytes], bool]] = None,
+                      alarm_callback: Optional[Callable[[str, str, RFIDTag, str], None]] = None):
+        """
+        设置回调函数（在接收线程中调用，需立即返回）
+
+        Args:
+            command_callback: 发送指令帧(读写器名称, 指令帧)，返回是否发送成功
+            alarm_callback: 报警回调(规则名称, 读写器名称, 标签, 报警信息)
+        """
+        self.command_callback = command_callback
+        self.alarm_callback = alarm_callback
+
+    def close(self):
+        if self.output_socket:
+            self.output_socket.close()
+            self.output_socket = None
+
+    def evaluate(self, reader: str, tag: RFIDTag, is_new: bool, tray_id: str, receive_ns: int = 0) -> int:
+        """
+        对一个标签执行所有规则（接收线程）
+
+        Args:
+            reader: 读写器名称
+            tag: 标签
+            is_new: 是否为托盘新增
+            tray_id: 标签读到时的当前托盘编号
+            receive_ns: 收到数据的时间（time.monotonic_ns），用于统计动作耗时
+
+        Returns:
+            触发的规则数
+        """
+        ref = self.expected_batch
+        if not ref:
+            with self.lock:
+                if is_new and tray_id != self._tray_id:
+                    # 托盘的第一个新增标签确定该托盘的批号
+                    self._tray_id = tray_id
+                    self._tray_batch = tag.batch_number
+                    ref = ''  # 第一个标签自身不检查
+                else:
+                    ref = self._tray_batch if tray_id == self._tray_id else ''
+        self.evaluated += 1
+
+        fired = 0
+        for rule in self.rules:
+            if rule.predicate(reader, tag, is_new, ref):
+                rule.matched += 1
+                if self._should_fire(rule, tag.epc_bytes):
+                    self._fire(rule, reader, tag, tray_id, ref)
+                    fired += 1
+
+        if fired:
+            self.fired += fired
+            if receive_ns:
+                self._record_latency(time.monotonic_ns() - receive_ns)
+        return fired
+
+    def _should_fire(self, rule: Rule, epc: bytes) -> bool:
+        """检查同一标签的冷却时间"""
+        if rule.cooldown <= 0:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            last_fired = rule.last_fired
+            last = last_fired.get(epc)
+            if last is not None and now - last < rule.cooldown:
+                return False
+            last_fired[epc] = now
+            last_fired.move_to_end(epc)
+            # 从最早的一项开始清除已过冷却期的EPC
+            while last_fired:
+                oldest = next(iter(last_fired.values()))
+                if now - oldest < rule.cooldown and len(last_fired) <= MAX_COOLDOWN_TAGS:
+                    break
+                last_fired.popitem(last=False)
+            rule.fired += 1
+        return True
+
+    def _fire(self, rule: Rule, reader: str, tag: RFIDTag, tray_id: str, ref: str):
+        """执行规则动作"""
+        fields = None
+        for kind, target, data in rule.actions:
+            try:
+                if kind == ACTION_COMMAND:
+                    if self.command_callback:
+                        self.command_callback(target or reader, data)
+                    continue
+                if fields is None:
+                    fields = {'rule': rule.name, 'reader': reader, 'epc': tag.epc,
+                              'antenna': tag.zone_antenna or tag.antenna_num, 'rssi': tag.rssi,
+                              'tray_id': tray_id, 'batch': tag.batch_number, 'expected_batch': ref}
+                text = data.format_map(fields)
+                if kind == ACTION_OUTPUT:
+                    self._send_output(text)
+                elif self.alarm_callback:
+                    self.alarm_callback(rule.name, reader, tag, text)
+            except Exception as e:
+                print(f"规则 {rule.name} 动作 {kind} 执行失败: {e}")
+
+    def _send_output(self, text: str):
+        """发送UDP消息（非阻塞，发送缓冲区满时丢弃并计数）"""
+        if self.output_socket is None:
+            return
+        try:
+            self.output_socket.sendto((text + '\n').encode('utf-8'), self.output_address)
+        except OSError:
+            self.output_errors += 1
+
+    def _record_latency(self, latency_ns: int):
+        with self.lock:
+            self._latencies[self._latency_pos] = latency_ns
+            self._latency_pos = (self._latency_pos + 1) % LATENCY_RING
+            self._latency_count += 1
+            if latency_ns > self.max_latency_ns:
+                self.max_latency_ns = latency_ns
+            if latency_ns > self.latency_budget_ns:
+                self.over_budget += 1
+
+    def get_stats(self) -> dict:
+        """获取统计信息（耗时为最近命中的百分位，毫秒）"""
+        with self.lock:
+            count = min(self._latency_count, LATENCY_RING)
+            latencies = sorted(self._latencies[:count])
+            stats = {'evaluated': self.evaluated, 'fired': self.fired, 'over_budget': self.over_budget,
+                     'output_errors': self.output_errors, 'max_ms': round(self.max_latency_ns / 1e6, 3)}
+            rules = {rule.name: {'matched': rule.matched, 'fired': rule.fired} for rule in self.rules}
+        if latencies:
+            stats['p50_ms'] = round(latencies[len(latencies) // 2] / 1e6, 3)
+            stats['p99_ms'] = round(latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] / 1e6, 3)
+        stats['rules'] = rules
+        return stats
+
+    def report(self) -> str:
+        """生成统计文本"""
+        stats = self.get_stats()
+        lines = [f"规则引擎: 检查 {stats['evaluated']}, 触发 {stats['fired']}, "
+                 f"耗时 p50 {stats.get('p50_ms', 0)}ms / p99 {stats.get('p99_ms', 0)}ms / "
+                 f"最大 {stats['max_ms']}ms, 超出预算 {stats['over_budget']}, 输出失败 {stats['output_errors']}"]
+        for rule in self.rules:
+            lines.append(f"  {rule.name}: 命中 {rule.matched}, 触发 {rule.fired}  [{rule.source}]")
+        return '\n'.join(lines)
@@ -0,0 +1,171 @@
+# service.py
+"""
+RFID生产系统无界面服务
+在没有显示器的产线控制机上运行引擎，不导入tkinter
+
+用法:
+    python service.py --config station.json
+    python service.py --host 192.168.1.200 --port 2000 --loop
+"""
+
+import time
+_STARTUP_T0 = time.perf_counter()  # 启动计时起点（在其他模块导入之前）
+
+import argparse
+import signal
+import threading
+from typing import Optional
+from engine import RFIDEngine
+from config import load_config, ConfigWatcher
+from startup_timer import StartupTimer
+from production_stats import format_duration
+from profiling import install_signal_handlers
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='RFID贴标生产系统 - 无界面服务模式')
+    parser.add_argument('-c', '--config', help='站点配置文件（JSON/TOML，修改后自动重新加载）')
+    parser.add_argument('--host', help='读写器地址（覆盖配置中的第一个读写器）')
+    parser.add_argument('--port', type=int, help='读写器端口（覆盖配置中的第一个读写器）')
+    parser.add_argument('--db', help='标签数据库路径')
+    parser.add_argument('--no-store', action='store_true', help='不保存标签数据')
+    parser.add_argument('--feed-port', type=int, help='启用本机标签事件发布服务并指定端口')
+    parser.add_argument('--loop', action='store_true', help='连接后自动开始盘存')
+    parser.add_argument('--discover', action='store_true', help='搜索配置网段内的读写器后退出')
+    parser.add_argument('-q', '--quiet', action='store_true', help='不打印每个标签')
+    parser.add_argument('--stats-interval', type=float, default=60.0,
+                        help='打印生产统计的间隔（秒），0表示不打印')
+    return parser.parse_args(argv)
+
+
+def build_config(args, config: Optional[dict] = None) -> dict:
+    """根据命令行参数生成配置（config为空时加载配置文件，命令行参数优先）"""
+    if config is None:
+        config = load_config(args.config)
+
+    if args.host:
+        config['readers'][0]['host'] = args.host
+    if args.port:
+        config['readers'][0]['port'] = args.port
+    if args.db:
+        config['storage']['path'] = args.db
+    if args.no_store:
+        config['storage']['enabled'] = False
+    if args.feed_port:
+        config['feed']['enabled'] = True
+        config['feed']['port'] = args.feed_port
+    if args.loop:
+        config['inventory']['auto_start'] = True
+
+    return config
+
+
+def format_stats(stats: dict) -> str:
+    """生产统计的单行文本"""
+    antennas = ', '.join(f"天线{ant}: {rate:.0f}" for ant, rate in stats['antenna_per_min'].items())
+    return (f"生产统计 - 读取 {stats['tags_per_min']:.0f}次/分 ({antennas or '无'}), "
+            f"新增 {stats['new_per_min']:.0f}个/分, 托盘 {stats['trays_per_hour']:.0f}个/时, "
+            f"今日 {stats['daily_production']}, 运行 {format_duration(stats['runtime'])}, "
+            f"停机 {format_duration(stats['downtime'])}")
+
+
+def main(argv=None):
+    startup_timer = StartupTimer(_STARTUP_T0)
+    startup_timer.mark('imports')
+
+    args = parse_args(argv)
+    config = build_config(args)
+    if args.discover:
+        from discovery import discover_from_config, format_results
+        start = time.perf_counter()
+        readers = discover_from_config(config['discovery'])
+        print(*format_results(readers), sep='\n')
+        print(f"搜索完成: {', '.join(config['discovery']['networks'])}, "
+              f"找到 {len(readers)} 个读写器, 耗时 {time.perf_counter() - start:.2f}秒")
+        return 0
+    engine = RFIDEngine(config)
+    startup_timer.mark('engine')
+
+    def on_tag(reader_name, tag, is_new):
+        if startup_timer.mark('first_tag'):
+            print(startup_timer.report())
+        if tag.duplicate:
+            print(f"[{reader_name}] 重复标签（本次生产已处理过）: {tag.epc}")
+        if not args.quiet:
+            flag = '新增' if is_new else '重复'
+            print(f"[{reader_name}] {flag} EPC: {tag.epc} RSSI: {tag.rssi:.1f}dBm 天线: {tag.antenna_num}")
+
+    def on_tray(tray_id, epcs):
+        print(f"托盘完成: {tray_id} 数量: {len(epcs)}")
+
+    def on_connection(reader_name, connected, message):
+        if connected and startup_timer.mark('first_connected'):
+            print(startup_timer.report())
+        print(f"[{reader_name}] {'已连接' if connected else '未连接'}: {message}")
+
+    def on_error(reader_name, error_msg):
+        print(f"[{reader_name}] 错误: {error_msg}")
+
+    engine.set_callbacks(
+        tag_callback=on_tag,
+        tray_callback=on_tray,
+        connection_callback=on_connection,
+        error_callback=on_error
+    )
+
+    stop_event = threading.Event()
+
+    def on_signal(signum, frame):
+        print(f"收到信号 {signum}，正在停止服务...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    if install_signal_handlers(engine.profiler):
+        print("诊断: kill -USR1 输出阶段耗时（首次为开启计时）, kill -USR2 开关 cProfile/tracemalloc")
+
+    # 监视配置文件，修改后在运行中应用（命令行参数仍然优先）
+    watcher = None
+    if args.config:
+        def on_reload(new_config):
+            for message in engine.apply_config(build_config(args, new_config)):
+                print(message)
+
+        watcher = ConfigWatcher(args.config, config['reload_interval'])
+        watcher.set_callbacks(reload_callback=on_reload)
+        watcher.start()
+
+    engine.start()
+    print(f"服务已启动 - 站点: {config['station_id']}, 读写器数量: {len(engine.readers)}")
+
+    last_stats = time.monotonic()
+    while not stop_event.wait(1.0):
+        if args.stats_interval > 0 and time.monotonic() - last_stats >= args.stats_interval:
+            last_stats = time.monotonic()
+            print(format_stats(engine.stats.get_snapshot()))
+            if engine.prefilter is not None:
+                print(f"预过滤 - {engine.prefilter.get_stats()}")
+            if engine.exporter is not None:
+                print(f"导出 - {engine.exporter.get_stats()}")
+            if engine.uploader is not None:
+                print(f"上传 - {engine.uploader.get_stats()}")
+            if engine.snapshotter is not None:
+                print(f"快照 - {engine.snapshotter.get_stats()}")
+            if engine.inventory_controller is not None:
+                print(f"自适应盘存 - {engine.inventory_controller.get_stats()}")
+            if engine.rules is not None:
+                print(engine.rules.report())
+            print(engine.flow.report())
+            print(f"错误汇总 - {engine.errors.get_stats()}")
+            if engine.watchdog is not None:
+                print(engine.watchdog.report())
+
+    if watcher:
+        watcher.stop()
+    engine.stop()
+    print(f"服务已停止，共处理标签 {engine.tag_count} 个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+# snapshot.py
+"""
+产线状态快照模块
+定期把引擎的内存状态写入二进制快照文件，进程重启后从快照恢复，继续当前托盘而不需要人工重新清点:
+    当前托盘（托盘编号、已装载EPC）、最近完成托盘的EPC窗口（去重用）、
+    累计计数（标签数、读取数、托盘数、今日生产总量、运行/停机时间）、最近一个标签、上传队列位置
+
+文件格式（大端）:
+    文件头: 魔数'RSNP' | 版本(1) | 段数(1) | 写入时间ns(8)
+    段:     类型(1) | 长度(4) | 内容
+    文件尾: CRC32(4)（文件头和所有段）
+
+写入先写临时文件再 os.replace，任何时刻快照文件都是完整的旧版本或新版本。
+快照线程只在持有引擎锁时复制状态（列表复制），编码和写文件在锁外进行；
+状态未变化时不写文件，最近EPC窗口只在有托盘完成时重新编码（增量快照）
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+from command import build_command, CMD_ACK_TYPE_RFID_LOOP_START
+from rfid_tag import RFIDTag
+from watchdog import NULL_HEARTBEAT
+
+MAGIC = b'RSNP'
+VERSION = 1
+FILE_HEADER = struct.Struct('>4sBBQ')
+SECTION_HEADER = struct.Struct('>BI')
+CRC = struct.Struct('>I')
+
+SECTION_TRAY = 1
+SECTION_RECENT = 2
+SECTION_COUNTERS = 3
+SECTION_CURRENT_TAG = 4
+SECTION_UPLOAD = 5
+
+# 计数: 标签数, 已完成托盘数, 累计计入数, 读取数, 托盘数, 今日生产总量, 日期序号, 运行时间, 停机时间
+COUNTERS = struct.Struct('>QIQQQQIdd')
+UPLOAD = struct.Struct('>QQ')  # 上传队列: 下一序号, 已确认序号
+TAG_PAYLOAD_LEN = 45  # 标签帧中 PC(2) + EPC(12) + TID(12) + USER(16) + RSSI(2) + 天线号(1)
+
+
+def _pack_str(text: str) -> bytes:
+    data = text.encode('utf-8')
+    return struct.pack('>H', len(data)) + data
+
+
+def _pack_epcs(epcs: List[str]) -> bytes:
+    """EPC列表: 数量(4) + 每项 长度(1) + 原始字节"""
+    parts = [struct.pack('>I', len(epcs))]
+    for epc in epcs:
+        raw = bytes.fromhex(epc)
+        parts.append(bytes([len(raw)]))
+        parts.append(raw)
+    return b''.join(parts)
+
+
+def _unpack_epcs(data: bytes, pos: int) -> Tuple[List[str], int]:
+    count = struct.unpack_from('>I', data, pos)[0]
+    pos += 4
+    epcs = []
+    for _ in range(count):
+        length = data[pos]
+        epcs.append(' '.join(f'{b:02X}' for b in data[pos + 1:pos + 1 + length]))
+        pos += 1 + length
+    return epcs, pos
+
+
+def _pack_tag(tag: RFIDTag) -> bytes:
+    """最近一个标签: 时间戳ns(8) + 标签帧数据（恢复时按原始帧重新解析）"""
+    pc = bytes.fromhex(tag.pc) if tag.pc else b'\x00\x00'
+    rssi = int(round(tag.rssi * 10)).to_bytes(2, 'big', signed=True)
+    payload = (pc + tag.epc_bytes.ljust(12, b'\x00') + tag.tid_bytes.ljust(12, b'\x00')
+               + tag.user_bytes.ljust(16, b'\x00') + rssi + bytes([tag.antenna_num]))
+    return struct.pack('>Q', tag.timestamp_ns) + payload
+
+
+def _unpack_tag(data: bytes) -> Optional[RFIDTag]:
+    timestamp_ns = struct.unpack_from('>Q', data)[0]
+    tag = RFIDTag()
+    if not tag.from_bytes(build_command(CMD_ACK_TYPE_RFID_LOOP_START, data[8:8 + TAG_PAYLOAD_LEN])):
+        return None
+    tag.timestamp_ns = timestamp_ns
+    return tag
+
+
+class LineState:
+    """快照内容"""
+
+    def __init__(self):
+        self.created_ns = 0
+        self.tray_id = ''
+        self.tray_epcs: List[str] = []
+        self.recent: List[str] = []
+        self.tag_count = 0
+        self.completed_trays = 0
+        self.total_count = 0
+        self.counters: Dict[str, object] = {}
+        self.current_tag: Optional[RFIDTag] = None
+        self.upload_next_seq = 0
+        self.upload_acked_seq = 0
+
+    @property
+    def age(self) -> float:
+        """快照距今的时间（秒）"""
+        return (time.time_ns() - self.created_ns) / 1e9
+
+
+def encode_snapshot(sections: Dict[int, bytes], created_ns: int = 0) -> bytes:
+    """按段生成快照文件内容"""
+    parts = [FILE_HEADER.pack(MAGIC, VERSION, len(sections), created_ns or time.time_ns())]
+    for section_type, payload in sections.items():
+        parts.append(SECTION_HEADER.pack(section_type, len(payload)))
+        parts.append(payload)
+    body = b''.join(parts)
+    return body + CRC.pack(zlib.crc32(body))
+
+
+def decode_snapshot(data: bytes) -> LineState:
+    """
+    解析快照文件内容
+
+    Raises:
+        ValueError: 格式错误或校验失败
+    """
+    if len(data) < FILE_HEADER.size + CRC.size:
+        raise ValueError("快照文件不完整")
+    body, crc = data[:-CRC.size], CRC.unpack_from(data, len(data) - CRC.size)[0]
+    if zlib.crc32(body) != crc:
+        raise ValueError("快照文件校验失败")
+    magic, version, section_count, created_ns = FILE_HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("不是快照文件")
+    if version != VERSION:
+        raise ValueError(f"不支持的快照版本: {version}")
+
+    state = LineState()
+    state.created_ns = created_ns
+    pos = FILE_HEADER.size
+    for _ in range(section_count):
+        section_type, length = SECTION_HEADER.unpack_from(body, pos)
+        pos += SECTION_HEADER.size
+        payload = body[pos:pos + length]
+        pos += length
+        if section_type == SECTION_TRAY:
+            name_len = struct.unpack_from('>H', payload)[0]
+            state.tray_id = payload[2:2 + name_len].decode('utf-8')
+            state.tray_epcs, _ = _unpack_epcs(payload, 2 + name_len)
+        elif section_type == SECTION_RECENT:
+            state.recent, _ = _unpack_epcs(payload, 0)
+        elif section_type == SECTION_COUNTERS:
+            (state.tag_count, state.completed_trays, state.total_count, total_reads, total_trays,
+             daily, day, runtime, downtime) = COUNTERS.unpack_from(payload)
+            state.counters = {'total_reads': total_reads, 'total_trays': total_trays,
+                              'daily_production': daily, 'day': day,
+                              'runtime': runtime, 'downtime': downtime}
+        elif section_type == SECTION_CURRENT_TAG:
+            state.current_tag = _unpack_tag(payload)
+        elif section_type == SECTION_UPLOAD:
+            state.upload_next_seq, state.upload_acked_seq = UPLOAD.unpack_from(payload)
+        # 未知段（新版本写入）跳过
+    return state
+
+
+def load_snapshot(path: str) -> Optional[LineState]:
+    """读取快照文件，文件不存在时返回None"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    return decode_snapshot(data)
+
+
+def write_atomic(path: str, data: bytes, fsync: bool = True):
+    """写入临时文件后替换目标文件"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Snapshotter:
+    """引擎状态定期快照类"""
+
+    def __init__(self, engine, path: str = 'line_state.snap', interval: float = 2.0, fsync: bool = True):
+        """
+        初始化快照
+
+        Args:
+            engine: RFIDEngine
+            path: 快照文件路径
+            interval: 快照间隔（秒）
+            fsync: 写入后是否同步到磁盘
+        """
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.fsync = fsync
+
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.heartbeat = NULL_HEARTBEAT  # 启用线程监视时由引擎设置
+        self._last_key = None
+        self._recent_key = None
+        self._recent_payload = b''
+
+        # 统计信息
+        self.writes = 0
+        self.skipped = 0
+        self.last_size = 0
+        self.last_write_ms = 0.0
+
+    def start(self):
+        if self.thread is not None or self.interval <= 0:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止快照线程并写入最后一次快照"""
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 2.0)
+        self.thread = None
+        try:
+            self.save()
+        except Exception as e:
+            print(f"写入快照失败: {e}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.heartbeat.beat()
+            try:
+                self.save()
+            except Exception as e:
+                print(f"写入快照失败: {e}")
+
+    def save(self, force: bool = False) -> bool:
+        """
+        写入快照（状态未变化时跳过）
+
+        Returns:
+            bool: 是否写入了文件
+        """
+        engine = self.engine
+        tray = engine.tray
+        with engine.lock:
+            # 没有新标签时每分钟仍写入一次（更新运行/停机时间）
+            key = (engine.tag_count, tray.total_count, tray.completed_trays, tray.tray_id,
+                   int(time.monotonic() // 60))
+            if key == self._last_key and not force:
+                self.skipped += 1
+                return False
+            recent_key = (tray.completed_trays, tray.recent_window)
+            tray_id, tray_epcs, recent = tray.get_state(recent_key != self._recent_key)
+            tag_count = engine.tag_count
+            completed_trays = tray.completed_trays
+            total_count = tray.total_count
+            current_tag = engine.current_tag
+
+        start = time.perf_counter()
+        counters = engine.stats.get_counters()
+        sections = {
+            SECTION_TRAY: _pack_str(tray_id) + _pack_epcs(tray_epcs),
+        }
+        if recent is not None:
+            self._recent_payload = _pack_epcs(recent)
+            self._recent_key = recent_key
+        sections[SECTION_RECENT] = self._recent_payload
+        sections[SECTION_COUNTERS] = COUNTERS.pack(
+            tag_count, completed_trays, total_count, counters['total_reads'], counters['total_trays'],
+            counters['daily_production'], counters['day'], counters['runtime'], counters['downtime'])
+        if current_tag is not None and current_tag.success:
+            sections[SECTION_CURRENT_TAG] = _pack_tag(current_tag)
+
+        uploader = engine.uploader
+        if uploader is not None:
+            # 内存中未成批的上传数据写入磁盘队列，快照只记录队列位置
+            uploader.flush()
+            sections[SECTION_UPLOAD] = UPLOAD.pack(uploader.queue.next_seq, uploader.queue.acked_seq)
+
+        data = encode_snapshot(sections)
+        write_atomic(self.path, data, self.fsync)
+        self._last_key = key
+        self.writes += 1
+        self.last_size = len(data)
+        self.last_write_ms = (time.perf_counter() - start) * 1000
+        return True
+
+    def get_stats(self) -> dict:
+        return {'writes': self.writes, 'skipped': self.skipped, 'size': self.last_size,
+                'write_ms': round(self.last_write_ms, 2)}
@@ -0,0 +1,59 @@
+# startup_timer.py
+"""
+启动耗时统计模块
+记录从进程启动到各个关键节点（窗口显示、首个读写器连接、首个标签）的耗时
+"""
+
+import threading
+import time
+from typing import Optional, Dict
+
+# 关键节点名称及显示名称
+MILESTONES = {
+    'imports': '模块导入',
+    'engine': '引擎创建',
+    'window': '窗口显示',
+    'first_connected': '首个读写器连接',
+    'first_tag': '首个标签',
+}
+
+
+class StartupTimer:
+    """启动耗时统计类"""
+
+    def __init__(self, t0: Optional[float] = None):
+        """
+        初始化启动计时
+
+        Args:
+            t0: 起始时间（time.perf_counter），为空时取当前时间
+        """
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.marks: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def mark(self, name: str) -> bool:
+        """
+        记录关键节点（只记录第一次）
+
+        Args:
+            name: 节点名称
+
+        Returns:
+            bool: 是否为第一次记录
+        """
+        now = time.perf_counter()
+        with self.lock:
+            if name in self.marks:
+                return False
+            self.marks[name] = now - self.t0
+            return True
+
+    def report(self) -> str:
+        """生成启动耗时报告"""
+        parts = []
+        for name, label in MILESTONES.items():
+            value = self.marks.get(name)
+            if value is not None:
+                parts.append(f"{label} {value * 1000:.0f}ms")
+        return "启动耗时: " + ", ".join(parts)
@@ -0,0 +1,448 @@
+# tag_export.py
+"""
+标签数据列式导出模块
+将标签事件按行组（row group）写入Parquet文件，供质量分析按月统计读取率、RSSI分布和托盘装载情况:
+    读写器、天线、托盘、批号、GTIN   字典编码（重复值只保存一次）
+    EPC、TID                        二进制列（12字节，不保存十六进制文本）
+    时间                            毫秒时间戳（UTC）
+
+数据来源:
+    实时:  引擎每个标签事件写入 TagExporter，按路径中的日期格式切换文件（默认每天一个文件）
+    历史:  export_history 从标签数据库（tag_store.py 的 tag_events 表）流式读取
+
+内存上限与数据总量无关: 历史导出保留一个行组（row_group_size 行），
+实时导出另有最多 MAX_PENDING_GROUPS 个等待导出线程写入的行组。
+文件写入时使用 .tmp 后缀，关闭（写入文件尾）后改为正式文件名，未正常关闭的 .tmp 文件不完整。
+一个月的实时文件可作为一个数据集读取: pyarrow.parquet.read_table('export/')
+
+用法（历史数据导出）:
+    python tag_export.py rfid_tags.db -o tags_202609.parquet --since 2026-09-01 --until 2026-10-01
+"""
+
+import argparse
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+from flow_control import BoundedQueue, POLICY_DROP_OLDEST
+from rfid_tag import RFIDTag
+from watchdog import NULL_HEARTBEAT
+
+COLUMNS = ('timestamp', 'reader', 'epc', 'tid', 'rssi', 'antenna', 'zone_antenna',
+           'tray_id', 'batch', 'gtin', 'serial', 'is_new')
+
+# 字典编码的列（取值种类少，重复多）
+DICTIONARY_COLUMNS = ('reader', 'antenna', 'zone_antenna', 'tray_id', 'batch', 'gtin')
+
+COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'none')
+
+MAX_PENDING_GROUPS = 4  # 等待导出线程写入的行组上限
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("导出Parquet需要安装 pyarrow: pip install pyarrow")
+    return pa, pq
+
+
+def build_schema(pa):
+    """导出文件的列定义"""
+    return pa.schema([
+        ('timestamp', pa.timestamp('ms', tz='UTC')),
+        ('reader', pa.dictionary(pa.int32(), pa.string())),
+        ('epc', pa.binary()),
+        ('tid', pa.binary()),
+        ('rssi', pa.float32()),
+        ('antenna', pa.dictionary(pa.int32(), pa.uint8())),
+        ('zone_antenna', pa.dictionary(pa.int32(), pa.uint8())),  # 历史数据中没有，为空
+        ('tray_id', pa.dictionary(pa.int32(), pa.string())),
+        ('batch', pa.dictionary(pa.int32(), pa.string())),
+        ('gtin', pa.dictionary(pa.int32(), pa.string())),
+        ('serial', pa.uint64()),
+        ('is_new', pa.bool_()),  # 历史数据中没有，为空
+    ])
+
+
+class ParquetTagWriter:
+    """Parquet标签文件写入类（非线程安全，实时导出只在导出线程中使用）"""
+
+    def __init__(self, path: str, row_group_size: int = 100000, compression: str = 'zstd'):
+        """
+        创建文件
+
+        Args:
+            path: 输出文件路径
+            row_group_size: 行组大小（行数），同时是内存中缓存的最大行数
+            compression: 压缩方式
+
+        Raises:
+            RuntimeError: 没有安装 pyarrow
+        """
+        pa, pq = _import_pyarrow()
+        self.pa = pa
+        self.schema = build_schema(pa)
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.row_group_size = row_group_size
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression=compression,
+                                       use_dictionary=list(DICTIONARY_COLUMNS))
+        self.columns = {name: [] for name in COLUMNS}
+
+        # 统计信息
+        self.rows = 0
+        self.row_groups = 0
+
+    def add(self, reader: str, tag: RFIDTag, is_new: Optional[bool], tray_id: str = '',
+            zone_antenna: Optional[int] = None):
+        """
+        加入一个标签事件，达到行组大小时写入
+
+        Args:
+            reader: 读写器名称
+            tag: 标签对象
+            is_new: 是否为托盘新增标签（未知时为None）
+            tray_id: 托盘编号
+            zone_antenna: 仲裁后的归属天线号（未知时为None）
+        """
+        columns = self.columns
+        columns['timestamp'].append(tag.timestamp_ns // 1000000)
+        columns['reader'].append(reader)
+        columns['epc'].append(tag.epc_bytes)
+        columns['tid'].append(tag.tid_bytes)
+        columns['rssi'].append(tag.rssi)
+        columns['antenna'].append(tag.antenna_num)
+        columns['zone_antenna'].append(zone_antenna)
+        columns['tray_id'].append(tray_id or None)
+        columns['batch'].append(tag.batch_number or None)
+        columns['gtin'].append(tag.gtin or None)
+        columns['serial'].append(tag.serial)
+        columns['is_new'].append(is_new)
+        if len(columns['epc']) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """将缓存的行写为一个行组"""
+        if self.columns['epc']:
+            self.write_columns(self.columns)
+            self.columns = {name: [] for name in COLUMNS}
+
+    def write_columns(self, columns: dict):
+        """
+        将列缓冲写为一个行组
+
+        Args:
+            columns: 列名 -> 值列表（各列长度相同，字段含义同 add）
+        """
+        count = len(columns['epc'])
+        if not count:
+            return
+        pa = self.pa
+        arrays = []
+        for field in self.schema:
+            values = columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                array = pa.array(values, type=field.type.value_type).dictionary_encode()
+            else:
+                array = pa.array(values, type=field.type)
+            arrays.append(array)
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=count)
+        self.rows += count
+        self.row_groups += 1
+
+    def close(self):
+        """写入剩余数据和文件尾，改为正式文件名"""
+        self.flush()
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+
+class TagExporter:
+    """实时标签导出类（按日期切换文件）
+
+    接收线程只把标签字段追加到列缓冲中；缓冲达到行组大小或时间段变化时整体交给导出线程，
+    由导出线程转换为Arrow数组、压缩并写入文件（行组编码不占用接收线程）
+    """
+
+    def __init__(self, path: str = 'export/tags_%Y%m%d.parquet', row_group_size: int = 100000,
+                 compression: str = 'zstd'):
+        """
+        初始化导出
+
+        Args:
+            path: 输出文件路径，可包含 strftime 日期格式（如 %Y%m%d 每天一个文件，%Y%m%d_%H 每小时一个），
+                  格式化结果变化时关闭当前文件并创建新文件
+            row_group_size: 行组大小（行数）
+            compression: 压缩方式
+        """
+        _import_pyarrow()  # 启动时检查，避免运行中才发现缺少依赖
+        self.path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+
+        # 接收线程写入的列缓冲（加锁）
+        self.lock = threading.Lock()
+        self.columns = {name: [] for name in COLUMNS}
+        self.period = ''  # 当前缓冲对应的格式化路径（变化时切换文件）
+        self._period_checked = 0.0
+
+        # 待写入的行组: (格式化路径, 列缓冲)，列缓冲为None表示只关闭其他时间段的文件
+        # 导出线程跟不上时丢弃最早的行组，内存上限为 MAX_PENDING_GROUPS 个行组
+        self.queue = BoundedQueue('export', MAX_PENDING_GROUPS, POLICY_DROP_OLDEST)
+
+        # 导出线程使用
+        self.writer: Optional[ParquetTagWriter] = None
+        self.writer_period = ''
+        self.thread = None
+        self._stop_event = threading.Event()
+        self.heartbeat = NULL_HEARTBEAT  # 启用线程监视时由引擎设置
+
+        # 统计信息
+        self.rows = 0
+        self.written_rows = 0
+        self.files = 0
+        self.errors = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'TagExporter':
+        """由配置中的 export 部分创建"""
+        return cls(path=config['path'], row_group_size=config['row_group_size'],
+                   compression=config['compression'])
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def add(self, reader: str, tag: RFIDTag, is_new: bool, tray_id: str = ''):
+        """加入一个标签事件（接收线程，只追加到列缓冲）"""
+        with self.lock:
+            now = time.monotonic()
+            if now >= self._period_checked:
+                # 时间段每秒检查一次
+                self._period_checked = now + 1.0
+                period = time.strftime(self.path)
+                if period != self.period:
+                    self._hand_off_locked()
+                    self.period = period
+            columns = self.columns
+            columns['timestamp'].append(tag.timestamp_ns // 1000000)
+            columns['reader'].append(reader)
+            columns['epc'].append(tag.epc_bytes)
+            columns['tid'].append(tag.tid_bytes)
+            columns['rssi'].append(tag.rssi)
+            columns['antenna'].append(tag.antenna_num)
+            columns['zone_antenna'].append(tag.zone_antenna or None)
+            columns['tray_id'].append(tray_id or None)
+            columns['batch'].append(tag.batch_number or None)
+            columns['gtin'].append(tag.gtin or None)
+            columns['serial'].append(tag.serial)
+            columns['is_new'].append(is_new)
+            self.rows += 1
+            if len(columns['epc']) >= self.row_group_size:
+                self._hand_off_locked()
+
+    def _hand_off_locked(self):
+        """把当前列缓冲交给导出线程"""
+        if self.columns['epc']:
+            self.queue.put((self.period, self.columns))
+            self.columns = {name: [] for name in COLUMNS}
+
+    def check_rotate(self):
+        """到了下一时间段时交出缓冲并关闭当前文件（没有新数据时也及时写入文件尾）"""
+        period = time.strftime(self.path)
+        with self.lock:
+            if self.period and self.period != period:
+                self._hand_off_locked()
+                self.period = period
+                self.queue.put((period, None))
+
+    def close(self):
+        """写入剩余数据并关闭文件"""
+        with self.lock:
+            self._hand_off_locked()
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join()
+        else:
+            self._drain()  # 未启动导出线程时在当前线程写入
+        self.thread = None
+        self._close_writer()
+
+    # 导出线程
+    def _run(self):
+        while True:
+            self.heartbeat.beat()
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            self._write(*item)
+        self.heartbeat.pause()
+
+    def _drain(self):
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            self._write(*item)
+
+    def _write(self, period: str, columns: Optional[dict]):
+        if self.writer is not None and self.writer_period != period:
+            self._close_writer()
+        if columns is None:
+            return
+        try:
+            if self.writer is None:
+                self._open_writer(period)
+            self.writer.write_columns(columns)
+            self.written_rows += len(columns['epc'])
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"写入标签导出文件失败: {e}")
+
+    def _open_writer(self, period: str):
+        path = period
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            # 同一时间段重启后不覆盖已有文件
+            base, ext = os.path.splitext(path)
+            path = f"{base}_{time.strftime('%H%M%S')}{ext}"
+        self.writer = ParquetTagWriter(path, self.row_group_size, self.compression)
+        self.writer_period = period
+        self.files += 1
+        print(f"标签导出文件: {path}")
+
+    def _close_writer(self):
+        if self.writer is None:
+            return
+        try:
+            self.writer.close()
+        except (OSError, ValueError) as e:
+            self.errors += 1
+            print(f"关闭标签导出文件失败: {e}")
+        self.writer = None
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            buffered = len(self.columns['epc'])
+        writer = self.writer
+        return {'rows': self.rows, 'written': self.written_rows, 'buffered': buffered,
+                'pending_groups': self.queue.qsize(), 'shed_groups': self.queue.shed_count,
+                'files': self.files, 'errors': self.errors, 'path': writer.path if writer else ''}
+
+
+def export_history(db_path: str, output: str, since: Optional[str] = None, until: Optional[str] = None,
+                   row_group_size: int = 100000, compression: str = 'zstd',
+                   progress_callback: Optional[Callable[[int], None]] = None) -> int:
+    """
+    从标签数据库导出历史数据（流式，每次读取一个行组）
+
+    Args:
+        db_path: 标签数据库路径（tag_events 表）
+        output: 输出Parquet文件
+        since: 起始时间（含），如 "2026-09-01"
+        until: 结束时间（不含）
+        row_group_size: 行组大小
+        compression: 压缩方式
+        progress_callback: 进度回调(已导出行数)
+
+    Returns:
+        导出的行数
+    """
+    conditions = []
+    params = []
+    if since:
+        conditions.append('timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append('timestamp < ?')
+        params.append(until)
+    sql = 'SELECT timestamp, reader, epc, tid, user_data, rssi, antenna_num, tray_id FROM tag_events'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY id'
+
+    conn = sqlite3.connect(db_path)
+    writer = ParquetTagWriter(output, row_group_size, compression)
+    rows = 0
+    skipped = 0
+    last_text = None
+    last_ns = 0
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            records = cursor.fetchmany(row_group_size)
+            if not records:
+                break
+            for timestamp, reader, epc, tid, user_data, rssi, antenna_num, tray_id in records:
+                # 时间戳为秒级文本，同一秒内的记录很多，只解析一次
+                if timestamp != last_text:
+                    last_text = timestamp
+                    try:
+                        last_ns = int(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timestamp()) * 10**9
+                    except (ValueError, TypeError):
+                        last_ns = 0
+                tag = RFIDTag()
+                if not tag.from_record(epc, tid, user_data, rssi, antenna_num, timestamp, last_ns):
+                    skipped += 1
+                    continue
+                writer.add(reader or '', tag, None, tray_id or '')
+                rows += 1
+            if progress_callback:
+                progress_callback(rows)
+        writer.close()
+    except BaseException:
+        writer.writer.close()
+        os.remove(writer.tmp_path)
+        raise
+    finally:
+        conn.close()
+    if skipped:
+        print(f"跳过无法解析的记录 {skipped} 条")
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='标签历史数据导出为Parquet')
+    parser.add_argument('database', help='标签数据库（如 rfid_tags.db）')
+    parser.add_argument('-o', '--output', required=True, help='输出文件（.parquet）')
+    parser.add_argument('--since', help='起始时间（含），如 2026-09-01')
+    parser.add_argument('--until', help='结束时间（不含），如 2026-10-01')
+    parser.add_argument('--row-group-size', type=int, default=100000, help='行组大小（行数）')
+    parser.add_argument('--compression', choices=COMPRESSIONS, default='zstd', help='压缩方式')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.database):
+        print(f"数据库不存在: {args.database}")
+        return 1
+    start = time.perf_counter()
+    try:
+        rows = export_history(args.database, args.output, args.since, args.until,
+                              row_group_size=args.row_group_size, compression=args.compression,
+                              progress_callback=lambda n: print(f"已导出 {n} 行", end='\r'))
+    except (RuntimeError, sqlite3.Error) as e:
+        print(f"导出失败: {e}")
+        return 1
+    print(f"导出完成: {rows} 行, 耗时 {time.perf_counter() - start:.2f}秒 -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+# tag_feed.py
+"""
+本机标签事件发布模块
+通过TCP回环地址或Unix域套接字，向同一台主机上的MES、标签打印等进程实时推送标签事件
+
+订阅协议:
+    订阅方连接后发送一行JSON订阅请求（以换行结束），之后服务端开始推送事件
+    {"format": "json", "antennas": [2], "readers": ["reader1"], "epc_prefix": "E280"}
+    epc_prefix 为十六进制，可以是奇数位（按半字节匹配，如 "E28"），也可以带掩码（如 "3000/FF00"）
+    所有字段均可省略，发送空行表示以JSON格式订阅全部事件；再次发送订阅行可修改过滤条件
+
+推送格式:
+    json:   每个事件一行JSON（换行分隔）
+    binary: 每个事件为 4字节长度(大端) + 定长记录，记录格式见 BINARY_RECORD
+"""
+
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+from collections import deque
+from typing import Iterator, Dict, Any
+from rfid_tag import RFIDTag
+from prefilter import parse_prefix
+from watchdog import NULL_HEARTBEAT
+
+# 二进制记录: 时间戳ns, RSSI(0.1dBm), 天线号, 归属天线号, 是否新增, EPC(12), TID(12), USER(16),
+#             读写器名称长度 + 名称, 托盘编号长度 + 托盘编号（未计入托盘时长度为0）
+BINARY_RECORD = struct.Struct('>QhBBB12s12s16sB')
+
+DROP_POLICIES = ('drop_oldest', 'drop_newest', 'disconnect')
+
+
+def encode_json_event(reader_name: str, tag: RFIDTag, is_new: bool, tray_id: str = '') -> bytes:
+    """将标签事件编码为一行JSON"""
+    event = {
+        'reader': reader_name,
+        'epc': tag.epc_bytes.hex().upper(),
+        'tid': tag.tid_bytes.hex().upper(),
+        'user': tag.user_bytes.hex().upper(),
+        'rssi': tag.rssi,
+        'antenna': tag.antenna_num,
+        'zone': tag.zone_antenna,
+        'ts': tag.timestamp_ns,
+        'new': is_new,
+        'tray_id': tray_id,
+    }
+    return json.dumps(event, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def encode_binary_event(reader_name: str, tag: RFIDTag, is_new: bool, tray_id: str = '') -> bytes:
+    """将标签事件编码为带长度前缀的二进制记录"""
+    name = reader_name.encode('utf-8')[:255]
+    tray = tray_id.encode('utf-8')[:255]
+    record = BINARY_RECORD.pack(tag.timestamp_ns, int(round(tag.rssi * 10)), tag.antenna_num,
+                                tag.zone_antenna, 1 if is_new else 0, tag.epc_bytes, tag.tid_bytes,
+                                tag.user_bytes, len(name)) + name + bytes((len(tray),)) + tray
+    return struct.pack('>I', len(record)) + record
+
+
+def decode_binary_event(record: bytes) -> Dict[str, Any]:
+    """解码一条二进制记录（不含长度前缀）"""
+    ts, rssi, antenna, zone, is_new, epc, tid, user, name_len = BINARY_RECORD.unpack_from(record)
+    offset = BINARY_RECORD.size + name_len
+    name = record[BINARY_RECORD.size:offset].decode('utf-8')
+    tray_id = record[offset + 1:offset + 1 + record[offset]].decode('utf-8')
+    return {
+        'reader': name,
+        'epc': epc.hex().upper(),
+        'tid': tid.hex().upper(),
+        'user': user.hex().upper(),
+        'rssi': rssi / 10.0,
+        'antenna': antenna,
+        'zone': zone,
+        'ts': ts,
+        'new': bool(is_new),
+        'tray_id': tray_id,
+    }
+
+
+class FeedSubscriber:
+    """订阅方连接状态"""
+
+    def __init__(self, sock: socket.socket, address, queue_size: int):
+        self.sock = sock
+        self.address = address
+        self.queue_size = queue_size
+
+        # 订阅条件（收到订阅请求前不推送）
+        self.subscribed = False
+        self.format = 'json'
+        self.antennas = None
+        self.readers = None
+        self.epc_prefix = None  # (字节数, 前缀值, 掩码值)，None表示不限制
+
+        # 发送缓冲
+        self.queue = deque()
+        self.out_buffer = b''
+        self.read_buffer = bytearray()
+        self.closing = False
+
+        # 统计信息
+        self.sent_count = 0
+        self.dropped_count = 0
+
+    def apply_subscription(self, request: Dict[str, Any]):
+        """应用订阅请求"""
+        fmt = request.get('format', 'json')
+        if fmt not in ('json', 'binary'):
+            raise ValueError(f"不支持的格式: {fmt}")
+        antennas = request.get('antennas')
+        readers = request.get('readers')
+        prefix = str(request.get('epc_prefix', '')).replace(' ', '')
+        if prefix and '/' not in prefix and len(prefix) % 2:
+            # 奇数位前缀按半字节匹配：补0并用掩码屏蔽最后半字节
+            prefix = f"{prefix}0/{'F' * len(prefix)}0"
+        epc_prefix = parse_prefix(prefix) if prefix else None
+
+        self.format = fmt
+        self.antennas = frozenset(int(a) for a in antennas) if antennas else None
+        self.readers = frozenset(readers) if readers else None
+        self.epc_prefix = epc_prefix
+        self.subscribed = True
+
+    def matches(self, reader_name: str, tag: RFIDTag) -> bool:
+        """事件是否满足订阅条件"""
+        if self.antennas is not None and tag.antenna_num not in self.antennas:
+            return False
+        if self.readers is not None and reader_name not in self.readers:
+            return False
+        if self.epc_prefix is not None:
+            length, value, mask = self.epc_prefix
+            if len(tag.epc_bytes) < length or int.from_bytes(tag.epc_bytes[:length], 'big') & mask != value:
+                return False
+        return True
+
+
+class TagFeedServer:
+    """标签事件发布服务类"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, unix_path: str = '',
+                 queue_size: int = 10000, drop_policy: str = 'drop_oldest'):
+        """
+        初始化发布服务
+
+        Args:
+            host: 监听地址（仅在未指定unix_path时使用）
+            port: 监听端口，0表示由系统分配
+            unix_path: Unix域套接字路径，非空时优先使用
+            queue_size: 每个订阅方的待发送事件上限
+            drop_policy: 订阅方消费过慢时的策略
+                - drop_oldest: 丢弃最旧的事件
+                - drop_newest: 丢弃新事件
+                - disconnect: 断开该订阅方
+        """
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"不支持的丢弃策略: {drop_policy}")
+
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+
+        self.server_socket = None
+        self.selector = None
+        self.subscribers: Dict[socket.socket, FeedSubscriber] = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.heartbeat = NULL_HEARTBEAT  # 启用线程监视时由引擎设置
+
+        # 唤醒IO线程用的套接字对
+        self._wake_r = None
+        self._wake_w = None
+        self._wake_pending = False
+
+        self.published_count = 0
+
+    @property
+    def address(self):
+        """实际监听地址"""
+        if self.server_socket is None:
+            return None
+        return self.server_socket.getsockname()
+
+    def start(self):
+        """启动发布服务"""
+        if self.unix_path and hasattr(socket, 'AF_UNIX'):
+            if os.path.exists(self.unix_path):
+                os.remove(self.unix_path)
+            self.server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server_socket.bind(self.unix_path)
+        else:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(16)
+        self.server_socket.setblocking(False)
+
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server_socket, selectors.EVENT_READ, 'accept')
+        self.selector.register(self._wake_r, selectors.EVENT_READ, 'wake')
+
+        self.running = True
+        self.thread = threading.Thread(target=self._io_loop, daemon=True)
+        self.thread.start()
+        print(f"标签事件发布服务已启动: {self.address}")
+
+    def stop(self):
+        """停止发布服务"""
+        if not self.running:
+            return
+        self.running = False
+        self._wake()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+        for sub in list(self.subscribers.values()):
+            self._close_subscriber(sub)
+        for sock in (self.server_socket, self._wake_r, self._wake_w):
+            try:
+                sock.close()
+            except Exception:
+                pass
+        if self.selector:
+            self.selector.close()
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+        print("标签事件发布服务已停止")
+
+    def publish(self, reader_name: str, tag: RFIDTag, is_new: bool = False, tray_id: str = ''):
+        """
+        发布一个标签事件（在读写器线程中调用，不阻塞）
+
+        Args:
+            reader_name: 读写器名称
+            tag: 标签对象
+            is_new: 是否为托盘新增
+            tray_id: 所属托盘编号
+        """
+        if not self.running or not self.subscribers:
+            return
+
+        encoded = {}
+        queued = False
+        with self.lock:
+            for sub in self.subscribers.values():
+                if not sub.subscribed or sub.closing or not sub.matches(reader_name, tag):
+                    continue
+
+                payload = encoded.get(sub.format)
+                if payload is None:
+                    if sub.format == 'binary':
+                        payload = encode_binary_event(reader_name, tag, is_new, tray_id)
+                    else:
+                        payload = encode_json_event(reader_name, tag, is_new, tray_id)
+                    encoded[sub.format] = payload
+
+                if len(sub.queue) >= sub.queue_size:
+                    sub.dropped_count += 1
+                    if self.drop_policy == 'drop_newest':
+                        continue
+                    if self.drop_policy == 'disconnect':
+                        sub.closing = True
+                        queued = True
+                        continue
+                    sub.queue.popleft()
+
+                sub.queue.append(payload)
+                queued = True
+
+            self.published_count += 1
+
+        if queued:
+            self._wake()
+
+    def get_stats(self) -> list:
+        """获取各订阅方的统计信息"""
+        with self.lock:
+            return [{'address': str(sub.address), 'format': sub.format,
+                     'queued': len(sub.queue), 'sent': sub.sent_count,
+                     'dropped': sub.dropped_count}
+                    for sub in self.subscribers.values()]
+
+    def _wake(self):
+        """唤醒IO线程"""
+        if self._wake_pending:
+            return
+        self._wake_pending = True
+        try:
+            self._wake_w.send(b'\x00')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _io_loop(self):
+        """IO线程函数：接受连接、读取订阅请求、发送事件"""
+        while self.running:
+            self.heartbeat.beat()
+            for key, mask in self.selector.select(timeout=1.0):
+                if key.data == 'accept':
+                    self._accept()
+                elif key.data == 'wake':
+                    self._drain_wake()
+                else:
+                    sub = key.data
+                    if mask & selectors.EVENT_READ:
+                        self._read_subscriber(sub)
+                    if mask & selectors.EVENT_WRITE and not sub.closing:
+                        self._write_subscriber(sub)
+            self._update_interest()
+
+    def _accept(self):
+        try:
+            sock, address = self.server_socket.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        sub = FeedSubscriber(sock, address, self.queue_size)
+        with self.lock:
+            self.subscribers[sock] = sub
+        self.selector.register(sock, selectors.EVENT_READ, sub)
+        print(f"新的订阅方连接: {address}")
+
+    def _drain_wake(self):
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except (BlockingIOError, OSError):
+            pass
+        self._wake_pending = False
+
+    def _read_subscriber(self, sub: FeedSubscriber):
+        try:
+            data = sub.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close_subscriber(sub)
+            return
+
+        sub.read_buffer += data
+        while b'\n' in sub.read_buffer:
+            line, _, rest = bytes(sub.read_buffer).partition(b'\n')
+            sub.read_buffer = bytearray(rest)
+            try:
+                request = json.loads(line) if line.strip() else {}
+                with self.lock:
+                    sub.apply_subscription(request)
+                print(f"订阅方 {sub.address} 订阅条件: {request}")
+            except (ValueError, TypeError) as e:
+                print(f"订阅请求无效 {sub.address}: {e}")
+                self._close_subscriber(sub)
+                return
+
+        if len(sub.read_buffer) > 65536:
+            self._close_subscriber(sub)
+
+    def _write_subscriber(self, sub: FeedSubscriber):
+        if not sub.out_buffer:
+            with self.lock:
+                chunks = []
+                size = 0
+                while sub.queue and size < 65536:
+                    chunk = sub.queue.popleft()
+                    chunks.append(chunk)
+                    size += len(chunk)
+                sub.sent_count += len(chunks)
+            sub.out_buffer = b''.join(chunks)
+        if not sub.out_buffer:
+            return
+        try:
+            sent = sub.sock.send(sub.out_buffer)
+            sub.out_buffer = sub.out_buffer[sent:]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._close_subscriber(sub)
+
+    def _update_interest(self):
+        """根据是否有待发送数据更新订阅方的监听事件"""
+        with self.lock:
+            subs = list(self.subscribers.values())
+        for sub in subs:
+            if sub.closing and not sub.out_buffer:
+                self._close_subscriber(sub)
+                continue
+            events = selectors.EVENT_READ
+            if sub.out_buffer or sub.queue:
+                events |= selectors.EVENT_WRITE
+            try:
+                if self.selector.get_key(sub.sock).events != events:
+                    self.selector.modify(sub.sock, events, sub)
+            except (KeyError, ValueError):
+                pass
+
+    def _close_subscriber(self, sub: FeedSubscriber):
+        with self.lock:
+            if self.subscribers.pop(sub.sock, None) is None:
+                return
+        try:
+            self.selector.unregister(sub.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            sub.sock.close()
+        except OSError:
+            pass
+        print(f"订阅方断开: {sub.address}, 已发送 {sub.sent_count}, 丢弃 {sub.dropped_count}")
+
+
+def subscribe(host: str = '127.0.0.1', port: int = 9100, unix_path: str = '',
+              **request) -> Iterator[Dict[str, Any]]:
+    """
+    订阅标签事件（供下游进程使用的简单客户端）
+
+    Args:
+        host: 发布服务地址
+        port: 发布服务端口
+        unix_path: Unix域套接字路径，非空时优先使用
+        **request: 订阅条件，如 format='binary', antennas=[2], epc_prefix='E280'
+
+    Yields:
+        事件字典
+    """
+    if unix_path:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(unix_path)
+    else:
+        sock = socket.create_connection((host, port))
+
+    try:
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        binary = request.get('format') == 'binary'
+        buffer = bytearray()
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                return
+            buffer += data
+            if binary:
+                while len(buffer) >= 4:
+                    length = int.from_bytes(buffer[:4], 'big')
+                    if len(buffer) < 4 + length:
+                        break
+                    yield decode_binary_event(bytes(buffer[4:4 + length]))
+                    del buffer[:4 + length]
+            else:
+                while b'\n' in buffer:
+                    line, _, rest = bytes(buffer).partition(b'\n')
+                    buffer = bytearray(rest)
+                    yield json.loads(line)
+    finally:
+        sock.close()
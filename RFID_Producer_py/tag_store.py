@@ -0,0 +1,92 @@
+# tag_store.py
+"""
+标签数据持久化模块
+将解析后的标签事件批量写入SQLite数据库
+"""
+
+import sqlite3
+import threading
+from typing import List, Tuple
+from rfid_tag import RFIDTag
+
+
+class TagStore:
+    """标签事件存储类"""
+
+    CREATE_SQL = """
+        CREATE TABLE IF NOT EXISTS tag_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            reader TEXT,
+            epc TEXT,
+            tid TEXT,
+            user_data TEXT,
+            rssi REAL,
+            antenna_num INTEGER,
+            tray_id TEXT
+        )
+    """
+
+    INSERT_SQL = """
+        INSERT INTO tag_events (timestamp, reader, epc, tid, user_data, rssi, antenna_num, tray_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    def __init__(self, path: str = 'rfid_tags.db', batch_size: int = 100):
+        """
+        初始化存储
+
+        Args:
+            path: SQLite数据库文件路径
+            batch_size: 批量提交的记录数
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending: List[Tuple] = []
+        self.written_count = 0
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(self.CREATE_SQL)
+        self.conn.commit()
+
+    def add(self, reader: str, tag: RFIDTag, tray_id: str = ''):
+        """
+        加入一条标签事件，达到批量大小时自动写入
+
+        Args:
+            reader: 读写器名称
+            tag: 标签对象
+            tray_id: 所属托盘编号
+        """
+        row = (tag.timestamp, reader, tag.epc, tag.tid, tag.user_data,
+               tag.rssi, tag.antenna_num, tray_id)
+        with self.lock:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """写入所有缓存的记录"""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self.pending or self.conn is None:
+            return
+        try:
+            self.conn.executemany(self.INSERT_SQL, self.pending)
+            self.conn.commit()
+            self.written_count += len(self.pending)
+        except sqlite3.Error as e:
+            print(f"写入标签数据失败: {e}")
+        self.pending = []
+
+    def close(self):
+        """写入剩余记录并关闭数据库"""
+        with self.lock:
+            self._flush_locked()
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
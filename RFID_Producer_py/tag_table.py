@@ -0,0 +1,307 @@
+# tag_table.py
+"""
+实时标签列表模块
+TagTableModel: 按EPC索引的标签列表数据（与界面无关，线程安全）
+VirtualTagTable: 只渲染可见行的表格控件，数据重读时原位更新，支持排序和过滤
+"""
+
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+from datetime import datetime
+from typing import List, Optional, Dict
+from rfid_tag import RFIDTag
+
+# 列定义: (列名, 标题, 宽度)
+COLUMNS = (
+    ('epc', 'EPC', 260),
+    ('tid', 'TID', 260),
+    ('antenna', '天线', 60),
+    ('rssi', 'RSSI(dBm)', 90),
+    ('count', '次数', 70),
+    ('last_seen', '最后读取', 150),
+)
+
+# 行数据下标
+COL_EPC, COL_TID, COL_ANTENNA, COL_RSSI, COL_COUNT, COL_LAST_SEEN = range(6)
+
+
+class TagTableModel:
+    """标签列表数据模型"""
+
+    def __init__(self, max_rows: int = 100000):
+        """
+        初始化数据模型
+
+        Args:
+            max_rows: 最大行数，超出后不再加入新标签
+        """
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+
+        # 行数据: [epc, tid, antenna, rssi, count, last_seen(时间戳)]
+        self.rows: List[list] = []
+        self.index: Dict[str, list] = {}
+
+        # 当前视图（过滤和排序后的行）
+        self.view: List[list] = []
+        self.sort_column = None
+        self.sort_reverse = False
+        self.filter_text = ''
+        self.filter_antenna = 0
+
+        # 变化标记
+        self.version = 0  # 任意行数据变化
+        self.view_dirty = False  # 视图需要重新生成（新增行，或排序列的值变化）
+
+    def upsert(self, tag: RFIDTag, now: Optional[float] = None):
+        """
+        加入或更新一个标签（O(1)）
+
+        Args:
+            tag: 标签对象
+            now: 读取时间（time.time），为空时取当前时间
+        """
+        if now is None:
+            now = time.time()
+        antenna = tag.zone_antenna or tag.antenna_num
+        with self.lock:
+            row = self.index.get(tag.epc)
+            if row is None:
+                if len(self.rows) >= self.max_rows:
+                    return
+                row = [tag.epc, tag.tid, antenna, tag.rssi, 1, now]
+                self.rows.append(row)
+                self.index[tag.epc] = row
+                self.view_dirty = True
+            else:
+                row[COL_ANTENNA] = antenna
+                row[COL_RSSI] = tag.rssi
+                row[COL_COUNT] += 1
+                row[COL_LAST_SEEN] = now
+                if self.sort_column is not None and self.sort_column != COL_EPC and self.sort_column != COL_TID:
+                    self.view_dirty = True
+                elif self.filter_antenna:
+                    self.view_dirty = True
+            self.version += 1
+
+    def set_sort(self, column: Optional[int], reverse: bool = False):
+        """设置排序列（None表示按加入顺序）"""
+        with self.lock:
+            self.sort_column = column
+            self.sort_reverse = reverse
+            self.view_dirty = True
+
+    def set_filter(self, text: str = '', antenna: int = 0):
+        """
+        设置过滤条件
+
+        Args:
+            text: EPC或TID包含的文本（忽略空格和大小写）
+            antenna: 只显示该天线的标签，0表示全部
+        """
+        with self.lock:
+            self.filter_text = text.replace(' ', '').upper()
+            self.filter_antenna = antenna
+            self.view_dirty = True
+
+    def clear(self):
+        """清空所有标签"""
+        with self.lock:
+            self.rows = []
+            self.index = {}
+            self.view = []
+            self.view_dirty = False
+            self.version += 1
+
+    def refresh_view(self) -> bool:
+        """
+        按需重新生成视图
+
+        Returns:
+            bool: 视图是否重新生成
+        """
+        with self.lock:
+            if not self.view_dirty:
+                return False
+            rows = self.rows
+            if self.filter_text:
+                text = self.filter_text
+                rows = [r for r in rows
+                        if text in r[COL_EPC].replace(' ', '') or text in r[COL_TID].replace(' ', '')]
+            if self.filter_antenna:
+                antenna = self.filter_antenna
+                rows = [r for r in rows if r[COL_ANTENNA] == antenna]
+            else:
+                rows = list(rows)
+            if self.sort_column is not None:
+                col = self.sort_column
+                rows.sort(key=lambda r: r[col], reverse=self.sort_reverse)
+            self.view = rows
+            self.view_dirty = False
+            return True
+
+    def get_rows(self, start: int, count: int) -> List[tuple]:
+        """获取视图中指定范围的行（拷贝）"""
+        with self.lock:
+            return [tuple(r) for r in self.view[start:start + count]]
+
+    def __len__(self) -> int:
+        return len(self.view)
+
+
+class VirtualTagTable(tk.Frame):
+    """虚拟化标签表格控件（固定数量的显示行，滚动时只替换可见行的内容）"""
+
+    def __init__(self, master, model: TagTableModel, height: int = 10,
+                 refresh_ms: int = 200, resort_ms: int = 1000, **kwargs):
+        """
+        初始化表格控件
+
+        Args:
+            master: 父控件
+            model: 数据模型
+            height: 可见行数
+            refresh_ms: 可见行刷新间隔（毫秒）
+            resort_ms: 排序/过滤视图重新生成的最小间隔（毫秒）
+        """
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.height = height
+        self.refresh_ms = refresh_ms
+        self.resort_ms = resort_ms
+        self.offset = 0
+        self._rendered_version = -1
+        self._last_resort = 0.0
+        self._row_cache: List[Optional[tuple]] = [None] * height
+
+        # 过滤栏
+        filter_frame = tk.Frame(self, bg=kwargs.get('bg', 'white'))
+        filter_frame.pack(fill='x', pady=(0, 5))
+        tk.Label(filter_frame, text="过滤EPC/TID:", font=("微软雅黑", 9),
+                 bg=kwargs.get('bg', 'white')).pack(side='left', padx=(0, 5))
+        self.filter_entry = tk.Entry(filter_frame, width=30, font=("微软雅黑", 9),
+                                     relief='solid', bd=1)
+        self.filter_entry.pack(side='left', padx=(0, 15))
+        self.filter_entry.bind('<KeyRelease>', lambda e: self._apply_filter())
+
+        tk.Label(filter_frame, text="天线:", font=("微软雅黑", 9),
+                 bg=kwargs.get('bg', 'white')).pack(side='left', padx=(0, 5))
+        self.antenna_var = tk.StringVar(value='全部')
+        antenna_box = ttk.Combobox(filter_frame, textvariable=self.antenna_var, width=6,
+                                   values=['全部'] + [str(i) for i in range(1, 9)], state='readonly')
+        antenna_box.pack(side='left')
+        antenna_box.bind('<<ComboboxSelected>>', lambda e: self._apply_filter())
+
+        self.count_label = tk.Label(filter_frame, text="标签数: 0", font=("微软雅黑", 9),
+                                    bg=kwargs.get('bg', 'white'))
+        self.count_label.pack(side='right')
+
+        # 表格和滚动条
+        table_frame = tk.Frame(self)
+        table_frame.pack(fill='both', expand=True)
+
+        self.tree = ttk.Treeview(table_frame, columns=[c[0] for c in COLUMNS],
+                                 show='headings', height=height, selectmode='browse')
+        for i, (name, title, width) in enumerate(COLUMNS):
+            self.tree.heading(name, text=title, command=lambda c=i: self._toggle_sort(c))
+            self.tree.column(name, width=width, anchor='w' if i < 2 else 'center')
+
+        # 固定数量的显示行，内容随滚动位置替换
+        self.item_ids = [self.tree.insert('', 'end', values=[''] * len(COLUMNS)) for _ in range(height)]
+
+        self.scrollbar = tk.Scrollbar(table_frame, command=self._on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll_to(self.offset - 3))
+        self.tree.bind('<Button-5>', lambda e: self.scroll_to(self.offset + 3))
+
+        self.after(self.refresh_ms, self._refresh)
+
+    def _apply_filter(self):
+        antenna = self.antenna_var.get()
+        self.model.set_filter(self.filter_entry.get(), int(antenna) if antenna.isdigit() else 0)
+        self.offset = 0
+        self._render(force=True)
+
+    def _toggle_sort(self, column: int):
+        if self.model.sort_column == column:
+            if self.model.sort_reverse:
+                self.model.set_sort(None)
+            else:
+                self.model.set_sort(column, True)
+        else:
+            self.model.set_sort(column, False)
+
+        for i, (name, title, _) in enumerate(COLUMNS):
+            mark = ''
+            if self.model.sort_column == i:
+                mark = ' ▼' if self.model.sort_reverse else ' ▲'
+            self.tree.heading(name, text=title + mark)
+        self._render(force=True)
+
+    def _on_scroll(self, *args):
+        """滚动条回调"""
+        total = len(self.model)
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * total))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self.height
+            self.scroll_to(self.offset + step)
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.offset - int(event.delta / 120) * 3)
+
+    def scroll_to(self, offset: int):
+        """滚动到指定行"""
+        max_offset = max(0, len(self.model) - self.height)
+        self.offset = max(0, min(offset, max_offset))
+        self._render(force=True)
+
+    def _refresh(self):
+        """周期刷新（只在数据变化时渲染可见行）"""
+        try:
+            self._render()
+        finally:
+            self.after(self.refresh_ms, self._refresh)
+
+    def _render(self, force: bool = False):
+        """渲染可见行"""
+        now = time.monotonic()
+        if force or now - self._last_resort >= self.resort_ms / 1000.0:
+            if self.model.refresh_view():
+                self._last_resort = now
+                force = True
+
+        version = self.model.version
+        if not force and version == self._rendered_version:
+            return
+        self._rendered_version = version
+
+        total = len(self.model)
+        if self.offset > max(0, total - self.height):
+            self.offset = max(0, total - self.height)
+
+        rows = self.model.get_rows(self.offset, self.height)
+        for i, item_id in enumerate(self.item_ids):
+            row = rows[i] if i < len(rows) else None
+            if row == self._row_cache[i]:
+                continue
+            self._row_cache[i] = row
+            if row is None:
+                self.tree.item(item_id, values=[''] * len(COLUMNS))
+            else:
+                self.tree.item(item_id, values=(
+                    row[COL_EPC], row[COL_TID], row[COL_ANTENNA], f"{row[COL_RSSI]:.1f}",
+                    row[COL_COUNT], datetime.fromtimestamp(row[COL_LAST_SEEN]).strftime("%H:%M:%S")))
+
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.count_label.config(text=f"标签数: {len(self.model.rows)}")
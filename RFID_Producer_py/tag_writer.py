@@ -0,0 +1,372 @@
+# tag_writer.py
+"""
+标签写入（编码）模块
+按TID排队写入EPC/USER数据，多个标签的写入指令流水线发送（不逐个等待应答），
+写入成功后读回校验，失败或超时自动重试，并统计每个标签的编码耗时
+
+加锁时只更新任务状态，要发送的指令帧和要通知的完成任务先记下，释放锁后再发送和回调
+（发送可能在发送队列满时等待，不能阻塞接收线程处理其他应答）
+"""
+
+import threading
+import time
+from collections import deque, OrderedDict
+from typing import Callable, Optional, Dict, List
+from command import (build_command, CMD_TYPE_RFID_WRITE, CMD_TYPE_RFID_READ,
+                     CMD_ACK_TYPE_RFID_WRITE, CMD_ACK_TYPE_RFID_READ,
+                     MEM_BANK_EPC, MEM_BANK_USER)
+
+TID_LEN = 12
+EPC_WORD_OFFSET = 2  # EPC区前两个字为CRC和PC
+USER_WORD_OFFSET = 0
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_WRITING = 'writing'
+JOB_VERIFYING = 'verifying'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class TagWriteJob:
+    """单个标签的写入任务"""
+
+    def __init__(self, tid: bytes, epc: Optional[bytes] = None, user: Optional[bytes] = None,
+                 access_password: bytes = b'\x00\x00\x00\x00'):
+        """
+        初始化写入任务
+
+        Args:
+            tid: 目标标签TID（12字节）
+            epc: 要写入的EPC数据（长度须为偶数字节）
+            user: 要写入的USER数据（长度须为偶数字节）
+            access_password: 访问密码（4字节）
+        """
+        if len(tid) != TID_LEN:
+            raise ValueError(f"TID长度必须为{TID_LEN}字节")
+        if not epc and not user:
+            raise ValueError("EPC和USER数据不能同时为空")
+        for data in (epc, user):
+            if data and len(data) % 2:
+                raise ValueError("写入数据长度必须为偶数字节（按字写入）")
+
+        self.tid = bytes(tid)
+        self.access_password = access_password
+
+        # 写入步骤: (存储区, 起始字地址, 数据)
+        self.steps = []
+        if epc:
+            self.steps.append((MEM_BANK_EPC, EPC_WORD_OFFSET, bytes(epc)))
+        if user:
+            self.steps.append((MEM_BANK_USER, USER_WORD_OFFSET, bytes(user)))
+
+        self.step_index = 0
+        self.status = JOB_PENDING
+        self.attempts = 0
+        self.error_message = ''
+
+        # 时间统计（time.monotonic）
+        self.submitted_at = time.monotonic()
+        self.started_at = 0.0  # 首次发送写入指令的时间
+        self.completed_at = 0.0
+        self.deadline = 0.0
+
+    @property
+    def latency(self) -> float:
+        """编码耗时（秒），从首次发送写入指令到完成（含重试）"""
+        if not self.completed_at or not self.started_at:
+            return 0.0
+        return self.completed_at - self.started_at
+
+    @property
+    def queue_wait(self) -> float:
+        """排队等待时间（秒），从提交到首次发送"""
+        if not self.started_at:
+            return 0.0
+        return self.started_at - self.submitted_at
+
+    @property
+    def current_step(self):
+        return self.steps[self.step_index]
+
+    def __repr__(self) -> str:
+        return (f"TagWriteJob(tid='{self.tid.hex().upper()}', status={self.status}, "
+                f"attempts={self.attempts}, latency={self.latency * 1000:.1f}ms)")
+
+
+class TagWritePipeline:
+    """标签写入流水线类"""
+
+    def __init__(self, send_func: Callable[[bytes], bool], window: int = 8,
+                 ack_timeout: float = 1.0, max_retries: int = 3, verify: bool = True):
+        """
+        初始化写入流水线
+
+        Args:
+            send_func: 发送指令帧的函数
+            window: 同时等待应答的最大指令数
+            ack_timeout: 等待应答超时（秒）
+            max_retries: 单个标签最大重试次数
+            verify: 写入后是否读回校验
+        """
+        self.send_func = send_func
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.verify = verify
+
+        self.pending = deque()
+        self.in_flight: "OrderedDict[bytes, TagWriteJob]" = OrderedDict()
+        self.jobs: Dict[bytes, TagWriteJob] = {}  # 未完成的任务（按TID）
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+        # 统计信息
+        self.success_count = 0
+        self.failed_count = 0
+        self.retry_count = 0
+        self.latencies = deque(maxlen=1000)
+
+        # 回调函数
+        self.job_callback = None
+
+    def set_callbacks(self, job_callback: Optional[Callable[[TagWriteJob], None]] = None):
+        """
+        设置回调函数
+
+        Args:
+            job_callback: 任务完成（成功或失败）回调
+        """
+        self.job_callback = job_callback
+
+    def start(self):
+        """启动流水线"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止流水线（未完成的任务保留在队列中）"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def submit(self, tid: bytes, epc: Optional[bytes] = None, user: Optional[bytes] = None,
+               access_password: bytes = b'\x00\x00\x00\x00') -> TagWriteJob:
+        """
+        提交写入任务
+
+        Args:
+            tid: 目标标签TID
+            epc: 要写入的EPC数据
+            user: 要写入的USER数据
+            access_password: 访问密码
+
+        Returns:
+            写入任务
+        """
+        job = TagWriteJob(tid, epc, user, access_password)
+        with self.cond:
+            if job.tid in self.jobs:
+                raise ValueError(f"标签 {job.tid.hex().upper()} 已有未完成的写入任务")
+            self.jobs[job.tid] = job
+            self.pending.append(job)
+            self.cond.notify_all()
+        return job
+
+    def on_frame(self, frame: bytes) -> bool:
+        """
+        处理读写器应答帧（在接收线程中调用）
+
+        Args:
+            frame: 完整应答帧
+
+        Returns:
+            bool: 是否为写入流水线的应答
+        """
+        cmd = frame[4]
+        if cmd not in (CMD_ACK_TYPE_RFID_WRITE, CMD_ACK_TYPE_RFID_READ):
+            return False
+        if len(frame) < 5 + TID_LEN + 1 + 3:
+            return True
+
+        tid = frame[5:5 + TID_LEN]
+        status = frame[5 + TID_LEN]
+        data = frame[5 + TID_LEN + 1:-3]
+
+        outbox = []
+        finished = []
+        with self.cond:
+            job = self.in_flight.get(tid)
+            if job is None:
+                return True  # 超时后到达的应答，忽略
+
+            if status != 0x00:
+                self._retry_locked(job, f"{'写入' if cmd == CMD_ACK_TYPE_RFID_WRITE else '读取'}失败(状态0x{status:02X})",
+                                   finished)
+            elif cmd == CMD_ACK_TYPE_RFID_WRITE and job.status == JOB_WRITING:
+                if self.verify:
+                    job.status = JOB_VERIFYING
+                    self._send_locked(job, outbox)
+                else:
+                    self._step_done_locked(job, outbox, finished)
+            elif cmd == CMD_ACK_TYPE_RFID_READ and job.status == JOB_VERIFYING:
+                expected = job.current_step[2]
+                if data[:len(expected)] == expected:
+                    self._step_done_locked(job, outbox, finished)
+                else:
+                    self._retry_locked(job, "读回校验不一致", finished)
+            self.cond.notify_all()
+        self._dispatch(outbox, finished)
+        return True
+
+    def fail_all(self, reason: str):
+        """
+        结束所有未完成的任务（排队中和等待应答的），逐个按失败通知
+
+        Args:
+            reason: 失败原因
+        """
+        finished = []
+        with self.cond:
+            jobs = list(self.jobs.values())
+            self.pending.clear()
+            self.in_flight.clear()
+            for job in jobs:
+                job.status = JOB_FAILED
+                job.error_message = reason
+                self.failed_count += 1
+                self._finish_locked(job, finished)
+        self._dispatch([], finished)
+
+    def get_stats(self) -> dict:
+        """获取统计信息（耗时单位为毫秒）"""
+        with self.cond:
+            latencies = sorted(self.latencies)
+            stats = {
+                'pending': len(self.pending),
+                'in_flight': len(self.in_flight),
+                'success': self.success_count,
+                'failed': self.failed_count,
+                'retries': self.retry_count,
+            }
+        if latencies:
+            stats['latency_avg_ms'] = sum(latencies) / len(latencies) * 1000
+            stats['latency_p50_ms'] = latencies[len(latencies) // 2] * 1000
+            stats['latency_p95_ms'] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+            stats['latency_max_ms'] = latencies[-1] * 1000
+        return stats
+
+    def _run(self):
+        """流水线线程函数：填充发送窗口并处理超时"""
+        while True:
+            outbox = []
+            finished = []
+            with self.cond:
+                if not self.running:
+                    break
+                now = time.monotonic()
+                for job in [j for j in self.in_flight.values() if j.deadline <= now]:
+                    self._retry_locked(job, "应答超时", finished)
+
+                while self.pending and len(self.in_flight) < self.window:
+                    job = self.pending.popleft()
+                    job.status = JOB_WRITING
+                    job.attempts += 1
+                    if not job.started_at:
+                        job.started_at = time.monotonic()
+                    self.in_flight[job.tid] = job
+                    self._send_locked(job, outbox)
+
+                if not outbox and not finished:
+                    timeout = self.ack_timeout
+                    if self.in_flight:
+                        earliest = min(j.deadline for j in self.in_flight.values())
+                        timeout = max(0.001, earliest - time.monotonic())
+                    self.cond.wait(timeout)
+            self._dispatch(outbox, finished)
+
+    def _dispatch(self, outbox: list, finished: List[TagWriteJob]):
+        """发送指令帧并通知完成的任务（不持有锁时调用）"""
+        for job, frame in outbox:
+            if not self.send_func(frame):
+                with self.cond:
+                    if self.in_flight.get(job.tid) is job:
+                        job.deadline = 0.0  # 发送失败，下一轮按超时重试
+                        self.cond.notify_all()
+        for job in finished:
+            if self.job_callback:
+                self.job_callback(job)
+            else:
+                print(f"标签写入{'成功' if job.status == JOB_DONE else '失败'}: {job}")
+
+    def _send_locked(self, job: TagWriteJob, outbox: list):
+        """生成任务当前步骤的写入或校验读取指令（释放锁后由 _dispatch 发送）"""
+        bank, word_ptr, data = job.current_step
+        word_count = len(data) // 2
+        header = job.tid + bytes([bank, (word_ptr >> 8) & 0xFF, word_ptr & 0xFF, word_count])
+        if job.status == JOB_VERIFYING:
+            frame = build_command(CMD_TYPE_RFID_READ, header)
+        else:
+            frame = build_command(CMD_TYPE_RFID_WRITE, header + job.access_password + data)
+
+        job.deadline = time.monotonic() + self.ack_timeout
+        outbox.append((job, frame))
+
+    def _step_done_locked(self, job: TagWriteJob, outbox: list, finished: List[TagWriteJob]):
+        """当前步骤完成，进入下一步或结束任务"""
+        job.step_index += 1
+        if job.step_index < len(job.steps):
+            job.status = JOB_WRITING
+            self._send_locked(job, outbox)
+            return
+
+        job.status = JOB_DONE
+        self.success_count += 1
+        self._finish_locked(job, finished)
+
+    def _retry_locked(self, job: TagWriteJob, reason: str, finished: List[TagWriteJob]):
+        """任务失败，未超过重试次数时重新排队（从当前步骤重新写入）"""
+        self.in_flight.pop(job.tid, None)
+        job.error_message = reason
+        if job.attempts <= self.max_retries:
+            self.retry_count += 1
+            job.status = JOB_PENDING
+            self.pending.append(job)
+            return
+
+        job.status = JOB_FAILED
+        self.failed_count += 1
+        self._finish_locked(job, finished)
+
+    def _finish_locked(self, job: TagWriteJob, finished: List[TagWriteJob]):
+        """任务结束（回调由 _dispatch 在释放锁后调用）"""
+        self.in_flight.pop(job.tid, None)
+        self.jobs.pop(job.tid, None)
+        self.cond.notify_all()
+        job.completed_at = time.monotonic()
+        if job.status == JOB_DONE:
+            self.latencies.append(job.latency)
+            job.error_message = ''
+        finished.append(job)
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待所有任务完成"""
+        end = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.jobs:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining if remaining is not None else 0.1)
+        return True
+
+    def get_unfinished(self) -> List[TagWriteJob]:
+        """获取未完成的任务"""
+        with self.cond:
+            return list(self.jobs.values())
@@ -0,0 +1,156 @@
+# tray.py
+"""
+托盘聚合模块
+对贴标后天线读到的标签去重，并按托盘装载数量统计完成的托盘
+"""
+
+import re
+from collections import deque
+from typing import Callable, Optional, List, Tuple
+from rfid_tag import RFIDTag
+
+
+class TrayAggregator:
+    """托盘聚合类"""
+
+    def __init__(self, tray_id: str = 'TRAY-2024-001', capacity: int = 32,
+                 count_antenna: int = 2, recent_window: int = 1000):
+        """
+        初始化托盘聚合
+
+        Args:
+            tray_id: 当前托盘编号
+            capacity: 托盘装载货物数量
+            count_antenna: 计数天线号（贴标后天线），0表示所有天线都计数
+            recent_window: 最近完成托盘的EPC去重窗口大小
+        """
+        self.tray_id = tray_id
+        self.capacity = capacity
+        self.count_antenna = count_antenna
+
+        # 当前托盘内的EPC（保持加入顺序）
+        self.tray_epcs: List[str] = []
+        self._tray_set = set()
+
+        # 最近已完成托盘的EPC，防止在场内滞留的标签被重复计入下一托盘
+        self.recent_window = recent_window
+        self._recent = deque()
+        self._recent_set = set()
+
+        # 统计信息
+        self.completed_trays = 0
+        self.total_count = 0
+
+        # 回调函数
+        self.tray_completed_callback = None
+
+    def set_callbacks(self, tray_completed_callback: Optional[Callable[[str, List[str]], None]] = None):
+        """
+        设置回调函数
+
+        Args:
+            tray_completed_callback: 托盘装满回调(托盘编号, EPC列表)
+        """
+        self.tray_completed_callback = tray_completed_callback
+
+    @property
+    def current_count(self) -> int:
+        """当前托盘已装载数量"""
+        return len(self.tray_epcs)
+
+    def is_seen(self, epc: str) -> bool:
+        """EPC是否已在当前托盘或最近窗口中"""
+        return epc in self._tray_set or epc in self._recent_set
+
+    def add(self, tag: RFIDTag) -> bool:
+        """
+        加入一个标签
+
+        Args:
+            tag: 解析成功的标签
+
+        Returns:
+            bool: 是否为当前托盘新增的标签
+        """
+        antenna = tag.zone_antenna or tag.antenna_num
+        if self.count_antenna and antenna != self.count_antenna:
+            return False
+
+        epc = tag.epc
+        if not epc or self.is_seen(epc):
+            return False
+
+        self.tray_epcs.append(epc)
+        self._tray_set.add(epc)
+        self.total_count += 1
+
+        if self.capacity > 0 and len(self.tray_epcs) >= self.capacity:
+            self.complete_tray()
+
+        return True
+
+    def complete_tray(self):
+        """结束当前托盘并切换到下一托盘编号"""
+        tray_id = self.tray_id
+        epcs = self.tray_epcs
+
+        for epc in epcs:
+            self._remember(epc)
+
+        self.tray_epcs = []
+        self._tray_set = set()
+        self.completed_trays += 1
+        self.tray_id = self.next_tray_id(tray_id)
+
+        if self.tray_completed_callback:
+            self.tray_completed_callback(tray_id, epcs)
+
+    def set_tray(self, tray_id: str, capacity: Optional[int] = None):
+        """手动设置当前托盘编号和装载数量（不清空已装载内容）"""
+        self.tray_id = tray_id
+        if capacity is not None:
+            self.capacity = capacity
+
+    def get_state(self, include_recent: bool = True) -> Tuple[str, List[str], Optional[List[str]]]:
+        """获取当前托盘编号、当前托盘EPC列表和最近窗口EPC列表（用于快照，调用方持有引擎锁）"""
+        return self.tray_id, list(self.tray_epcs), list(self._recent) if include_recent else None
+
+    def restore(self, tray_id: str, tray_epcs: List[str], recent: List[str],
+                completed_trays: int = 0, total_count: int = 0):
+        """
+        从快照恢复托盘状态（不触发托盘完成回调）
+
+        Args:
+            tray_id: 当前托盘编号
+            tray_epcs: 当前托盘已装载的EPC
+            recent: 最近已完成托盘的EPC（按完成顺序）
+            completed_trays: 已完成托盘数
+            total_count: 累计计入数量
+        """
+        self.tray_id = tray_id
+        self.tray_epcs = list(tray_epcs)
+        self._tray_set = set(self.tray_epcs)
+        self._recent = deque()
+        self._recent_set = set()
+        for epc in recent:
+            self._remember(epc)
+        self.completed_trays = completed_trays
+        self.total_count = total_count
+
+    def _remember(self, epc: str):
+        """加入最近EPC窗口"""
+        if self.recent_window <= 0:
+            return
+        self._recent.append(epc)
+        self._recent_set.add(epc)
+        while len(self._recent) > self.recent_window:
+            self._recent_set.discard(self._recent.popleft())
+
+    @staticmethod
+    def next_tray_id(tray_id: str) -> str:
+        """生成下一个托盘编号，如 TRAY-2024-001 -> TRAY-2024-002"""
+        match = re.search(r'(\d+)$', tray_id)
+        if not match:
+            return f"{tray_id}-1"
+        digits = match.group(1)
+        return tray_id[:match.start()] + str(int(digits) + 1).zfill(len(digits))
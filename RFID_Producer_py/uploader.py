@@ -0,0 +1,515 @@
+# uploader.py
+"""
+上位系统（MES）数据上传模块
+标签和托盘事件先按批次编码（wire_format），压缩后写入本地磁盘队列（分段文件），
+再通过保持的TCP长连接按顺序上传；服务端确认后删除已确认的分段。
+上位链路中断时数据保留在磁盘上，恢复后自动续传，磁盘占用超过上限时丢弃最旧的分段
+
+上传协议（大端）:
+    客户端 -> 服务端: 'RUP1' | 数据长度(4) | 序号(8) | zlib压缩的批次数据
+    服务端 -> 客户端: 'RACK' | 序号(8)   （累计确认: 该序号及之前的数据均已处理）
+
+本地测试:
+    python uploader.py --serve 9200          # 启动模拟上位服务端，打印收到的批次
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+import zlib
+from array import array
+from typing import Callable, List, Optional, Tuple
+from rfid_tag import RFIDTag
+from wire_format import BatchEncoder, RECORD_TYPE_TAG, RECORD_TYPE_TRAY, iter_batches
+from watchdog import NULL_HEARTBEAT
+
+# 磁盘队列条目: 数据长度(4) | 序号(8) | CRC32(4) | 数据
+ENTRY_HEADER = struct.Struct('>IQI')
+ACK_FILE = 'ack'
+SEGMENT_PREFIX = 'seg_'
+SEGMENT_SUFFIX = '.dat'
+
+# 上传协议
+UPLOAD_HEADER = struct.Struct('>4sIQ')
+UPLOAD_MAGIC = b'RUP1'
+ACK_MESSAGE = struct.Struct('>4sQ')
+ACK_MAGIC = b'RACK'
+
+
+class _Segment:
+    """一个分段文件（序号连续）"""
+
+    __slots__ = ('seg_id', 'path', 'first_seq', 'offsets', 'size')
+
+    def __init__(self, seg_id: int, path: str, first_seq: int):
+        self.seg_id = seg_id
+        self.path = path
+        self.first_seq = first_seq
+        self.offsets = array('Q')  # 各条目在文件中的位置
+        self.size = 0
+
+    @property
+    def last_seq(self) -> int:
+        return self.first_seq + len(self.offsets) - 1
+
+
+class SegmentQueue:
+    """磁盘分段队列类（线程安全）"""
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * 1024 * 1024,
+                 max_disk_bytes: int = 256 * 1024 * 1024, fsync: bool = True):
+        """
+        打开磁盘队列（目录不存在时创建，已有数据时继续使用）
+
+        Args:
+            directory: 队列目录
+            segment_bytes: 单个分段文件的大小上限
+            max_disk_bytes: 磁盘占用上限，超过时丢弃最旧的分段
+            fsync: 每次写入后是否同步到磁盘
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.fsync = fsync
+        self.lock = threading.Lock()
+
+        self.segments: List[_Segment] = []
+        self.acked_seq = 0
+        self.next_seq = 1
+        self.disk_bytes = 0
+        self.dropped_entries = 0  # 因超过磁盘上限丢弃的条目数
+        self._file = None
+
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _segment_path(self, seg_id: int) -> str:
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{seg_id:09d}{SEGMENT_SUFFIX}")
+
+    def _load(self):
+        """扫描已有分段（只读取条目头），截断写入中断的尾部"""
+        ack_path = os.path.join(self.directory, ACK_FILE)
+        if os.path.exists(ack_path):
+            with open(ack_path, 'rb') as f:
+                data = f.read(8)
+            if len(data) == 8:
+                self.acked_seq = struct.unpack('>Q', data)[0]
+
+        names = sorted(n for n in os.listdir(self.directory)
+                       if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            seg_id = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            path = os.path.join(self.directory, name)
+            segment = None
+            pos = 0
+            with open(path, 'rb') as f:
+                while True:
+                    header = f.read(ENTRY_HEADER.size)
+                    if len(header) < ENTRY_HEADER.size:
+                        break
+                    length, seq, crc = ENTRY_HEADER.unpack(header)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+                    if segment is None:
+                        segment = _Segment(seg_id, path, seq)
+                    segment.offsets.append(pos)
+                    pos += ENTRY_HEADER.size + length
+            if os.path.getsize(path) != pos:
+                print(f"上传队列分段 {name} 尾部不完整，已截断到 {pos} 字节")
+                with open(path, 'r+b') as f:
+                    f.truncate(pos)
+            if segment is None:
+                os.remove(path)
+                continue
+            segment.size = pos
+            self.segments.append(segment)
+            self.disk_bytes += pos
+
+        if self.segments:
+            self.next_seq = self.segments[-1].last_seq + 1
+        self.next_seq = max(self.next_seq, self.acked_seq + 1)
+        self._truncate_acked()
+
+    def append(self, payload: bytes) -> int:
+        """
+        追加一条数据
+
+        Args:
+            payload: 数据
+
+        Returns:
+            序号
+        """
+        entry_size = ENTRY_HEADER.size + len(payload)
+        with self.lock:
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or self._file is None or segment.size + entry_size > self.segment_bytes:
+                segment = self._open_segment()
+
+            seq = self.next_seq
+            self._file.write(ENTRY_HEADER.pack(len(payload), seq, zlib.crc32(payload)))
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+            segment.offsets.append(segment.size)
+            segment.size += entry_size
+            self.disk_bytes += entry_size
+            self.next_seq += 1
+            self._enforce_limit()
+            return seq
+
+    def _open_segment(self) -> _Segment:
+        """新建分段文件作为写入分段"""
+        if self._file is not None:
+            self._file.close()
+        seg_id = self.segments[-1].seg_id + 1 if self.segments else 1
+        segment = _Segment(seg_id, self._segment_path(seg_id), self.next_seq)
+        self._file = open(segment.path, 'ab')
+        self.segments.append(segment)
+        return segment
+
+    def _enforce_limit(self):
+        """磁盘占用超过上限时丢弃最旧的分段（保留写入分段）"""
+        while self.disk_bytes > self.max_disk_bytes and len(self.segments) > 1:
+            segment = self.segments.pop(0)
+            unacked = segment.last_seq - max(self.acked_seq, segment.first_seq - 1)
+            if unacked > 0:
+                self.dropped_entries += unacked
+                print(f"上传队列超过磁盘上限，丢弃 {unacked} 条未上传数据")
+                self._write_ack(segment.last_seq)
+            self._remove_segment(segment)
+
+    def _remove_segment(self, segment: _Segment):
+        self.disk_bytes -= segment.size
+        try:
+            os.remove(segment.path)
+        except OSError:
+            pass
+
+    def read(self, seq: int, max_entries: int = 16) -> List[Tuple[int, bytes]]:
+        """
+        从指定序号开始读取数据
+
+        Args:
+            seq: 起始序号
+            max_entries: 最多读取的条目数
+
+        Returns:
+            [(序号, 数据), ...]
+        """
+        with self.lock:
+            seq = max(seq, self.acked_seq + 1)
+            result = []
+            for segment in self.segments:
+                if segment.last_seq < seq or not segment.offsets:
+                    continue
+                seq = max(seq, segment.first_seq)
+                with open(segment.path, 'rb') as f:
+                    while seq <= segment.last_seq and len(result) < max_entries:
+                        f.seek(segment.offsets[seq - segment.first_seq])
+                        length, entry_seq, _ = ENTRY_HEADER.unpack(f.read(ENTRY_HEADER.size))
+                        result.append((entry_seq, f.read(length)))
+                        seq += 1
+                if len(result) >= max_entries:
+                    break
+            return result
+
+    def ack(self, seq: int):
+        """确认序号及之前的数据，删除已全部确认的分段"""
+        with self.lock:
+            if seq <= self.acked_seq:
+                return
+            self._write_ack(min(seq, self.next_seq - 1))
+            self._truncate_acked()
+
+    def _write_ack(self, seq: int):
+        self.acked_seq = seq
+        path = os.path.join(self.directory, ACK_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(struct.pack('>Q', seq))
+        os.replace(path + '.tmp', path)
+
+    def _truncate_acked(self):
+        while self.segments and self.segments[0].last_seq <= self.acked_seq:
+            if len(self.segments) == 1 and self._file is not None:
+                break  # 写入分段保留，写满后再删除
+            self._remove_segment(self.segments.pop(0))
+
+    @property
+    def pending(self) -> int:
+        """未确认的条目数"""
+        return self.next_seq - 1 - self.acked_seq
+
+    def close(self):
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Uploader:
+    """上位系统数据上传类"""
+
+    def __init__(self, host: str, port: int, spool_dir: str = 'upload_spool',
+                 batch_records: int = 500, flush_interval: float = 1.0, window: int = 8,
+                 ack_timeout: float = 5.0, retry_interval: float = 5.0, compress_level: int = 6,
+                 segment_bytes: int = 4 * 1024 * 1024, max_disk_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化上传
+
+        Args:
+            host: 上位服务器地址
+            port: 上位服务器端口
+            spool_dir: 本地磁盘队列目录
+            batch_records: 单个批次的最大记录数
+            flush_interval: 未满的批次最长等待时间（秒）
+            window: 已发送未确认的最大批次数
+            ack_timeout: 等待确认超时（秒），超时后重连并重发
+            retry_interval: 连接失败后的重试间隔（秒）
+            compress_level: zlib压缩级别
+            segment_bytes: 单个分段文件的大小上限
+            max_disk_bytes: 磁盘队列占用上限
+        """
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.retry_interval = retry_interval
+        self.compress_level = compress_level
+
+        self.queue = SegmentQueue(spool_dir, segment_bytes, max_disk_bytes)
+        self.lock = threading.Lock()
+        self.tag_batch = BatchEncoder(RECORD_TYPE_TAG, batch_records)
+        self.tray_batch = BatchEncoder(RECORD_TYPE_TRAY, batch_records)
+        self._last_flush = time.monotonic()
+
+        self.running = False
+        self._wakeup = threading.Event()
+        self.thread = None
+        self.heartbeat = NULL_HEARTBEAT  # 启用线程监视时由引擎设置
+        self.sock = None
+        self._ack_buffer = b''
+        self._next_connect = 0.0
+
+        # 统计信息
+        self.connected = False
+        self.sent_batches = 0
+        self.acked_batches = 0
+        self.reconnects = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+
+    # 生产方接口（读写器接收线程中调用，只做定长打包）
+    def add_tag(self, reader_name: str, tag: RFIDTag, is_new: bool, tray_id: str = ''):
+        """加入标签事件"""
+        with self.lock:
+            full = self.tag_batch.add_tag(reader_name, tag, is_new, tray_id)
+        if full:
+            self._wakeup.set()
+
+    def add_tray(self, tray_id: str, count: int):
+        """加入托盘完成事件"""
+        with self.lock:
+            self.tray_batch.add_tray(tray_id, count)
+        self._wakeup.set()
+
+    def flush(self):
+        """将内存中的批次压缩后写入磁盘队列"""
+        with self.lock:
+            batches = [encoder.encode() for encoder in (self.tray_batch, self.tag_batch) if len(encoder)]
+            self._last_flush = time.monotonic()
+        for data in batches:
+            compressed = zlib.compress(data, self.compress_level)
+            self.raw_bytes += len(data)
+            self.compressed_bytes += len(compressed)
+            self.queue.append(compressed)
+
+    # 启动和停止
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止上传（未上传的数据保留在磁盘队列中，下次启动时续传）"""
+        self.running = False
+        self._wakeup.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.ack_timeout + 1.0)
+        self.flush()
+        self._close()
+        self.queue.close()
+
+    # 上传线程
+    def _run(self):
+        while self.running:
+            self.heartbeat.beat()
+            if time.monotonic() - self._last_flush >= self.flush_interval or self._batch_full():
+                self.flush()
+
+            if self.queue.pending == 0:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                continue
+
+            if self.sock is None:
+                # 连接失败后按重试间隔重连，等待期间仍按时将批次写入磁盘
+                if time.monotonic() < self._next_connect or not self._connect():
+                    self._wakeup.wait(min(self.flush_interval, self.retry_interval))
+                    self._wakeup.clear()
+                    continue
+
+            try:
+                self._send_window()
+            except OSError as e:
+                print(f"上传中断: {e}")
+                self._close()
+
+    def _batch_full(self) -> bool:
+        return self.tag_batch.full or self.tray_batch.full
+
+    def _connect(self) -> bool:
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.ack_timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(self.ack_timeout)
+        except OSError as e:
+            if self.connected or self.reconnects == 0:
+                print(f"连接上位服务器 {self.host}:{self.port} 失败: {e}")
+            self.connected = False
+            self.reconnects += 1
+            self._next_connect = time.monotonic() + self.retry_interval
+            return False
+        self.sock = sock
+        self.connected = True
+        self._ack_buffer = b''
+        print(f"已连接上位服务器 {self.host}:{self.port}，待上传 {self.queue.pending} 批")
+        return True
+
+    def _close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+        self.connected = False
+
+    def _send_window(self):
+        """发送一个窗口的批次并等待确认（从最早未确认的批次开始，断线重连后自动重发）"""
+        entries = self.queue.read(self.queue.acked_seq + 1, self.window)
+        if not entries:
+            return
+        for seq, payload in entries:
+            self.sock.sendall(UPLOAD_HEADER.pack(UPLOAD_MAGIC, len(payload), seq) + payload)
+            self.sent_batches += 1
+
+        last_seq = entries[-1][0]
+        while self.queue.acked_seq < last_seq:
+            try:
+                data = self.sock.recv(4096)
+            except socket.timeout:
+                raise OSError("等待确认超时")
+            if not data:
+                raise OSError("服务器关闭连接")
+            self._ack_buffer += data
+            while len(self._ack_buffer) >= ACK_MESSAGE.size:
+                magic, seq = ACK_MESSAGE.unpack_from(self._ack_buffer)
+                self._ack_buffer = self._ack_buffer[ACK_MESSAGE.size:]
+                if magic != ACK_MAGIC:
+                    raise OSError("确认消息格式错误")
+                before = self.queue.acked_seq
+                self.queue.ack(seq)
+                self.acked_batches += max(0, self.queue.acked_seq - before)
+
+    def get_stats(self) -> dict:
+        """获取统计信息"""
+        return {
+            'connected': self.connected,
+            'pending_batches': self.queue.pending,
+            'disk_bytes': self.queue.disk_bytes,
+            'sent_batches': self.sent_batches,
+            'acked_batches': self.acked_batches,
+            'dropped_batches': self.queue.dropped_entries,
+            'reconnects': self.reconnects,
+            'compression_ratio': (self.raw_bytes / self.compressed_bytes) if self.compressed_bytes else 0.0,
+        }
+
+
+def serve(host: str = '127.0.0.1', port: int = 9200,
+          batch_callback: Optional[Callable[[int, int, List[str], list], None]] = None,
+          stop_event: Optional[threading.Event] = None):
+    """
+    模拟上位服务端（本地测试用）：接收批次、解码并回复确认
+
+    Args:
+        host: 监听地址
+        port: 监听端口
+        batch_callback: 批次回调(序号, 记录类型, 字符串表, 记录列表)，为空时打印摘要
+        stop_event: 停止事件
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen(1)
+    server.settimeout(0.5)
+    print(f"模拟上位服务端已启动 {host}:{port}")
+    last_seq = 0  # 已处理的最大序号（跨连接保留，重发的批次只确认不重复处理）
+
+    def recv_exact(conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("连接关闭")
+            data += chunk
+        return data
+
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                conn, address = server.accept()
+            except socket.timeout:
+                continue
+            print(f"上传客户端已连接: {address}")
+            try:
+                while True:
+                    magic, length, seq = UPLOAD_HEADER.unpack(recv_exact(conn, UPLOAD_HEADER.size))
+                    if magic != UPLOAD_MAGIC:
+                        raise ConnectionError("数据格式错误")
+                    payload = recv_exact(conn, length)
+                    if seq > last_seq:
+                        for record_type, strings, records in iter_batches(zlib.decompress(payload)):
+                            if batch_callback:
+                                batch_callback(seq, record_type, strings, records)
+                            else:
+                                print(f"收到批次 {seq}: 类型 {record_type}, {len(records)} 条记录, "
+                                      f"{length} 字节")
+                        last_seq = seq
+                    conn.sendall(ACK_MESSAGE.pack(ACK_MAGIC, seq))
+            except (ConnectionError, OSError) as e:
+                print(f"上传客户端断开: {e}")
+            finally:
+                conn.close()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='模拟上位服务端（测试上传）')
+    parser.add_argument('--serve', type=int, default=9200, metavar='PORT', help='监听端口')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    args = parser.parse_args()
+    try:
+        serve(args.host, args.serve)
+    except KeyboardInterrupt:
+        pass
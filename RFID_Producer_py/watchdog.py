@@ -0,0 +1,342 @@
+# watchdog.py
+"""
+线程停顿监视模块
+各线程在每次循环时调用 heartbeat.beat()（只写一个时间戳），监视线程定期检查:
+    停顿:   线程超过阈值没有心跳（阻塞在锁、磁盘、回调中），输出所有线程的调用栈
+    无数据: 接收线程仍有心跳但读写器超过阈值没有发送数据（heartbeat.progress()），只提示不输出调用栈
+Tk主循环通过周期 after 探测心跳，同时记录调度延迟（实际执行时间 - 预定执行时间），
+界面卡顿时可以区分是Tk主线程被占用（延迟大）、接收线程停顿，还是读写器没有数据
+
+心跳对象:
+    NULL_HEARTBEAT 为未启用监视时的默认值（beat/progress 为空操作），各组件不需要判断是否启用
+"""
+
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+LAG_RING = 512  # Tk调度延迟保留的最近采样数
+
+# 事件类型
+EVENT_STALL = 'stall'
+EVENT_RECOVER = 'recover'
+EVENT_SILENT = 'silent'
+
+
+class Heartbeat:
+    """单个线程的心跳"""
+
+    __slots__ = ('name', 'threshold', 'silence', 'last', 'last_progress', 'ident', 'stalled', 'silent',
+                 'stalls')
+
+    def __init__(self, name: str, threshold: float, silence: float = 0.0):
+        self.name = name
+        self.threshold = threshold  # 停顿阈值（秒）
+        self.silence = silence  # 无数据提示阈值（秒），0表示不检查
+        self.last: Optional[float] = None  # 最近心跳，None表示线程未运行
+        self.last_progress: Optional[float] = None
+        self.ident: Optional[int] = None  # 线程标识（用于输出调用栈时标出停顿的线程）
+        self.stalled = False
+        self.silent = False
+        self.stalls = 0
+
+    def beat(self):
+        """线程循环一次（任意阻塞等待返回后调用）"""
+        self.last = time.monotonic()
+        self.ident = threading.get_ident()
+
+    def progress(self):
+        """线程处理了数据"""
+        self.last = self.last_progress = time.monotonic()
+
+    def pause(self):
+        """线程正常退出或进入不需要监视的等待"""
+        self.last = None
+        self.last_progress = None
+
+
+class _NullHeartbeat:
+    """未启用监视时使用的心跳（空操作）"""
+
+    __slots__ = ()
+
+    def beat(self):
+        pass
+
+    def progress(self):
+        pass
+
+    def pause(self):
+        pass
+
+
+NULL_HEARTBEAT = _NullHeartbeat()
+
+
+def format_stacks(highlight: Optional[int] = None) -> str:
+    """
+    生成所有线程的调用栈文本
+
+    Args:
+        highlight: 需要标出的线程标识（停顿的线程排在最前面）
+    """
+    names = {t.ident: t.name for t in threading.enumerate()}
+    frames = sys._current_frames()
+    idents = sorted(frames, key=lambda ident: ident != highlight)
+    lines = []
+    for ident in idents:
+        mark = ' <<< 停顿' if ident == highlight else ''
+        lines.append(f"--- 线程 {names.get(ident, '?')} ({ident}){mark}")
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frames[ident]))
+    return '\n'.join(lines)
+
+
+class Watchdog:
+    """线程停顿监视类"""
+
+    def __init__(self, check_interval: float = 1.0, stall_seconds: float = 15.0,
+                 tk_stall_seconds: float = 2.0, tk_probe_ms: int = 100, lag_warn_ms: float = 200.0,
+                 silence_seconds: float = 30.0, dump_dir: str = '', dump_cooldown: float = 60.0):
+        """
+        初始化监视
+
+        Args:
+            check_interval: 检查间隔（秒）
+            stall_seconds: 工作线程的默认停顿阈值（秒，需大于读写器接收超时）
+            tk_stall_seconds: Tk主循环停顿阈值（秒）
+            tk_probe_ms: Tk探测间隔（毫秒）
+            lag_warn_ms: Tk调度延迟超过该值时计数（毫秒）
+            silence_seconds: 读写器无数据提示阈值（秒），0表示不提示
+            dump_dir: 调用栈另存目录，为空时只输出到日志
+            dump_cooldown: 两次输出调用栈的最小间隔（秒）
+        """
+        self.check_interval = check_interval
+        self.stall_seconds = stall_seconds
+        self.tk_stall_seconds = tk_stall_seconds
+        self.tk_probe_ms = tk_probe_ms
+        self.lag_warn_ms = lag_warn_ms
+        self.silence_seconds = silence_seconds
+        self.dump_dir = dump_dir
+        self.dump_cooldown = dump_cooldown
+
+        self.lock = threading.Lock()
+        self.heartbeats: Dict[str, Heartbeat] = {}
+        self._stop_event = threading.Event()
+        self.thread = None
+        self._last_dump = 0.0
+
+        # Tk调度延迟（毫秒，只由Tk主线程写入）
+        self.tk_heartbeat: Optional[Heartbeat] = None
+        self._lags = [0.0] * LAG_RING
+        self._lag_pos = 0
+        self._lag_count = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.lag_warnings = 0
+
+        # 统计信息
+        self.dumps = 0
+
+        # 回调函数
+        self.event_callback = None
+
+    @classmethod
+    def from_config(cls, config: dict) -> 'Watchdog':
+        """由配置中的 watchdog 部分创建"""
+        return cls(check_interval=config['check_interval'], stall_seconds=config['stall_seconds'],
+                   tk_stall_seconds=config['tk_stall_seconds'], tk_probe_ms=config['tk_probe_ms'],
+                   lag_warn_ms=config['lag_warn_ms'], silence_seconds=config['silence_seconds'],
+                   dump_dir=config['dump_dir'])
+
+    def set_callbacks(self, event_callback: Optional[Callable[[str, str, float], None]] = None):
+        """
+        设置回调函数（在监视线程中调用）
+
+        Args:
+            event_callback: 事件回调(事件类型, 心跳名称, 持续时间秒)
+        """
+        self.event_callback = event_callback
+
+    # 心跳登记
+    def register(self, name: str, threshold: Optional[float] = None, silence: float = 0.0) -> Heartbeat:
+        """
+        登记心跳（同名时返回原有心跳，如读写器重连后的新线程）
+
+        Args:
+            name: 心跳名称，如 "reader1.recv"
+            threshold: 停顿阈值（秒），为空时使用 stall_seconds
+            silence: 无数据提示阈值（秒），0表示不检查
+        """
+        with self.lock:
+            heartbeat = self.heartbeats.get(name)
+            if heartbeat is None:
+                heartbeat = self.heartbeats[name] = Heartbeat(name, threshold or self.stall_seconds, silence)
+            return heartbeat
+
+    def unregister(self, name: str):
+        with self.lock:
+            self.heartbeats.pop(name, None)
+
+    # 启动和停止
+    def start(self):
+        if self.thread is not None:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.check_interval + 1.0)
+        self.thread = None
+
+    # Tk探测
+    def probe_tk(self, widget):
+        """
+        在Tk主循环中周期执行探测（Tk主线程调用一次）
+
+        Args:
+            widget: 任意Tk控件（用于 after）
+        """
+        heartbeat = self.tk_heartbeat = self.register('tk', self.tk_stall_seconds)
+        interval = self.tk_probe_ms / 1000
+
+        def _probe(expected: float):
+            now = time.monotonic()
+            heartbeat.beat()
+            self._record_lag((now - expected) * 1000)
+            widget.after(self.tk_probe_ms, _probe, time.monotonic() + interval)
+
+        widget.after(self.tk_probe_ms, _probe, time.monotonic() + interval)
+
+    def _record_lag(self, lag_ms: float):
+        lag_ms = max(0.0, lag_ms)
+        self._lags[self._lag_pos] = lag_ms
+        self._lag_pos = (self._lag_pos + 1) % LAG_RING
+        self._lag_count += 1
+        self.lag_last = lag_ms
+        if lag_ms > self.lag_max:
+            self.lag_max = lag_ms
+        if lag_ms > self.lag_warn_ms:
+            self.lag_warnings += 1
+
+    # 检查
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"线程监视错误: {e}")
+
+    def check(self, now: Optional[float] = None) -> List[str]:
+        """
+        检查所有心跳（监视线程）
+
+        Returns:
+            本次新发现停顿的心跳名称
+        """
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            heartbeats = list(self.heartbeats.values())
+
+        stalled = []
+        for hb in heartbeats:
+            last = hb.last
+            if last is None:
+                hb.stalled = hb.silent = False
+                continue
+            idle = now - last
+            if idle > hb.threshold:
+                if not hb.stalled:
+                    hb.stalled = True
+                    hb.stalls += 1
+                    stalled.append(hb.name)
+                    self._notify(EVENT_STALL, hb.name, idle)
+                    self._dump(hb, idle, now)
+            elif hb.stalled:
+                hb.stalled = False
+                self._notify(EVENT_RECOVER, hb.name, idle)
+
+            # 线程停顿时没有数据是停顿造成的，不另外提示
+            if hb.silence > 0 and hb.last_progress is not None and not hb.stalled:
+                quiet = now - hb.last_progress
+                if quiet > hb.silence and not hb.silent:
+                    hb.silent = True
+                    self._notify(EVENT_SILENT, hb.name, quiet)
+                elif quiet <= hb.silence:
+                    hb.silent = False
+        return stalled
+
+    def _notify(self, event: str, name: str, seconds: float):
+        if self.event_callback:
+            self.event_callback(event, name, seconds)
+        elif event == EVENT_STALL:
+            print(f"线程停顿: {name} 已 {seconds:.1f} 秒没有心跳")
+        elif event == EVENT_RECOVER:
+            print(f"线程恢复: {name}")
+        else:
+            print(f"读写器无数据: {name} 已 {seconds:.1f} 秒没有收到数据")
+
+    def _dump(self, heartbeat: Heartbeat, idle: float, now: float):
+        """输出所有线程调用栈（限制频率）"""
+        if self._last_dump and now - self._last_dump < self.dump_cooldown:
+            return
+        self._last_dump = now
+        self.dumps += 1
+        text = (f"===== 线程停顿 {heartbeat.name} {idle:.1f}秒 "
+                f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} =====\n"
+                + format_stacks(heartbeat.ident))
+        print(text)
+        if self.dump_dir:
+            path = os.path.join(self.dump_dir, f"stall_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt")
+            try:
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+            except OSError as e:
+                print(f"保存调用栈失败: {e}")
+
+    # 统计
+    def get_lag_stats(self) -> dict:
+        """Tk调度延迟统计（毫秒）"""
+        count = min(self._lag_count, LAG_RING)
+        lags = sorted(self._lags[:count])
+        if not lags:
+            return {'samples': 0}
+        return {'samples': self._lag_count, 'last': round(self.lag_last, 1),
+                'p50': round(lags[count // 2], 1), 'p99': round(lags[min(count - 1, count * 99 // 100)], 1),
+                'max': round(self.lag_max, 1), 'warnings': self.lag_warnings}
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        with self.lock:
+            heartbeats = list(self.heartbeats.values())
+        stats = {hb.name: {'idle': None if hb.last is None else round(now - hb.last, 2),
+                           'stalled': hb.stalled, 'stalls': hb.stalls}
+                 for hb in heartbeats}
+        return {'threads': stats, 'tk_lag_ms': self.get_lag_stats(), 'dumps': self.dumps}
+
+    def report(self) -> str:
+        """生成各线程状态文本"""
+        now = time.monotonic()
+        with self.lock:
+            heartbeats = sorted(self.heartbeats.values(), key=lambda hb: hb.name)
+        lines = ["线程状态:"]
+        for hb in heartbeats:
+            if hb.last is None:
+                state = "未运行"
+            else:
+                state = f"{now - hb.last:.1f}秒前心跳" + (" [停顿]" if hb.stalled else "")
+                if hb.last_progress is not None:
+                    state += f", {now - hb.last_progress:.1f}秒前收到数据" + (" [无数据]" if hb.silent else "")
+            lines.append(f"  {hb.name}: {state}, 停顿 {hb.stalls} 次 (阈值 {hb.threshold:g}秒)")
+        lag = self.get_lag_stats()
+        if lag['samples']:
+            lines.append(f"Tk调度延迟: 最近 {lag['last']}ms, p50 {lag['p50']}ms, p99 {lag['p99']}ms, "
+                         f"最大 {lag['max']}ms, 超过 {self.lag_warn_ms:g}ms {lag['warnings']} 次")
+        return '\n'.join(lines)
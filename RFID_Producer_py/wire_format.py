@@ -0,0 +1,223 @@
+# wire_format.py
+"""
+标签事件二进制传输格式
+用于向上位系统批量发送标签和托盘事件，替代 RFIDTag.to_dict 的JSON格式
+（每个标签事件61字节，约为JSON的1/10，解码时直接按定长结构解包，不逐字段生成字典）
+
+批次格式（大端）:
+    批次头:   魔数'RB' | 版本(1) | 记录类型(1) | 记录长度(1) | 字符串数(2) | 记录数(4)
+    字符串表: 每项 长度(1) + UTF-8内容（读写器名称、托盘编号，记录中以下标引用，
+              超过255字节时按字符边界截断）
+    记录:     记录数 × 记录长度字节
+
+版本规则:
+    新版本只在记录末尾追加字段，批次头中的记录长度用于兼容:
+    旧解码器只读取已知的前缀字段，新解码器读取旧数据时缺少的字段取默认值
+    （记录末尾补0: 数值为0，字节串为全0），记录长度不能小于版本1的长度
+"""
+
+import struct
+import time
+from collections import namedtuple
+from typing import Dict, Iterator, List, Tuple
+from rfid_tag import RFIDTag
+
+MAGIC = b'RB'
+VERSION = 1
+BATCH_HEADER = struct.Struct('>2sBBBHI')
+
+RECORD_TYPE_TAG = 1
+RECORD_TYPE_TRAY = 2
+
+# 标签记录: 时间戳ns, RSSI(0.1dBm), 天线号, 归属天线, 标志, 读写器下标, 托盘下标, EPC, TID, USER, 产品编号
+TAG_RECORD = struct.Struct('>QhBBBHH12s12s16sI')
+TagRecord = namedtuple('TagRecord', 'timestamp_ns rssi_raw antenna zone flags reader_idx tray_idx '
+                                    'epc tid user product_ref')
+
+# 托盘记录: 时间戳ns, 托盘下标, 标签数量
+TRAY_RECORD = struct.Struct('>QHI')
+TrayRecord = namedtuple('TrayRecord', 'timestamp_ns tray_idx count')
+
+RECORD_TYPES = {
+    RECORD_TYPE_TAG: (TAG_RECORD, TagRecord),
+    RECORD_TYPE_TRAY: (TRAY_RECORD, TrayRecord),
+}
+
+# 版本1的记录长度（之后的版本追加字段时不能修改）
+MIN_RECORD_SIZES = {
+    RECORD_TYPE_TAG: 61,
+    RECORD_TYPE_TRAY: 14,
+}
+
+# 标签记录标志位
+FLAG_NEW = 0x01  # 计入托盘
+FLAG_DUPLICATE = 0x02  # 本次生产已处理过
+FLAG_ZONE_CHANGED = 0x04  # 归属天线变化
+
+MAX_STRINGS = 0xFFFF
+
+
+class BatchEncoder:
+    """批次编码类（同一批次只包含一种记录类型）"""
+
+    def __init__(self, record_type: int = RECORD_TYPE_TAG, max_records: int = 1000):
+        """
+        初始化编码器
+
+        Args:
+            record_type: 记录类型
+            max_records: 单个批次的最大记录数
+        """
+        if record_type not in RECORD_TYPES:
+            raise ValueError(f"未知记录类型: {record_type}")
+        self.record_type = record_type
+        self.record_struct = RECORD_TYPES[record_type][0]
+        self.max_records = max_records
+        self.reset()
+
+    def reset(self):
+        self.strings: List[str] = []
+        self.string_index: Dict[str, int] = {}
+        self.records = bytearray()
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count >= self.max_records or len(self.strings) >= MAX_STRINGS - 2
+
+    def _intern(self, text: str) -> int:
+        """字符串加入字符串表，返回下标"""
+        index = self.string_index.get(text)
+        if index is None:
+            index = self.string_index[text] = len(self.strings)
+            self.strings.append(text)
+        return index
+
+    def add_tag(self, reader_name: str, tag: RFIDTag, is_new: bool, tray_id: str = '',
+                product_ref: int = 0) -> bool:
+        """
+        加入标签事件
+
+        Args:
+            reader_name: 读写器名称
+            tag: 标签对象
+            is_new: 是否计入托盘
+            tray_id: 托盘编号
+            product_ref: 产品编号（上位系统中的产品ID，0表示未知）
+
+        Returns:
+            bool: 批次是否已满
+        """
+        flags = ((FLAG_NEW if is_new else 0) | (FLAG_DUPLICATE if tag.duplicate else 0)
+                 | (FLAG_ZONE_CHANGED if tag.zone_changed else 0))
+        self.records += TAG_RECORD.pack(
+            tag.timestamp_ns, int(round(tag.rssi * 10)), tag.antenna_num, tag.zone_antenna, flags,
+            self._intern(reader_name), self._intern(tray_id),
+            tag.epc_bytes, tag.tid_bytes, tag.user_bytes, product_ref)
+        self.count += 1
+        return self.full
+
+    def add_tray(self, tray_id: str, count: int, timestamp_ns: int = 0) -> bool:
+        """
+        加入托盘完成事件
+
+        Args:
+            tray_id: 托盘编号
+            count: 标签数量
+            timestamp_ns: 完成时间（time.time_ns），为0时取当前时间
+
+        Returns:
+            bool: 批次是否已满
+        """
+        self.records += TRAY_RECORD.pack(timestamp_ns or time.time_ns(), self._intern(tray_id), count)
+        self.count += 1
+        return self.full
+
+    def encode(self) -> bytes:
+        """生成批次数据并清空编码器"""
+        parts = [BATCH_HEADER.pack(MAGIC, VERSION, self.record_type, self.record_struct.size,
+                                   len(self.strings), self.count)]
+        for text in self.strings:
+            data = text.encode('utf-8')
+            if len(data) > 255:
+                # 按字符边界截断，不截断多字节字符
+                data = data[:255].decode('utf-8', 'ignore').encode('utf-8')
+            parts.append(bytes([len(data)]))
+            parts.append(data)
+        parts.append(bytes(self.records))
+        self.reset()
+        return b''.join(parts)
+
+
+def decode_batch(data: bytes, offset: int = 0) -> Tuple[int, List[str], list, int]:
+    """
+    解码一个批次
+
+    Args:
+        data: 批次数据
+        offset: 起始位置
+
+    Returns:
+        (记录类型, 字符串表, 记录列表（TagRecord/TrayRecord）, 下一批次的起始位置)
+    """
+    magic, version, record_type, record_size, string_count, count = BATCH_HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise ValueError("批次数据格式错误")
+    if record_type not in RECORD_TYPES:
+        raise ValueError(f"未知记录类型: {record_type}")
+    pos = offset + BATCH_HEADER.size
+
+    strings = []
+    for _ in range(string_count):
+        length = data[pos]
+        strings.append(bytes(data[pos + 1:pos + 1 + length]).decode('utf-8'))
+        pos += 1 + length
+
+    record_struct, record_class = RECORD_TYPES[record_type]
+    end = pos + record_size * count
+    if end > len(data):
+        raise ValueError("批次数据不完整")
+    body = memoryview(data)[pos:end]
+    if record_size == record_struct.size:
+        records = list(map(record_class._make, record_struct.iter_unpack(body)))
+    elif record_size > record_struct.size:
+        # 新版本记录：只读取已知字段
+        records = [record_class._make(record_struct.unpack_from(body, i * record_size))
+                   for i in range(count)]
+    elif record_size >= MIN_RECORD_SIZES[record_type]:
+        # 旧版本记录：末尾补0，缺少的字段取默认值
+        padding = bytes(record_struct.size - record_size)
+        records = [record_class._make(record_struct.unpack(
+            bytes(body[i * record_size:(i + 1) * record_size]) + padding)) for i in range(count)]
+    else:
+        raise ValueError(f"记录长度 {record_size} 小于版本1的最小长度")
+    return record_type, strings, records, end
+
+
+def iter_batches(data: bytes) -> Iterator[Tuple[int, List[str], list]]:
+    """依次解码连续存放的多个批次"""
+    offset = 0
+    while offset < len(data):
+        record_type, strings, records, offset = decode_batch(data, offset)
+        yield record_type, strings, records
+
+
+def tag_record_to_dict(record: TagRecord, strings: List[str]) -> dict:
+    """将标签记录转换为字典（调试和导出用）"""
+    return {
+        'reader': strings[record.reader_idx],
+        'tray_id': strings[record.tray_idx],
+        'epc': record.epc.hex().upper(),
+        'tid': record.tid.hex().upper(),
+        'user': record.user.hex().upper(),
+        'rssi': record.rssi_raw / 10.0,
+        'antenna': record.antenna,
+        'zone': record.zone,
+        'ts': record.timestamp_ns,
+        'new': bool(record.flags & FLAG_NEW),
+        'duplicate': bool(record.flags & FLAG_DUPLICATE),
+        'product_ref': record.product_ref,
+    }